@@ -47,6 +47,12 @@
 #undef vsnprintf
 
 #include <Python.h>
+#include <datetime.h>
+
+#include <sys/mman.h>
+#include <sys/socket.h>
+#include <arpa/inet.h>
+#include <unistd.h>
 
 /* compatibility for Python earlier than 2.5 */
 #if PY_VERSION_HEX < 0x02050000 && !defined(PY_SSIZE_T_MIN)
@@ -55,6 +61,14 @@ typedef int Py_ssize_t;
 #define PY_SSIZE_T_MIN INT_MIN
 #endif /* PY_VERSION_HEX */
 
+/* type OIDs missing from the headers of older PostgreSQL versions */
+#ifndef JSONOID
+#define JSONOID 114
+#endif
+#ifndef JSONBOID
+#define JSONBOID 3802
+#endif
+
 /* PyObject_Del does not exist in older versions of Python: */
 #if PY_VERSION_HEX < 0x01060000
 #define PyObject_Del(op) PyMem_DEL((op))
@@ -78,6 +92,7 @@ static char pg__doc__[] = "Simple Python interface to PostgreSQL DB";
 #define CHECK_RESULT                1 << 3
 #define CHECK_DQL                1 << 4
 #define CHECK_CONNID                1 << 5
+#define CHECK_ROWS                1 << 6
 
 /* query result types */
 #define RESULT_EMPTY                1
@@ -85,6 +100,13 @@ static char pg__doc__[] = "Simple Python interface to PostgreSQL DB";
 #define RESULT_DDL                        3
 #define RESULT_DQL                        4
 
+/* streaming states of the result of a source */
+#define STREAM_NONE                0
+#define STREAM_ACTIVE                1
+#define STREAM_DONE                2
+#define STREAM_SPILLED                3        /* read from a file */
+#define STREAM_HELD                4        /* read from the chunks kept */
+
 #define MAX_BUFFER_SIZE 8192        /* maximum transaction size */
 
 /* --------------------------------------------------------------------- */
@@ -105,6 +127,17 @@ typedef struct
     PGresult        *last_result;        /* last result content */
     int                connid;                /* reconnect counter */
     PyObject        *notices;        /* server notices since last execution */
+    int                binary;                /* default result format for new sources */
+    PyObject        *encoding;        /* Python codec of the client encoding */
+    int                utf8;                /* the client encoding is UTF-8 */
+    int                streaming;        /* a source is streaming a result */
+    long        budget;                /* memory for a result before it is
+                                           spilled to a file, 0 for no limit */
+    PyObject        *dumps;                /* json encoder of dict and list
+                                           parameters, NULL for json.dumps */
+    PyObject        *types;                /* registry of the types of the
+                                           database, NULL until loaded */
+    PyObject        *typedetails;        /* details of types, by type oid */
 } pgobject;
 
 staticforward PyTypeObject PgType;
@@ -124,6 +157,14 @@ pgobject_New(void)
     pgobj->cnx = NULL;
     pgobj->connid = 0;
     pgobj->notices = NULL;
+    pgobj->binary = 0;
+    pgobj->encoding = NULL;
+    pgobj->utf8 = 0;
+    pgobj->streaming = 0;
+    pgobj->budget = 0;
+    pgobj->dumps = NULL;
+    pgobj->types = NULL;
+    pgobj->typedetails = NULL;
     return (PyObject *) pgobj;
 }
 
@@ -136,12 +177,72 @@ static void pg_dealloc(pgobject *self)
     }
     Py_XDECREF(self->notices);
     self->notices = NULL;
+    Py_XDECREF(self->encoding);
+    Py_XDECREF(self->dumps);
+    Py_XDECREF(self->types);
+    Py_XDECREF(self->typedetails);
     PyObject_Del(self);
 }
 
-/* pg source object */
+/* pg result object, which keeps a result for the objects referencing
+   its memory, and frees it when the last of them is gone */
+
+typedef struct
+{
+    PyObject_HEAD
+    PGresult        *result;        /* result kept */
+}        pgresultobject;
+
+staticforward PyTypeObject PgResultType;
+
+/* values of a column shared by the cells of a result, keyed by the
+   cells' text; bounded to PG_INTERN_MAX values */
+#define PG_INTERN_MAX                1024
+#define PG_INTERN_SIZE                2048                /* slots, a power of 2 */
 
 typedef struct
+{
+    char        *cell;                /* text of the value, NULL if free */
+    int                len;                /* length of the text */
+    unsigned long hash;                /* hash of the text */
+    PyObject        *value;                /* the shared value */
+} pginterned;
+
+typedef struct
+{
+    int                count;                /* number of values */
+    pginterned        slots[PG_INTERN_SIZE];
+} pginterns;
+
+/* decoding plan of a result column */
+typedef struct _pgcolumn pgcolumn;
+typedef PyObject *(*pgdecoder)(pgcolumn *column, char *cell, int len);
+
+struct _pgcolumn
+{
+    Oid                type;                /* type of the column */
+    pgdecoder        decode;                /* turns a cell into a value */
+    pgdecoder        numeric;        /* value decoder for binary numerics */
+    long        scale;                /* scale for scaled numerics */
+    PyObject        *encoding;        /* codec of text, NULL for UTF-8 */
+    PyObject        *loads;                /* parser of json values */
+    pgcolumn        *element;        /* decoding of array elements and of
+                                           the bounds of ranges */
+    char        delim;                /* delimiter of array elements */
+    pgcolumn        *fields;        /* decoding of record fields */
+    int                nfields;        /* number of record fields */
+    PyObject        *record;        /* class of records, NULL for tuples */
+    struct _pgsourceobject *source;        /* source of anonymous records */
+    PyObject        *typecode;        /* DB-API type code of the column */
+    PyObject        *cast;                /* typecast applied to the value */
+    pginterns        *interns;        /* shared values, NULL if not interned */
+    PyObject        *result;        /* pg result object of zero-copy
+                                           values and records */
+};
+
+/* pg source object */
+
+typedef struct _pgsourceobject
 {
     PyObject_HEAD
     int                connid;                /* the parent's connid count on creation */
@@ -155,12 +256,63 @@ typedef struct
     int                num_fields;        /* number of fields in each row */
     PyObject        *name;                /* name of the prepared query */
     PyObject        *query;                /* last query executed by a prepared stmt */
+    Oid                *paramtypes;        /* parameter types of a prepared stmt */
+    int                nparamtypes;        /* number of these types */
+    int                binary;                /* request results in binary format */
+    PyObject        *typecasts;        /* typecasts by type oid or type code */
+    PyObject        *columncasts;        /* typecasts by column index or name */
+    pgcolumn        *columns;        /* decoding plan of the last result */
+    PyObject        *description;        /* description of the last result */
+    struct _pgresultviewobject *view;        /* view of the last result, which
+                                           later views share */
+    PyObject        *rowfactory;        /* maker of rows, NULL for tuples */
+    PyObject        *names;                /* field names of the last result */
+    PyObject        *intern;        /* columns to intern values of: True
+                                           for all, a sequence, or NULL */
+    PyObject        *result;        /* pg result object of the last result,
+                                           which frees it, or NULL */
+    int                streaming;        /* STREAM_* state of the result */
+    long        streamed;        /* rows of the stream before the last
+                                           result */
+    char        *store;                /* mapped rows of a spilled result */
+    size_t        storesize;        /* size of the mapped rows */
+    size_t        storepos;        /* offset of the next row to read */
+    long        storerows;        /* number of spilled or kept rows */
+    PyObject        *chunks;        /* pg result objects of the chunks
+                                           kept of the result, or NULL */
+    Py_ssize_t        chunkpos;        /* index of the chunk being fetched */
+    PGresult        **sets;                /* results of a multi-statement query
+                                           after the last one, or NULL */
+    int                numsets;        /* number of these results */
+    int                setpos;                /* index of the next result */
 }        pgsourceobject;
 
 staticforward PyTypeObject PgSourceType;
 
 #define is_pgsourceobject(v) ((v)->ob_type == &PgSourceType)
 
+/* pg result view object, a sequence of the rows of a result */
+
+typedef struct _pgresultviewobject
+{
+    PyObject_HEAD
+    pgsourceobject        *source;        /* source of the result */
+    struct _pgresultviewobject *base;        /* view sliced, NULL if none */
+    PGresult        *result;        /* result viewed */
+    PyObject        *holder;        /* pg result object of the result */
+    pgcolumn        *columns;        /* decoding plan of the view */
+    int                num_fields;        /* number of fields in each row */
+    Py_ssize_t        start;                /* row of the first item */
+    Py_ssize_t        step;                /* rows between items */
+    Py_ssize_t        length;                /* number of items */
+    PyObject        *rowfactory;        /* maker of rows, NULL for tuples */
+    PyObject        *names;                /* field names of the result */
+}        pgresultviewobject;
+
+staticforward PyTypeObject PgResultViewType;
+
+staticforward PyTypeObject PgRecordType;
+
 /* constructor (internal use only) */
 static pgsourceobject *
 pgsource_new(pgobject * pgcnx)
@@ -185,18 +337,145 @@ pgsource_new(pgobject * pgcnx)
     npgobj->prepared = 0;
     npgobj->name = NULL;
     npgobj->query = NULL;
+    npgobj->paramtypes = NULL;
+    npgobj->nparamtypes = 0;
+    npgobj->binary = pgcnx->binary;
+    npgobj->typecasts = NULL;
+    npgobj->columncasts = NULL;
+    npgobj->columns = NULL;
+    npgobj->description = NULL;
+    npgobj->view = NULL;
+    npgobj->rowfactory = NULL;
+    npgobj->names = NULL;
+    npgobj->intern = NULL;
+    npgobj->result = NULL;
+    npgobj->streaming = STREAM_NONE;
+    npgobj->streamed = 0;
+    npgobj->store = NULL;
+    npgobj->storesize = npgobj->storepos = 0;
+    npgobj->storerows = 0;
+    npgobj->chunks = NULL;
+    npgobj->chunkpos = 0;
+    npgobj->sets = NULL;
+    npgobj->numsets = npgobj->setpos = 0;
     return npgobj;
 }
 
+/* releases what the decoding of a column holds on to */
+static void _pg_column_clear(pgcolumn *column)
+{
+    Py_XDECREF(column->typecode);
+    Py_XDECREF(column->cast);
+    Py_XDECREF(column->encoding);
+    Py_XDECREF(column->loads);
+    if (column->element) {
+        _pg_column_clear(column->element);
+        free(column->element);
+    }
+    if (column->fields) {
+        int i;
+        for (i = 0; i < column->nfields; i++)
+            _pg_column_clear(column->fields + i);
+        free(column->fields);
+    }
+    Py_XDECREF(column->record);
+    Py_XDECREF(column->result);
+    if (column->interns) {
+        int i;
+        for (i = 0; i < PG_INTERN_SIZE; i++) {
+            if (column->interns->slots[i].cell) {
+                free(column->interns->slots[i].cell);
+                Py_DECREF(column->interns->slots[i].value);
+            }
+        }
+        free(column->interns);
+    }
+}
+
+/* frees a decoding plan */
+static void _pg_columns_free(pgcolumn *columns, int num_fields)
+{
+    int i;
+
+    if (columns) {
+        for (i = 0; i < num_fields; i++)
+            _pg_column_clear(columns + i);
+        free(columns);
+    }
+}
+
+/* frees the decoding plan of the last result */
+static void _pg_source_clear_columns(pgsourceobject *self)
+{
+    _pg_columns_free(self->columns, self->num_fields);
+    self->columns = NULL;
+}
+
+/* ends the stream of the result of a source, reading the rows left
+   so that the connection can be used again */
+static void _pg_stream_end(pgsourceobject *self)
+{
+    PGconn *cnx = self->pgcnx->cnx;
+    PGresult *result;
+
+    if (self->streaming != STREAM_ACTIVE)
+        return;
+    self->streaming = STREAM_DONE;
+    self->pgcnx->streaming = 0;
+    if (cnx == NULL || self->connid != self->pgcnx->connid)
+        return;
+    Py_BEGIN_ALLOW_THREADS ;
+    while ((result = PQgetResult(cnx)) != NULL)
+        PQclear(result);
+    Py_END_ALLOW_THREADS ;
+}
+
+/* unmaps the rows of a spilled result */
+static void _pg_store_free(pgsourceobject *self)
+{
+    if (self->store)
+        munmap(self->store, self->storesize);
+    self->store = NULL;
+    self->storesize = self->storepos = 0;
+    self->storerows = 0;
+}
+
+/* frees the results of a multi-statement query not yet reached */
+static void _pg_sets_free(pgsourceobject *self)
+{
+    if (self->sets) {
+        for (; self->setpos < self->numsets; self->setpos++)
+            PQclear(self->sets[self->setpos]);
+        free(self->sets);
+    }
+    self->sets = NULL;
+    self->numsets = self->setpos = 0;
+}
+
 /* destructor */
 static void
 pgsource_dealloc(pgsourceobject * self)
 {
-    if (self->last_result)
+    _pg_stream_end(self);
+    _pg_store_free(self);
+    _pg_sets_free(self);
+    Py_XDECREF(self->chunks);
+    if (self->result)
+        Py_DECREF(self->result);
+    else if (self->last_result)
         PQclear(self->last_result);
     Py_XDECREF(self->pgcnx);
     Py_XDECREF(self->name);
     Py_XDECREF(self->query);
+    if (self->paramtypes)
+        free(self->paramtypes);
+    Py_XDECREF(self->typecasts);
+    Py_XDECREF(self->columncasts);
+    Py_XDECREF(self->description);
+    Py_XDECREF(self->rowfactory);
+    Py_XDECREF(self->names);
+    Py_XDECREF(self->intern);
+    _pg_source_clear_columns(self);
     PyObject_Del(self);
 }
 
@@ -209,8 +488,37 @@ typedef struct
     int                *paramLengths;
     int                *paramFormats;
     int                *mustFree;
+    char        (*fixed)[16];        /* binary values of fixed size */
+    PyObject        **objects;        /* strings values point into */
+    pgobject        *pgcnx;                /* connection, for the encoding of
+                                           text */
 } pgparams;
 
+/* adapter of the parameters of a Python type */
+typedef struct _pgadapter pgadapter;
+typedef int (*pgencoder)(pgparams *params, int i, PyObject *value, Oid type,
+                         pgadapter *adapter);
+
+struct _pgadapter
+{
+    pgencoder        encode;                /* sets parameter i from a value, for
+                                           a parameter of type, or 0 */
+    PyObject        *adapt;                /* adapt(value) of registered
+                                           adapters, NULL otherwise */
+    Oid                type;                /* type of the values, 0 to leave it
+                                           to the server */
+    int                format;                /* 1 if adapt() returns the binary
+                                           format of type */
+};
+
+/* binding plan of executemany(): the adapters of the parameters of the
+   last row, which the values of the next row most often share */
+typedef struct
+{
+    PyObject        *key;                /* class of the value */
+    PyObject        *adapter;        /* capsule of its adapter */
+} pgbinding;
+
 
 /* --------------------------------------------------------------------- */
 /* INTERNAL FUNCTIONS */
@@ -300,6 +608,8 @@ static int check_pg_obj(pgobject *self)
     return 1;
 }
 
+static int _pg_held_merge(pgsourceobject *self);
+
 /* checks source object validity */
 static int
 check_source_obj(pgsourceobject *self, int level)
@@ -327,6 +637,14 @@ check_source_obj(pgsourceobject *self, int level)
                         "Database connection was reset since cursor's creation.");
         return 0;
     }
+    if ((level & CHECK_ROWS) && self->streaming == STREAM_HELD &&
+        !_pg_held_merge(self))
+        return 0;
+    if ((level & CHECK_ROWS) && self->streaming != STREAM_NONE) {
+        PyErr_SetString(NotSupportedError,
+                        "not supported for streamed or spilled results.");
+        return 0;
+    }
     return 1;
 }
 
@@ -356,12 +674,28 @@ static int check_no_args(PyObject *args, const char *fname)
 /* --------------------------------------------------------------------- */
 /* PG SOURCE OBJECT IMPLEMENTATION */
 
-/* clear the execution status of a source object */
-static void _pg_source_clear(pgsourceobject *self)
+/* clear the last result of a source object, keeping the results of a
+   multi-statement query after it */
+static void _pg_source_clear_result(pgsourceobject *self)
 {
-    if (!self)
-        return;
-    if (self->last_result)
+    _pg_stream_end(self);
+    _pg_store_free(self);
+    Py_XDECREF(self->chunks);
+    self->chunks = NULL;
+    self->chunkpos = 0;
+    self->streaming = STREAM_NONE;
+    self->streamed = 0;
+    _pg_source_clear_columns(self);
+    Py_XDECREF(self->description);
+    self->description = NULL;
+    Py_XDECREF(self->names);
+    self->names = NULL;
+    self->view = NULL;
+    /* objects referencing the result free it when they are done */
+    if (self->result) {
+        Py_DECREF(self->result);
+        self->result = NULL;
+    } else if (self->last_result)
         PQclear(self->last_result);
     self->result_type = RESULT_EMPTY;
     self->last_result = NULL;
@@ -370,6 +704,15 @@ static void _pg_source_clear(pgsourceobject *self)
     self->num_fields = 0;
 }
 
+/* clear the execution status of a source object */
+static void _pg_source_clear(pgsourceobject *self)
+{
+    if (!self)
+        return;
+    _pg_sets_free(self);
+    _pg_source_clear_result(self);
+}
+
 /* closes object */
 static char pgsource_close__doc__[] =
 "close() -- close query object without deleting it. "
@@ -392,6 +735,10 @@ pgsource_close(pgsourceobject * self, PyObject * args)
     Py_XDECREF(self->query);
     self->query = NULL;
     self->name = NULL;
+    if (self->paramtypes)
+        free(self->paramtypes);
+    self->paramtypes = NULL;
+    self->nparamtypes = 0;
 
     /* return None */
     Py_INCREF(Py_None);
@@ -475,6 +822,14 @@ static void _pgsource_freeparams(pgparams *params)
         free(params->paramLengths);
     if (params->paramFormats)
         free(params->paramFormats);
+    if (params->fixed)
+        free(params->fixed);
+    if (params->objects) {
+        int i;
+        for (i = 0; i < params->nParams; i++)
+            Py_XDECREF(params->objects[i]);
+        free(params->objects);
+    }
     free(params);
     return;
 }
@@ -495,18 +850,105 @@ static pgparams *_pgsource_newparams(int nParams)
     ret->paramLengths = calloc(ret->nParams, sizeof(int));
     ret->paramFormats = calloc(ret->nParams, sizeof(int));
     ret->mustFree = calloc(ret->nParams, sizeof(int));
+    ret->fixed = calloc(ret->nParams, sizeof(*ret->fixed));
+    ret->objects = calloc(ret->nParams, sizeof(PyObject *));
     if (ret->paramTypes == NULL || ret->paramValues == NULL ||
         ret->paramLengths == NULL || ret->paramFormats == NULL ||
-        ret->mustFree == NULL) {
+        ret->mustFree == NULL || ret->fixed == NULL ||
+        ret->objects == NULL) {
         _pgsource_freeparams(ret);
         return NULL;
     }
     return ret;
 }
+/* adapters of the classes of values, defined below */
+static PyObject *_pg_adapter_get(PyObject *key);
+
+/* the class an adapter is looked up by: the type of values, and the
+   class of instances of classic classes */
+#define PG_ADAPTER_KEY(value) (PyInstance_Check(value) ? \
+    (PyObject *)((PyInstanceObject *)(value))->in_class : \
+    (PyObject *)(value)->ob_type)
+
+/* the text of a unicode parameter in the client encoding of its
+   connection */
+static PyObject *_pg_unicode_to_text(pgobject *pgcnx, PyObject *value)
+{
+    if (pgcnx->utf8 || pgcnx->encoding == NULL)
+        return PyUnicode_AsUTF8String(value);
+    return PyUnicode_AsEncodedString(value, PyString_AS_STRING(pgcnx->encoding),
+                                     NULL);
+}
+
+/* sets parameter i to a string, which it keeps a reference to instead
+   of a copy; steals the reference */
+static int _pg_param_string(pgparams *params, int i, PyObject *str, Oid type,
+                            int format)
+{
+    const void *data;
+    Py_ssize_t len;
+
+    if (PyUnicode_Check(str)) {
+        PyObject *text = _pg_unicode_to_text(params->pgcnx, str);
+        Py_DECREF(str);
+        if ((str = text) == NULL)
+            return 0;
+    }
+    /* text values are read up to their NUL */
+    if (!(PyString_Check(str) || (format && PyObject_CheckReadBuffer(str)))) {
+        PyErr_Format(PyExc_TypeError, "parameter must be adapted to a "
+                     "string, not %.200s", str->ob_type->tp_name);
+        Py_DECREF(str);
+        return 0;
+    }
+    if (PyObject_AsReadBuffer(str, &data, &len) < 0) {
+        Py_DECREF(str);
+        return 0;
+    }
+    params->objects[i] = str;
+    params->paramValues[i] = (char *) data;
+    params->paramLengths[i] = len;
+    params->paramTypes[i] = type;
+    params->paramFormats[i] = format;
+    return 1;
+}
+
+/* text form of a parameter, for values which do not fit the type of
+   their parameter */
+static int _pg_param_text(pgparams *params, int i, PyObject *param, Oid type)
+{
+    PyObject *str;
+    char *value;
+
+    if (PyBool_Check(param)) {
+        params->paramValues[i] = param == Py_True ? "TRUE" : "FALSE";
+        params->paramTypes[i] = type ? type : BOOLOID;
+        return 1;
+    }
+    if (PyFloat_Check(param)) {
+        /* repr() precision: the value reads back as the same double */
+        if ((value = PyOS_double_to_string(PyFloat_AS_DOUBLE(param),
+                                           'r', 0, 0, NULL)) == NULL)
+            return 0;
+        str = PyString_FromString(value);
+        PyMem_Free(value);
+    } else
+        str = PyObject_Str(param);
+    if (str == NULL)
+        return 0;
+    return _pg_param_string(params, i, str, type, 0);
+}
+
 /* process a tuple/list containing the bind parameters for a query and
    return a structure that contains the necessary elements for a
-   PQexecParams or PQexecPrepared call */
-static pgparams *_pgsource_getparams(PyObject *params)
+   PQexecParams or PQexecPrepared call; types are the types of the
+   parameters of a prepared statement, or NULL for the types of the
+   values, and the values are encoded in the binary format of these
+   types where we can.  The plan of executemany() keeps the adapters
+   of the first nplan parameters from one row to the next. */
+static pgparams *_pgsource_getparams(pgobject *pgcnx, PyObject *params,
+                                     Oid *types, int ntypes,
+                                     pgbinding *plan, int nplan)
 {
     pgparams *ret;
     int                i;
@@ -517,125 +959,116 @@ static pgparams *_pgsource_getparams(PyObject *params)
         ret = _pgsource_newparams(PyObject_Length(params));
     if (ret == NULL)
         return NULL;
+    ret->pgcnx = pgcnx;
 
     for (i = 0; i < ret->nParams; i++) {
         PyObject *param;
-        param = PySequence_GetItem(params, i);
+        Oid type = (types && i < ntypes) ? types[i] : 0;
+        int ok = 1;
 
-        /* bool is s subclass of Int, so we need to check first for it */
-        if (PyBool_Check(param)) {
-            if (param == Py_True)
-                ret->paramValues[i] = "TRUE";
-            else
-                ret->paramValues[i] = "FALSE";
-            ret->paramTypes[i] = BOOLOID;
-        } else if (PyInt_Check(param) || PyLong_Check(param)) {
-            PyObject *str = PyObject_Str(param);
-            ret->paramValues[i] = strdup(PyString_AsString(str));
-            if (ret->paramValues[i] == NULL) {
-                Py_DECREF(param);
-                Py_DECREF(str);
-                _pgsource_freeparams(ret);
-                PyErr_SetString(ProgrammingError, "out of memory binding paramaters");
-                return NULL;
-            }
-            ret->mustFree[i] = 1;
-#if(SIZEOF_LONG > 4)
-            ret->paramTypes[i] = INT8OID;
-#else
-            if (PyInt_Check(param))
-                ret->paramTypes[i] = INT4OID;
-            else
-                ret->paramTypes[i] = INT8OID;
-#endif
-            Py_DECREF(str);
-        } else if (PyString_Check(param)) {
-            Py_ssize_t len;
-            PyString_AsStringAndSize(param, &(ret->paramValues[i]), &len);
-            ret->paramTypes[i] = TEXTOID;
-            ret->paramFormats[i] = 1;
-            ret->paramLengths[i] = len;
-        } else if (PyUnicode_Check(param)) {
+        if ((param = PySequence_GetItem(params, i)) == NULL) {
             _pgsource_freeparams(ret);
-            PyErr_SetString(ProgrammingError,
-                            "unicode strings not supported by C API");
             return NULL;
-        } else if (PyFloat_Check(param)) {
-            /* this is kind of lame - could not find any documentation
-               how to pass a double as a binary */
-            char *dblstr = malloc(128);
-            if (dblstr == NULL) {
-                Py_DECREF(param);
-                _pgsource_freeparams(ret);
-                PyErr_SetString(ProgrammingError, "out of memory binding paramaters");
-                return NULL;
-            }
-            snprintf(dblstr, 128, "%f", PyFloat_AsDouble(param));
-            ret->paramValues[i] = dblstr;
-            ret->paramTypes[i] = FLOAT8OID;
-            ret->mustFree[i] = 1;
-        } else if (param == Py_None) {
+        }
+
+        if (param == Py_None) {
             ret->paramTypes[i] = 0;
             ret->paramValues[i] = 0;
-        } else { /* this is an object that hopefully we can str() */
-            PyObject *o = NULL;
-            PyObject *str = NULL;
+        } else if (PyString_Check(param) || PyUnicode_Check(param)) {
+            PyObject *str = param;
             Py_ssize_t len;
-            char *value;
-
-            if (PyObject_HasAttrString(param, "__pgsql_typeoid__")) {
-                o = PyObject_GetAttrString(param, "__pgsql_typeoid__");
-                if (o == NULL) {
-                    Py_DECREF(param);
-                    _pgsource_freeparams(ret);
-                    return NULL;
-                }
-                if (PyInt_Check(o))
-                    ret->paramTypes[i] = PyInt_AsLong(o);
-                else {
-                    Py_DECREF(param);
-                    _pgsource_freeparams(ret);
-                    PyErr_SetString(ProgrammingError,
-                                    "__pgsql_typeoid__ not an int");
-                    return NULL;
+
+            /* unicode is sent in the client encoding, and kept until
+               the parameters are freed */
+            if (PyUnicode_Check(param) &&
+                (str = ret->objects[i] = _pg_unicode_to_text(pgcnx,
+                                                             param)) == NULL)
+                ok = 0;
+            else {
+                PyString_AsStringAndSize(str, &(ret->paramValues[i]), &len);
+                ret->paramLengths[i] = len;
+                /* as text, strings are their binary format; otherwise
+                   the server reads the value of the type from them */
+                switch (type) {
+                    case 0:
+                        type = TEXTOID;
+                        /* fall through */
+                    case TEXTOID:
+                    case VARCHAROID:
+                    case BPCHAROID:
+                    case NAMEOID:
+                    case BYTEAOID:
+                    case JSONOID:
+                    case UNKNOWNOID:
+                        ret->paramFormats[i] = 1;
+                        break;
                 }
+                ret->paramTypes[i] = type;
             }
-
-            /* is this an object that needs to be treated as a binary one? */
-            if (PyObject_HasAttrString(param, "__binary__"))
+        } else if (PyBuffer_Check(param)) {
+            /* buffers are sent as binary bytea, without copying them */
+            const void *data;
+            Py_ssize_t len;
+            if (PyObject_AsReadBuffer(param, &data, &len) < 0)
+                ok = 0;
+            else {
+                ret->paramValues[i] = (char *) data;
+                ret->paramTypes[i] = BYTEAOID;
                 ret->paramFormats[i] = 1;
-            /* try to quote the object */
-            if (PyObject_HasAttrString(param, "__pgquote__"))
-                o = PyObject_GetAttrString(param, "__pgquote__");
-            else if (PyObject_HasAttrString(param, "__quote__"))
-                o = PyObject_GetAttrString(param, "__quote__");
-
-            if (o != NULL && PyCallable_Check(o))
-                str = PyObject_CallObject(o, NULL);
-            else /* hope for the best */
-                str = PyObject_Str(param);
-
-            PyString_AsStringAndSize(str, &value, &len);
-            ret->paramValues[i] = calloc(1, len+1);
-            if (ret->paramValues[i] == NULL) {
-                Py_XDECREF(o);
-                Py_DECREF(str);
-                Py_DECREF(param);
-                _pgsource_freeparams(ret);
-                PyErr_SetString(ProgrammingError, "out of memory binding paramaters");
-                return NULL;
+                ret->paramLengths[i] = len;
+            }
+        } else {
+            PyObject *key = PG_ADAPTER_KEY(param);
+            PyObject *capsule;
+            pgadapter *adapter;
+
+            if (i < nplan && plan[i].key == key) {
+                capsule = plan[i].adapter;
+                Py_INCREF(capsule);
+            } else if ((capsule = _pg_adapter_get(key)) != NULL &&
+                       i < nplan) {
+                Py_XDECREF(plan[i].key);
+                Py_XDECREF(plan[i].adapter);
+                Py_INCREF(key);
+                Py_INCREF(capsule);
+                plan[i].key = key;
+                plan[i].adapter = capsule;
+            }
+            if (capsule == NULL)
+                ok = 0;
+            else {
+                adapter = PyCapsule_GetPointer(capsule, NULL);
+                ok = adapter->encode(ret, i, param, type, adapter);
+                if (ok == 0)
+                    ok = _pg_param_text(ret, i, param, type);
+                else if (ok < 0)
+                    ok = 0;
+                Py_DECREF(capsule);
             }
-            ret->mustFree[i] = 1;
-            memcpy(ret->paramValues[i], value, len);
-            ret->paramLengths[i] = len;
-            Py_XDECREF(o);
-            Py_DECREF(str);
         }
         Py_DECREF(param);
+        if (!ok) {
+            _pgsource_freeparams(ret);
+            return NULL;
+        }
     }
     return ret;
 }
 
+/* releases the binding plan of executemany() */
+static void _pg_bindings_free(pgbinding *plan, int nplan)
+{
+    int i;
+
+    if (plan == NULL)
+        return;
+    for (i = 0; i < nplan; i++) {
+        Py_XDECREF(plan[i].key);
+        Py_XDECREF(plan[i].adapter);
+    }
+    free(plan);
+}
+
 /* internal function - convert singletons to tuples for binding */
 static PyObject *_pg_item_astuple(PyObject *item)
 {
@@ -668,6 +1101,12 @@ static PyObject *_pg_item_astuple(PyObject *item)
     return tuple;
 }
 
+/* streaming, defined below */
+static PyObject *_pg_stream_start(pgsourceobject *self, char *query,
+                                  pgparams *binds);
+static PyObject *_pg_budget_execute(pgsourceobject *self, char *query,
+                                    pgparams *binds);
+
 /* database query */
 static char pgsource_execute__doc__[] =
 "execute(sql[,params]) -- execute a SQL statement (string) optionally using parameters.\n "
@@ -713,8 +1152,23 @@ pgsource_execute(pgsourceobject *self, PyObject * args)
             return NULL;
         }
 
-    if ((binds = _pgsource_getparams(params)) == NULL)
+    binds = _pgsource_getparams(self->pgcnx, params, self->paramtypes,
+                                self->nparamtypes, NULL, 0);
+    if (binds == NULL) {
+        if (params != Py_None) {
+            Py_DECREF(params);
+        }
         return NULL;
+    }
+
+    /* with a memory budget, the rows are read as a stream */
+    if (!self->prepared && self->pgcnx->budget > 0) {
+        PyObject *result = _pg_budget_execute(self, query, binds);
+        if (params != Py_None) {
+            Py_DECREF(params);
+        }
+        return result;
+    }
 
     /* now run the query */
     Py_BEGIN_ALLOW_THREADS ;
@@ -729,7 +1183,7 @@ pgsource_execute(pgsourceobject *self, PyObject * args)
                                            (const char **)binds->paramValues,
                                            binds->paramLengths,
                                            binds->paramFormats,
-                                           0);
+                                           self->binary);
     } else {
         self->last_result = PQexecParams(self->pgcnx->cnx,
                                          query,
@@ -738,7 +1192,7 @@ pgsource_execute(pgsourceobject *self, PyObject * args)
                                          (const char **)binds->paramValues,
                                          binds->paramLengths,
                                          binds->paramFormats,
-                                         0);
+                                         self->binary);
     }
     Py_END_ALLOW_THREADS ;
 
@@ -772,479 +1226,5475 @@ pgsource_query(pgsourceobject *self, PyObject * args)
     /* frees previous result */
     _pg_source_clear(self);
 
-    /* now run the query */
+    /* now run the query; PQexec can only return text-format results */
     Py_BEGIN_ALLOW_THREADS ;
-    self->last_result = PQexec(self->pgcnx->cnx, query);
+    if (self->binary)
+        self->last_result = PQexecParams(self->pgcnx->cnx, query,
+                                         0, NULL, NULL, NULL, NULL, 1);
+    else
+        self->last_result = PQexec(self->pgcnx->cnx, query);
     Py_END_ALLOW_THREADS ;
 
     return _pgsource_postexec(self);
 }
 
-/* helper function for checking the results of the executemany */
-static int _pg_result_check(PGconn *conn, PGresult *result)
-{
-    int failed;
-
-    if (!result) {
-        PyErr_SetString(PyExc_ValueError, PQerrorMessage(conn));
-        return 0;
-    }
-    /* check result status */
-    switch (PQresultStatus(result)) {
-        /* these are the only return values we accept as success */
-        case PGRES_COMMAND_OK:
-        case PGRES_TUPLES_OK:
-            /* all cool */
-            failed = 0;
-            break;
-        case PGRES_EMPTY_QUERY:
-            PyErr_SetString(PyExc_ValueError, "empty query.");
-            failed = 1;
-            break;
-            /* query failed */
-        case PGRES_BAD_RESPONSE:
-        case PGRES_FATAL_ERROR:
-        case PGRES_NONFATAL_ERROR:
-            PyErr_SetString(ProgrammingError, PQerrorMessage(conn));
-            failed = 1;
-            break;
-        default:
-            failed = 1;
-            PyErr_SetString(InternalError, "internal error: unknown result status.");
-            break;
-    }
-    if (failed) {
-        /* frees result and returns error */
-        PQclear(result);
-        return 0;
-    }
-    return 1;
-}
-
-/* bulk database ops */
-static char pgsource_executemany__doc__[] =
-"execute(sql, params) -- execute a SQL statement (string) using parameters.\n ";
+/* multi-statement query, with the result of each statement */
+static char pgsource_queryall__doc__[] =
+"queryall(sql) -- execute a string of SQL statements in a single round "
+"trip.\n"
+"The results of the statements are read in text format, and the first "
+"one is processed as by query(); nextset() moves to the next one.";
 static PyObject *
-pgsource_executemany(pgsourceobject * self, PyObject * args)
+pgsource_queryall(pgsourceobject *self, PyObject * args)
 {
-    char        *query = NULL;
-    int                query_len = 0;
-    PyObject        *result = NULL;
-    PyObject        *paramsList = NULL;
-    PGresult        *prep = NULL;
-    int                ret;
-    PyObject        *iterator = NULL;
-    PyObject        *item = NULL;
+    char        *query;
+    int                query_len, sent, failed = -1, count = 0, size = 4;
+    PGresult        **results, *result;
 
     /* check cursor validity */
-    if (!check_source_obj(self, self->prepared ? CHECK_CNX | CHECK_CONNID : CHECK_CNX))
+    if (!check_source_obj(self, CHECK_CNX))
         return NULL;
 
-    /* if this is a prepared source, we can't executemany */
-    if (self->prepared)
-        ret = PyArg_ParseTuple(args, "O:execute", &paramsList);
-    else
-        ret = PyArg_ParseTuple(args, "s#O:execute", &query, &query_len, &paramsList);
-    /* params must be a sequence or an iterator */
-    if ( !ret || paramsList == Py_None ||
-         !(PySequence_Check(paramsList) || PyIter_Check(paramsList)) ) {
-        PyErr_SetString(PyExc_TypeError, "execute(sql,params), with sql(string) and params(list of tuples).");
+    if (!PyArg_ParseTuple(args, "s#:queryall", &query, &query_len)) {
+        PyErr_SetString(PyExc_TypeError, "queryall(sql), with sql(string).");
         return NULL;
     }
 
     /* frees previous result */
     _pg_source_clear(self);
 
-    if (!self->prepared) {
-        /* we need to prepare a statement to execute for the paramsList */
-        Py_BEGIN_ALLOW_THREADS ;
-        prep = PQprepare(self->pgcnx->cnx, "", query, 0, NULL);
-        Py_END_ALLOW_THREADS ;
+    if ((results = malloc(size * sizeof(PGresult *))) == NULL)
+        return PyErr_NoMemory();
 
-        if (!_pg_result_check(self->pgcnx->cnx, prep))
-            return NULL;
+    /* sends the statements, and reads the result of each, up to an error
+       or the start of a COPY, after which there are none */
+    Py_BEGIN_ALLOW_THREADS ;
+    sent = PQsendQuery(self->pgcnx->cnx, query);
+    while (sent && (result = PQgetResult(self->pgcnx->cnx)) != NULL) {
+        if (failed >= 0 || results == NULL) {
+            PQclear(result);
+            continue;
+        }
+        if (count == size) {
+            PGresult **more = realloc(results, 2 * size * sizeof(PGresult *));
+            if (more == NULL) {
+                PQclear(result);
+                for (; count > 0; count--)
+                    PQclear(results[count - 1]);
+                free(results);
+                results = NULL;
+                continue;
+            }
+            results = more;
+            size *= 2;
+        }
+        results[count++] = result;
+        switch (PQresultStatus(result)) {
+            case PGRES_COPY_IN:
+            case PGRES_COPY_OUT:
+                sent = 0;
+                break;
+            case PGRES_TUPLES_OK:
+            case PGRES_COMMAND_OK:
+                break;
+            default:
+                failed = count - 1;
+                break;
+        }
     }
+    Py_END_ALLOW_THREADS ;
 
-    /* we have now our prepared statement, loop over the paramList */
-    iterator = PyObject_GetIter(paramsList);
-    if (!iterator) {
-        PyErr_SetString(ProgrammingError, "can not iterate over the provided params list");
-        if (prep)
-            PQclear(prep);
+    if (results == NULL)
+        return PyErr_NoMemory();
+    if (count == 0) {
+        free(results);
+        PyErr_SetString(ProgrammingError, PQerrorMessage(self->pgcnx->cnx));
         return NULL;
     }
 
-    /* now loop over the params and execute the prepared query */
-    while ((item = PyIter_Next(iterator))) {
-        pgparams        *binds = NULL;
-        PyObject        *tuple;
+    /* a statement failed: the whole string is, and raises its error */
+    if (failed >= 0) {
+        self->last_result = results[failed];
+        for (; count > 0; count--)
+            if (count - 1 != failed)
+                PQclear(results[count - 1]);
+        free(results);
+        return _pgsource_postexec(self);
+    }
 
-        if ((tuple = _pg_item_astuple(item)) == NULL ) {
-            PyObject *str;
+    self->last_result = results[0];
+    if (count > 1) {
+        self->sets = results;
+        self->numsets = count;
+        self->setpos = 1;
+    } else
+        free(results);
+    return _pgsource_postexec(self);
+}
 
-            str = PyString_FromString("can not bind parameter type: ");
-            PyString_ConcatAndDel(&str, PyObject_Str(item));
-            PyErr_SetObject(ProgrammingError, str);
-            Py_DECREF(str);
+/* moves to the result of the next statement of a multi-statement query */
+static char pgsource_nextset__doc__[] =
+"nextset() -- skip to the result of the next statement of a string "
+"executed by queryall().  Returns True, or None if there are no more "
+"results, the last one being kept.";
+static PyObject *
+pgsource_nextset(pgsourceobject *self, PyObject * args)
+{
+    PyObject        *ret;
+
+    if (!check_source_obj(self, CHECK_CNX | CHECK_CONNID))
+        return NULL;
+    if (!check_no_args(args, "nextset"))
+        return NULL;
+
+    if (self->setpos >= self->numsets) {
+        Py_INCREF(Py_None);
+        return Py_None;
+    }
+
+    _pg_source_clear_result(self);
+    self->last_result = self->sets[self->setpos++];
+    if (self->setpos == self->numsets)
+        _pg_sets_free(self);
+    if ((ret = _pgsource_postexec(self)) == NULL)
+        return NULL;
+    Py_DECREF(ret);
+
+    Py_INCREF(Py_True);
+    return Py_True;
+}
+
+/* STREAMING
+
+   A streamed result is read a row at a time as the server sends it, in
+   libpq's single-row mode, or in chunks of rows where libpq has chunked
+   mode. The statement is described first, as the unnamed statement,
+   so that the decoding plan is compiled, and the types it needs are
+   loaded, before the rows arrive: the connection cannot run other
+   queries until the last row is read. The statement is then sent again
+   with its parameters, since loading types drops the unnamed statement,
+   and each row result replaces the last one, with the plan kept. */
+
+#define PG_STREAM_ROWS                256                /* rows per chunk */
+
+static pgcolumn *_pg_source_columns(pgsourceobject *self);
+static PyObject *_pg_result_row(pgsourceobject *self, int row);
+
+/* replaces the last result of a streaming source by its next rows */
+static void _pg_stream_replace(pgsourceobject *self, PGresult *result)
+{
+    self->streamed += self->max_row;
+    if (self->result) {
+        Py_DECREF(self->result);
+        self->result = NULL;
+    } else
+        PQclear(self->last_result);
+    self->last_result = result;
+    self->max_row = PQntuples(result);
+    self->current_row = 0;
+}
+
+static int _pg_store_next(pgsourceobject *self);
+static int _pg_held_next(pgsourceobject *self);
+
+/* reads the next rows of a streaming source when the rows at hand are
+   fetched; returns 0 on errors */
+static int _pg_stream_next(pgsourceobject *self)
+{
+    PGresult *result;
+
+    if (self->streaming == STREAM_SPILLED && self->current_row >= self->max_row)
+        return _pg_store_next(self);
+    if (self->streaming == STREAM_HELD && self->current_row >= self->max_row)
+        return _pg_held_next(self);
+    if (self->streaming != STREAM_ACTIVE || self->current_row < self->max_row)
+        return 1;
+    Py_BEGIN_ALLOW_THREADS ;
+    result = PQgetResult(self->pgcnx->cnx);
+    Py_END_ALLOW_THREADS ;
+
+    switch (result ? PQresultStatus(result) : PGRES_TUPLES_OK) {
+        case PGRES_SINGLE_TUPLE:
+#ifdef LIBPQ_HAS_CHUNK_MODE
+        case PGRES_TUPLES_CHUNK:
+#endif
+            break;
+        case PGRES_TUPLES_OK:        /* no more rows */
+            _pg_stream_end(self);
+            break;
+        default:
+            PyErr_SetString(ProgrammingError, PQresultErrorMessage(result));
+            PQclear(result);
+            _pg_source_clear(self);
+            return 0;
+    }
+    if (result == NULL)
+        return 1;
+
+    _pg_stream_replace(self, result);
+    return 1;
+}
+
+/* the next rows of a streaming source, all of them for a negative size */
+static PyObject *_pg_stream_rows(pgsourceobject *self, long size)
+{
+    PyObject *reslist, *rowtuple;
+
+    if ((reslist = PyList_New(0)) == NULL)
+        return NULL;
+    while (size < 0 || PyList_GET_SIZE(reslist) < size) {
+        if (!_pg_stream_next(self))
+            goto error;
+        if (self->current_row >= self->max_row)
+            break;
+        if ((rowtuple = _pg_result_row(self, self->current_row)) == NULL)
+            goto error;
+        self->current_row++;
+        if (PyList_Append(reslist, rowtuple) < 0) {
+            Py_DECREF(rowtuple);
+            goto error;
+        }
+        Py_DECREF(rowtuple);
+    }
+    return reslist;
+
+error:
+    Py_DECREF(reslist);
+    return NULL;
+}
+
+/* starts streaming the rows of a statement, or executes it if it returns
+   no rows, as execute(); frees the parameters */
+static PyObject *_pg_stream_start(pgsourceobject *self, char *query,
+                                  pgparams *binds)
+{
+    PGconn        *cnx = self->pgcnx->cnx;
+    PGresult        *result;
+    int                sent;
+
+    /* describe the statement */
+    Py_BEGIN_ALLOW_THREADS ;
+    result = PQprepare(cnx, "", query, binds->nParams, binds->paramTypes);
+    if (PQresultStatus(result) == PGRES_COMMAND_OK) {
+        PQclear(result);
+        result = PQdescribePrepared(cnx, "");
+    }
+    Py_END_ALLOW_THREADS ;
+    self->last_result = result;
+    if (PQresultStatus(result) != PGRES_COMMAND_OK) {
+        _pgsource_freeparams(binds);
+        return _pgsource_postexec(self);
+    }
+
+    /* statements without rows are simply executed */
+    if (PQnfields(result) == 0) {
+        PQclear(result);
+        Py_BEGIN_ALLOW_THREADS ;
+        self->last_result = PQexecParams(cnx, query, binds->nParams,
+                                         binds->paramTypes,
+                                         (const char **)binds->paramValues,
+                                         binds->paramLengths,
+                                         binds->paramFormats,
+                                         self->binary);
+        Py_END_ALLOW_THREADS ;
+        _pgsource_freeparams(binds);
+        return _pgsource_postexec(self);
+    }
+
+    /* the description stands for the rows until they arrive */
+    self->result_type = RESULT_DQL;
+    self->num_fields = PQnfields(result);
+    self->max_row = self->current_row = 0;
+    self->streaming = STREAM_ACTIVE;
+    if (_pg_source_columns(self) == NULL) {
+        _pgsource_freeparams(binds);
+        _pg_source_clear(self);
+        return NULL;
+    }
+
+    Py_BEGIN_ALLOW_THREADS ;
+    sent = PQsendQueryParams(cnx, query, binds->nParams, binds->paramTypes,
+                             (const char **)binds->paramValues,
+                             binds->paramLengths, binds->paramFormats,
+                             self->binary);
+#ifdef LIBPQ_HAS_CHUNK_MODE
+    if (sent)
+        PQsetChunkedRowsMode(cnx, PG_STREAM_ROWS);
+#else
+    if (sent)
+        PQsetSingleRowMode(cnx);
+#endif
+    Py_END_ALLOW_THREADS ;
+    _pgsource_freeparams(binds);
+    if (!sent) {
+        PyErr_SetString(OperationalError, PQerrorMessage(cnx));
+        _pg_source_clear(self);
+        return NULL;
+    }
+    self->pgcnx->streaming = 1;
+
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+/* MEMORY BUDGET
+
+   With a memory budget, a statement is sent as it is, and the rows of
+   its result read as a stream. Where libpq has chunked mode, the chunks
+   are kept as they arrive and their PQresultMemorySize() summed; in
+   single-row mode, where a result for each row takes much more memory
+   than the row, the rows are gathered into one result instead. When the
+   rows outgrow the budget, they are written to an unlinked temporary
+   file, as the length of each cell (-1 for NULL) followed by its bytes,
+   which is mapped into memory when all of them are read, and fetched a
+   chunk of rows at a time like a streamed result. Several chunks kept
+   are fetched one after the other, and only joined into one result for
+   the methods that need all the rows at hand. */
+
+#ifdef LIBPQ_HAS_CHUNK_MODE
+#define PG_HOLD_CHUNKS                /* the chunks of a result are kept */
+#endif
+
+/* a pg result object of a result, which it frees */
+static PyObject *_pg_result_object(PGresult *result)
+{
+    pgresultobject *obj;
+
+    if ((obj = PyObject_NEW(pgresultobject, &PgResultType)) == NULL)
+        return NULL;
+    obj->result = result;
+    return (PyObject *) obj;
+}
+
+/* the result of a pg result object in a list of them */
+static PGresult *_pg_chunk(PyObject *chunks, Py_ssize_t i)
+{
+    return ((pgresultobject *) PyList_GET_ITEM(chunks, i))->result;
+}
+
+/* appends a result to a list of pg result objects, which frees it;
+   returns 0 on errors */
+static int _pg_hold(PyObject *chunks, PGresult *result)
+{
+    PyObject *chunk;
+    int ok;
+
+    if (result == NULL) {
+        PyErr_NoMemory();
+        return 0;
+    }
+    if ((chunk = _pg_result_object(result)) == NULL) {
+        PQclear(result);
+        return 0;
+    }
+    ok = PyList_Append(chunks, chunk) == 0;
+    Py_DECREF(chunk);
+    return ok;
+}
+
+/* an unlinked temporary file, in TMPDIR; sets an error if none is made */
+static FILE *_pg_spill_file(void)
+{
+    const char *dir = getenv("TMPDIR");
+    char path[1024];
+    FILE *file;
+    int fd;
+
+    snprintf(path, sizeof(path), "%s/pgsql-XXXXXX",
+             dir && *dir ? dir : "/tmp");
+    if ((fd = mkstemp(path)) < 0) {
+        PyErr_SetFromErrnoWithFilename(OperationalError, path);
+        return NULL;
+    }
+    unlink(path);
+    if ((file = fdopen(fd, "w+b")) == NULL) {
+        PyErr_SetFromErrno(OperationalError);
+        close(fd);
+    }
+    return file;
+}
+
+/* writes the rows of a result to a spill file; returns 0 on errors */
+static int _pg_spill_rows(FILE *file, PGresult *result)
+{
+    int row, col, len;
+
+    for (row = 0; row < PQntuples(result); row++)
+        for (col = 0; col < PQnfields(result); col++) {
+            len = PQgetisnull(result, row, col) ?
+                -1 : PQgetlength(result, row, col);
+            if (fwrite(&len, sizeof(len), 1, file) != 1 ||
+                (len > 0 && fwrite(PQgetvalue(result, row, col), len, 1,
+                                   file) != 1)) {
+                PyErr_SetFromErrno(OperationalError);
+                return 0;
+            }
+        }
+    return 1;
+}
+
+/* appends the rows of a result to another; returns 0 on errors */
+static int _pg_append_rows(PGresult *dest, PGresult *result)
+{
+    int row, col, n = PQntuples(dest);
+
+    for (row = 0; row < PQntuples(result); row++, n++)
+        for (col = 0; col < PQnfields(result); col++)
+            if (!PQsetvalue(dest, n, col, PQgetisnull(result, row, col) ?
+                            NULL : PQgetvalue(result, row, col),
+                            PQgetisnull(result, row, col) ?
+                            -1 : PQgetlength(result, row, col))) {
+                PyErr_NoMemory();
+                return 0;
+            }
+    return 1;
+}
+
+/* reads the next chunk of the rows of a spilled result; returns 0 on
+   errors */
+static int _pg_store_next(pgsourceobject *self)
+{
+    PGresult *result;
+    int row, col, len, n = PQnfields(self->last_result);
+    char *p = self->store + self->storepos, *end = self->store + self->storesize;
+    size_t page, start;
+
+    if (p >= end)
+        return 1;
+    if ((result = PQcopyResult(self->last_result, PG_COPYRES_ATTRS)) == NULL) {
+        PyErr_NoMemory();
+        return 0;
+    }
+    for (row = 0; row < PG_STREAM_ROWS && p < end; row++)
+        for (col = 0; col < n; col++) {
+            memcpy(&len, p, sizeof(len));
+            p += sizeof(len);
+            if (!PQsetvalue(result, row, col, len < 0 ? NULL : p, len)) {
+                PQclear(result);
+                PyErr_NoMemory();
+                return 0;
+            }
+            if (len > 0)
+                p += len;
+        }
+    /* the pages read are given back, so that they are not kept mapped */
+    page = sysconf(_SC_PAGESIZE);
+    start = self->storepos / page * page;
+    self->storepos = p - self->store;
+    if (self->storepos / page * page > start)
+        madvise(self->store + start, self->storepos / page * page - start,
+                MADV_DONTNEED);
+    _pg_stream_replace(self, result);
+    return 1;
+}
+
+/* moves to the next chunk kept of a result */
+static int _pg_held_next(pgsourceobject *self)
+{
+    PyObject *chunk;
+
+    if (self->chunkpos + 1 >= PyList_GET_SIZE(self->chunks))
+        return 1;
+    chunk = PyList_GET_ITEM(self->chunks, ++self->chunkpos);
+    Py_INCREF(chunk);
+    _pg_stream_replace(self, ((pgresultobject *) chunk)->result);
+    self->result = chunk;
+    return 1;
+}
+
+/* joins the chunks kept of a result into one result, for the methods
+   that need all its rows at hand; returns 0 on errors */
+static int _pg_held_merge(pgsourceobject *self)
+{
+    PGresult *result;
+    Py_ssize_t i;
+
+    if ((result = PQcopyResult(self->last_result, PG_COPYRES_ATTRS)) == NULL) {
+        PyErr_NoMemory();
+        return 0;
+    }
+    for (i = 0; i < PyList_GET_SIZE(self->chunks); i++)
+        if (!_pg_append_rows(result, _pg_chunk(self->chunks, i))) {
+            PQclear(result);
+            return 0;
+        }
+    Py_CLEAR(self->result);
+    Py_CLEAR(self->chunks);
+    self->chunkpos = 0;
+    self->storerows = 0;
+    self->streaming = STREAM_NONE;
+    self->last_result = result;
+    self->current_row += self->streamed;
+    self->streamed = 0;
+    self->max_row = PQntuples(result);
+    /* the plan is made again, for values which keep the result */
+    _pg_source_clear_columns(self);
+    return 1;
+}
+
+/* executes a statement within the memory budget of the connection, as
+   execute(); frees the parameters */
+static PyObject *_pg_budget_execute(pgsourceobject *self, char *query,
+                                    pgparams *binds)
+{
+    PGconn        *cnx = self->pgcnx->cnx;
+    PGresult        *result, *final = NULL, *last = NULL;
+    PyObject        *chunks = NULL;
+    FILE        *spill = NULL;
+    size_t        size = 0;
+    long        count = 0;
+    int                ok, done = 0;
+    void        *store;
+
+    Py_BEGIN_ALLOW_THREADS ;
+    ok = PQsendQueryParams(cnx, query, binds->nParams, binds->paramTypes,
+                           (const char **)binds->paramValues,
+                           binds->paramLengths, binds->paramFormats,
+                           self->binary);
+#ifdef LIBPQ_HAS_CHUNK_MODE
+    if (ok)
+        PQsetChunkedRowsMode(cnx, PG_STREAM_ROWS);
+#else
+    if (ok)
+        PQsetSingleRowMode(cnx);
+#endif
+    Py_END_ALLOW_THREADS ;
+    _pgsource_freeparams(binds);
+    if (!ok) {
+        PyErr_SetString(OperationalError, PQerrorMessage(cnx));
+        return NULL;
+    }
+    self->pgcnx->streaming = 1;
+
+    /* after an error, the results are still read to the end */
+    while (!done) {
+        Py_BEGIN_ALLOW_THREADS ;
+        result = PQgetResult(cnx);
+        Py_END_ALLOW_THREADS ;
+        if (result == NULL)
+            break;
+        switch (PQresultStatus(result)) {
+            case PGRES_SINGLE_TUPLE:
+#ifdef LIBPQ_HAS_CHUNK_MODE
+            case PGRES_TUPLES_CHUNK:
+#endif
+                count += PQntuples(result);
+                if (!ok)
+                    break;
+                if (spill) {
+                    ok = _pg_spill_rows(spill, result);
+                    break;
+                }
+                if (chunks == NULL && (chunks = PyList_New(0)) == NULL) {
+                    ok = 0;
+                    break;
+                }
+#ifdef PG_HOLD_CHUNKS
+                size += PQresultMemorySize(result);
+                ok = _pg_hold(chunks, result);
+                result = NULL;
+#else
+                if (PyList_GET_SIZE(chunks) == 0)
+                    ok = _pg_hold(chunks,
+                                  PQcopyResult(result, PG_COPYRES_ATTRS));
+                if (ok)
+                    ok = _pg_append_rows(_pg_chunk(chunks, 0), result);
+                if (ok)
+                    size = PQresultMemorySize(_pg_chunk(chunks, 0));
+#endif
+                if (ok && size > (size_t)self->pgcnx->budget) {
+                    Py_ssize_t i;
+
+                    if ((spill = _pg_spill_file()) == NULL)
+                        ok = 0;
+                    for (i = 0; ok && i < PyList_GET_SIZE(chunks); i++)
+                        ok = _pg_spill_rows(spill, _pg_chunk(chunks, i));
+                    if (ok && (last = PQcopyResult(_pg_chunk(chunks, 0),
+                                                   PG_COPYRES_ATTRS)) == NULL) {
+                        PyErr_NoMemory();
+                        ok = 0;
+                    }
+                    Py_CLEAR(chunks);
+                }
+                break;
+            case PGRES_COPY_IN:
+            case PGRES_COPY_OUT:
+                /* the connection is left to copy the data */
+                done = 1;
+                /* fall through */
+            default:
+                /* the result of the statement, or its error */
+                PQclear(final);
+                final = result;
+                result = NULL;
+                break;
+        }
+        PQclear(result);
+    }
+    self->pgcnx->streaming = 0;
+    if (!ok)
+        goto error;
+
+    /* statements without rows, or failed */
+    if (final == NULL || PQresultStatus(final) != PGRES_TUPLES_OK ||
+        (chunks == NULL && spill == NULL)) {
+        Py_XDECREF(chunks);
+        PQclear(last);
+        self->last_result = final;
+        return _pgsource_postexec(self);
+    }
+
+    self->result_type = RESULT_DQL;
+    self->num_fields = PQnfields(final);
+    self->current_row = self->max_row = 0;
+    if (spill) {
+        /* map the rows spilled */
+        size = ftell(spill);
+        if (fflush(spill) != 0 ||
+            (store = mmap(NULL, size, PROT_READ, MAP_PRIVATE,
+                          fileno(spill), 0)) == MAP_FAILED) {
+            PyErr_SetFromErrno(OperationalError);
+            goto error;
+        }
+        fclose(spill);
+        madvise(store, size, MADV_SEQUENTIAL);
+        self->streaming = STREAM_SPILLED;
+        self->store = store;
+        self->storesize = size;
+        self->storerows = count;
+        self->last_result = last;
+    } else {
+        /* the rows are at hand; several chunks are fetched in turn */
+        self->result = PyList_GET_ITEM(chunks, 0);
+        Py_INCREF(self->result);
+        self->last_result = _pg_chunk(chunks, 0);
+        self->max_row = PQntuples(self->last_result);
+        if (PyList_GET_SIZE(chunks) > 1) {
+            self->streaming = STREAM_HELD;
+            self->chunks = chunks;
+            self->chunkpos = 0;
+            self->storerows = count;
+        } else
+            Py_DECREF(chunks);
+    }
+    PQclear(final);
+    Py_INCREF(Py_None);
+    return Py_None;
+
+error:
+    if (spill)
+        fclose(spill);
+    Py_XDECREF(chunks);
+    PQclear(final);
+    PQclear(last);
+    return NULL;
+}
+
+static char pgsource_stream__doc__[] =
+"stream(sql[, params]) -- execute a SQL statement, of which the rows are "
+"read as they are fetched instead of all at once.  Until the last row is "
+"fetched, or another statement executed, the connection cannot be used "
+"otherwise.";
+static PyObject *
+pgsource_stream(pgsourceobject *self, PyObject * args)
+{
+    char        *query;
+    int                query_len;
+    PyObject        *params = Py_None, *ret;
+    pgparams        *binds = NULL;
+
+    if (!check_source_obj(self, CHECK_CNX))
+        return NULL;
+    if (self->prepared) {
+        PyErr_SetString(NotSupportedError,
+                        "prepared statements cannot be streamed.");
+        return NULL;
+    }
+    if (!PyArg_ParseTuple(args, "s#|O:stream", &query, &query_len, &params))
+        return NULL;
+
+    _pg_source_clear(self);
+
+    if (params != Py_None &&
+        (params = _pg_item_astuple(params)) == NULL) {
+        PyErr_SetString(ProgrammingError, "stream with parameters requires params as a sequence");
+        return NULL;
+    }
+    if ((binds = _pgsource_getparams(self->pgcnx, params, NULL, 0,
+                                     NULL, 0)) == NULL)
+        ret = NULL;
+    else
+        ret = _pg_stream_start(self, query, binds);
+    if (params != Py_None) {
+        Py_DECREF(params);
+    }
+    return ret;
+}
+
+/* helper function for checking the results of the executemany */
+static int _pg_result_check(PGconn *conn, PGresult *result)
+{
+    int failed;
+
+    if (!result) {
+        PyErr_SetString(PyExc_ValueError, PQerrorMessage(conn));
+        return 0;
+    }
+    /* check result status */
+    switch (PQresultStatus(result)) {
+        /* these are the only return values we accept as success */
+        case PGRES_COMMAND_OK:
+        case PGRES_TUPLES_OK:
+            /* all cool */
+            failed = 0;
+            break;
+        case PGRES_EMPTY_QUERY:
+            PyErr_SetString(PyExc_ValueError, "empty query.");
+            failed = 1;
+            break;
+            /* query failed */
+        case PGRES_BAD_RESPONSE:
+        case PGRES_FATAL_ERROR:
+        case PGRES_NONFATAL_ERROR:
+            PyErr_SetString(ProgrammingError, PQerrorMessage(conn));
+            failed = 1;
+            break;
+        default:
+            failed = 1;
+            PyErr_SetString(InternalError, "internal error: unknown result status.");
+            break;
+    }
+    if (failed) {
+        /* frees result and returns error */
+        PQclear(result);
+        return 0;
+    }
+    return 1;
+}
+
+/* reads the types of the parameters of a statement, as its parameters
+   are encoded for them; *types must be freed */
+static int _pg_param_types(PGconn *cnx, const char *name, Oid **types,
+                           int *ntypes)
+{
+    PGresult *result;
+    int i;
+
+    Py_BEGIN_ALLOW_THREADS ;
+    result = PQdescribePrepared(cnx, name);
+    Py_END_ALLOW_THREADS ;
+    if (!_pg_result_check(cnx, result))
+        return 0;
+
+    *ntypes = PQnparams(result);
+    if ((*types = malloc((*ntypes + 1) * sizeof(Oid))) == NULL) {
+        PQclear(result);
+        PyErr_NoMemory();
+        return 0;
+    }
+    for (i = 0; i < *ntypes; i++)
+        (*types)[i] = PQparamtype(result, i);
+    PQclear(result);
+    return 1;
+}
+
+/* bulk database ops */
+static char pgsource_executemany__doc__[] =
+"execute(sql, params) -- execute a SQL statement (string) using parameters.\n ";
+static PyObject *
+pgsource_executemany(pgsourceobject * self, PyObject * args)
+{
+    char        *query = NULL;
+    int                query_len = 0;
+    PyObject        *result = NULL;
+    PyObject        *paramsList = NULL;
+    PGresult        *prep = NULL;
+    int                ret;
+    PyObject        *iterator = NULL;
+    PyObject        *item = NULL;
+    Oid                *types = self->paramtypes;
+    int                ntypes = self->nparamtypes;
+    pgbinding        *plan = NULL;
+
+    /* check cursor validity */
+    if (!check_source_obj(self, self->prepared ? CHECK_CNX | CHECK_CONNID : CHECK_CNX))
+        return NULL;
+
+    /* if this is a prepared source, we can't executemany */
+    if (self->prepared)
+        ret = PyArg_ParseTuple(args, "O:execute", &paramsList);
+    else
+        ret = PyArg_ParseTuple(args, "s#O:execute", &query, &query_len, &paramsList);
+    /* params must be a sequence or an iterator */
+    if ( !ret || paramsList == Py_None ||
+         !(PySequence_Check(paramsList) || PyIter_Check(paramsList)) ) {
+        PyErr_SetString(PyExc_TypeError, "execute(sql,params), with sql(string) and params(list of tuples).");
+        return NULL;
+    }
+
+    /* frees previous result */
+    _pg_source_clear(self);
+
+    if (!self->prepared) {
+        /* we need to prepare a statement to execute for the paramsList */
+        Py_BEGIN_ALLOW_THREADS ;
+        prep = PQprepare(self->pgcnx->cnx, "", query, 0, NULL);
+        Py_END_ALLOW_THREADS ;
+
+        if (!_pg_result_check(self->pgcnx->cnx, prep))
+            return NULL;
+        if (!_pg_param_types(self->pgcnx->cnx, "", &types, &ntypes)) {
+            PQclear(prep);
+            return NULL;
+        }
+    }
+
+    /* we have now our prepared statement, loop over the paramList */
+    iterator = PyObject_GetIter(paramsList);
+    if (!iterator) {
+        PyErr_SetString(ProgrammingError, "can not iterate over the provided params list");
+        goto done;
+    }
+    /* the adapters of the values of a row are kept for the next ones */
+    if (ntypes > 0 && (plan = calloc(ntypes, sizeof(pgbinding))) == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+
+    /* now loop over the params and execute the prepared query */
+    while ((item = PyIter_Next(iterator))) {
+        pgparams        *binds = NULL;
+        PyObject        *tuple;
+
+        if ((tuple = _pg_item_astuple(item)) == NULL ) {
+            PyObject *str;
+
+            str = PyString_FromString("can not bind parameter type: ");
+            PyString_ConcatAndDel(&str, PyObject_Str(item));
+            PyErr_SetObject(ProgrammingError, str);
+            Py_DECREF(str);
 
             Py_DECREF(item);
-            Py_DECREF(iterator);
-            if (prep)
-                PQclear(prep);
+            goto done;
+        }
+
+        binds = _pgsource_getparams(self->pgcnx, tuple, types, ntypes,
+                                    plan, ntypes);
+        Py_DECREF(item);
+        Py_DECREF(tuple);
+        if (binds == NULL)
+            goto done;
+        /* now run the query */
+        if (self->prepared) {
+            if (self->name && PyString_Check(self->name))
+                query = PyString_AsString(self->name);
+            else
+                query = "";
+        } else {
+            query = "";
+        }
+        /* free previous result */
+        _pg_source_clear(self);
+
+        Py_BEGIN_ALLOW_THREADS ;
+        self->last_result = PQexecPrepared(self->pgcnx->cnx,
+                                           query,
+                                           binds->nParams,
+                                           (const char **)binds->paramValues,
+                                           binds->paramLengths,
+                                           binds->paramFormats,
+                                           self->binary);
+        Py_END_ALLOW_THREADS ;
+
+        /* clean up */
+        _pgsource_freeparams(binds);
+
+        if (!_pg_result_check(self->pgcnx->cnx, self->last_result)) {
+            self->last_result = NULL;
+            goto done;
+        }
+    }
+    if (!PyErr_Occurred()) {
+        result = _pgsource_postexec(self);
+        self->max_row = -1;
+    }
+
+done:
+    Py_XDECREF(iterator);
+    _pg_bindings_free(plan, ntypes);
+    if (prep) {
+        PQclear(prep);
+        free(types);
+    }
+    return result;
+}
+
+/* --------------------------------------------------------------------- */
+/* BINARY FORMAT DECODING */
+
+/* day and microsecond arithmetic of the binary date/time formats, which
+   count from the PostgreSQL epoch (2000-01-01) */
+#define PG_EPOCH_JDATE                2451545
+#define PG_USECS_PER_SECOND        INT64CONST(1000000)
+#define PG_USECS_PER_MINUTE        INT64CONST(60000000)
+#define PG_USECS_PER_HOUR        INT64CONST(3600000000)
+#define PG_USECS_PER_DAY        INT64CONST(86400000000)
+
+/* sign word of the binary numeric format */
+#define PG_NUMERIC_POS                0x0000
+#define PG_NUMERIC_NEG                0x4000
+#define PG_NUMERIC_NAN                0xC000
+#define PG_NUMERIC_PINF                0xD000
+#define PG_NUMERIC_NINF                0xF000
+
+/* Python classes we construct values of, looked up on first use */
+static PyObject *DecimalType = NULL;
+static PyObject *IntervalType = NULL;
+static PyObject *UUIDType = NULL;
+static PyObject *TzOffsetType = NULL;
+static PyObject *JsonDumps = NULL;
+static PyObject *RangeType = NULL;
+static PyObject *MultirangeType = NULL;
+
+/* import module.name once and keep a reference to it in *cache */
+static PyObject *_pg_import(PyObject **cache, const char *module, const char *name)
+{
+    PyObject *mod;
+
+    if (*cache)
+        return *cache;
+    if ((mod = PyImport_ImportModule((char *)module)) == NULL)
+        return NULL;
+    *cache = PyObject_GetAttrString(mod, (char *)name);
+    Py_DECREF(mod);
+    return *cache;
+}
+
+/* network byte order readers */
+static int16 _pg_get_int16(const char *buf)
+{
+    const unsigned char *p = (const unsigned char *)buf;
+    return (int16)((p[0] << 8) | p[1]);
+}
+
+static int32 _pg_get_int32(const char *buf)
+{
+    const unsigned char *p = (const unsigned char *)buf;
+    return (int32)(((uint32)p[0] << 24) | ((uint32)p[1] << 16) |
+                   ((uint32)p[2] << 8) | (uint32)p[3]);
+}
+
+static int64 _pg_get_int64(const char *buf)
+{
+    return (int64)(((uint64)(uint32)_pg_get_int32(buf) << 32) |
+                   (uint64)(uint32)_pg_get_int32(buf + 4));
+}
+
+/* network byte order writers */
+static void _pg_put_int16(char *buf, int16 value)
+{
+    unsigned char *p = (unsigned char *)buf;
+    p[0] = (uint16)value >> 8;
+    p[1] = (uint16)value;
+}
+
+static void _pg_put_int32(char *buf, int32 value)
+{
+    unsigned char *p = (unsigned char *)buf;
+    p[0] = (uint32)value >> 24;
+    p[1] = (uint32)value >> 16;
+    p[2] = (uint32)value >> 8;
+    p[3] = (uint32)value;
+}
+
+static void _pg_put_int64(char *buf, int64 value)
+{
+    _pg_put_int32(buf, (int32)((uint64)value >> 32));
+    _pg_put_int32(buf + 4, (int32)value);
+}
+
+/* convert a gregorian date to a julian day number (from PostgreSQL) */
+static int _pg_date2j(int year, int month, int day)
+{
+    int julian, century;
+
+    if (month > 2) {
+        month += 1;
+        year += 4800;
+    } else {
+        month += 13;
+        year += 4799;
+    }
+    century = year / 100;
+    julian = year * 365 - 32167;
+    julian += year / 4 - century + century / 4;
+    julian += 7834 * month / 256 + day;
+    return julian;
+}
+
+/* convert a julian day number to a gregorian date (from PostgreSQL) */
+static void _pg_j2date(int jd, int *year, int *month, int *day)
+{
+    unsigned int julian;
+    unsigned int quad;
+    unsigned int extra;
+    int y;
+
+    julian = jd;
+    julian += 32044;
+    quad = julian / 146097;
+    extra = (julian - quad * 146097) * 4 + 3;
+    julian += 60 + quad * 3 + extra / 146097;
+    quad = julian / 1461;
+    julian -= quad * 1461;
+    y = julian * 4 / 1461;
+    julian = ((y != 0) ? ((julian + 305) % 365) : ((julian + 306) % 366)) + 123;
+    y += quad * 4;
+    *year = y - 4800;
+    quad = julian * 2141 / 65536;
+    *day = julian - 7834 * quad / 256;
+    *month = (quad + 10) % 12 + 1;
+}
+
+/* Python dates only have the years 1 to 9999, and the C API does not
+   check them; is a day since 2000-01-01 one of them */
+static int _pg_check_days(int64 days)
+{
+    if (days < _pg_date2j(1, 1, 1) - PG_EPOCH_JDATE ||
+        days > _pg_date2j(9999, 12, 31) - PG_EPOCH_JDATE) {
+        PyErr_SetString(PyExc_ValueError, "year is out of range");
+        return 0;
+    }
+    return 1;
+}
+
+/* is a parsed date one Python has, as the datetime constructors check */
+static int _pg_check_date(int year, int month, int day)
+{
+    static const int mdays[] = {31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31};
+    int leap = year % 4 == 0 && (year % 100 != 0 || year % 400 == 0);
+
+    if (year < 1 || year > 9999) {
+        PyErr_SetString(PyExc_ValueError, "year is out of range");
+        return 0;
+    }
+    if (month < 1 || month > 12) {
+        PyErr_SetString(PyExc_ValueError, "month must be in 1..12");
+        return 0;
+    }
+    if (day < 1 || day > mdays[month - 1] + (month == 2 && leap)) {
+        PyErr_SetString(PyExc_ValueError, "day is out of range for month");
+        return 0;
+    }
+    return 1;
+}
+
+/* date from days since 2000-01-01; +/-infinity map to date.max/min */
+static PyObject *_pg_date_from_days(int32 days)
+{
+    int year, month, day;
+
+    if (days == PG_INT32_MAX)
+        return PyDate_FromDate(9999, 12, 31);
+    if (days == PG_INT32_MIN)
+        return PyDate_FromDate(1, 1, 1);
+    if (!_pg_check_days(days))
+        return NULL;
+    _pg_j2date(days + PG_EPOCH_JDATE, &year, &month, &day);
+    return PyDate_FromDate(year, month, day);
+}
+
+/* datetime from microseconds since 2000-01-01 00:00:00, with an optional
+   tzinfo (Py_None for naive values) */
+static PyObject *_pg_datetime_from_usecs(int64 usecs, PyObject *tzinfo)
+{
+    int64 days, time;
+    int year, month, day;
+
+    if (usecs == PG_INT64_MAX)
+        return PyDateTimeAPI->DateTime_FromDateAndTime(9999, 12, 31,
+                23, 59, 59, 999999, tzinfo, PyDateTimeAPI->DateTimeType);
+    if (usecs == PG_INT64_MIN)
+        return PyDateTimeAPI->DateTime_FromDateAndTime(1, 1, 1,
+                0, 0, 0, 0, tzinfo, PyDateTimeAPI->DateTimeType);
+
+    days = usecs / PG_USECS_PER_DAY;
+    time = usecs % PG_USECS_PER_DAY;
+    if (time < 0) {
+        time += PG_USECS_PER_DAY;
+        days--;
+    }
+    if (!_pg_check_days(days))
+        return NULL;
+    _pg_j2date((int)(days + PG_EPOCH_JDATE), &year, &month, &day);
+    return PyDateTimeAPI->DateTime_FromDateAndTime(year, month, day,
+            (int)(time / PG_USECS_PER_HOUR),
+            (int)(time / PG_USECS_PER_MINUTE % 60),
+            (int)(time / PG_USECS_PER_SECOND % 60),
+            (int)(time % PG_USECS_PER_SECOND),
+            tzinfo, PyDateTimeAPI->DateTimeType);
+}
+
+/* time of day from microseconds since midnight, with an optional tzinfo */
+static PyObject *_pg_time_from_usecs(int64 usecs, PyObject *tzinfo)
+{
+    /* 24:00:00 is a valid PostgreSQL time, but not a valid Python one */
+    if (usecs < 0 || usecs >= PG_USECS_PER_DAY) {
+        PyErr_SetString(PyExc_ValueError, "hour must be in 0..23");
+        return NULL;
+    }
+    return PyDateTimeAPI->Time_FromTime((int)(usecs / PG_USECS_PER_HOUR),
+                                        (int)(usecs / PG_USECS_PER_MINUTE % 60),
+                                        (int)(usecs / PG_USECS_PER_SECOND % 60),
+                                        (int)(usecs % PG_USECS_PER_SECOND),
+                                        tzinfo, PyDateTimeAPI->TimeType);
+}
+
+/* pgsql.tzoffset instances by offset, they are immutable and shared */
+static PyObject *TzOffsetCache = NULL;
+
+/* fixed-offset tzinfo for an offset in seconds east of UTC; returns a
+   borrowed reference */
+static PyObject *_pg_tzinfo(int offset)
+{
+    PyObject *key, *tz;
+
+    if (TzOffsetCache == NULL && (TzOffsetCache = PyDict_New()) == NULL)
+        return NULL;
+    if ((key = PyInt_FromLong(offset)) == NULL)
+        return NULL;
+    if ((tz = PyDict_GetItem(TzOffsetCache, key)) == NULL) {
+        if (_pg_import(&TzOffsetType, "pgsql", "tzoffset") == NULL ||
+            (tz = PyObject_CallFunctionObjArgs(TzOffsetType, key, NULL)) == NULL) {
+            Py_DECREF(key);
+            return NULL;
+        }
+        if (PyDict_SetItem(TzOffsetCache, key, tz) < 0) {
+            Py_DECREF(key);
+            Py_DECREF(tz);
+            return NULL;
+        }
+        Py_DECREF(tz);
+    }
+    Py_DECREF(key);
+    return tz;
+}
+
+/* pgsql.interval from the months, days and microseconds of an interval */
+static PyObject *_pg_interval_new(int32 months, int32 days, int64 usecs)
+{
+    if (_pg_import(&IntervalType, "pgsql", "interval") == NULL)
+        return NULL;
+    /* like PostgreSQL, every field carries the sign of its part */
+    return PyObject_CallFunction(IntervalType, "iiiLiii",
+                                 months / 12, months % 12, days,
+                                 (PY_LONG_LONG)(usecs / PG_USECS_PER_HOUR),
+                                 (int)(usecs / PG_USECS_PER_MINUTE % 60),
+                                 (int)(usecs / PG_USECS_PER_SECOND % 60),
+                                 (int)(usecs % PG_USECS_PER_SECOND));
+}
+
+/* uuid.UUID from the 16 raw bytes of a uuid */
+static PyObject *_pg_uuid_from_bytes(const char *cell)
+{
+    PyObject *args, *kwargs, *bytes, *ret;
+
+    if (_pg_import(&UUIDType, "uuid", "UUID") == NULL)
+        return NULL;
+    args = PyTuple_New(0);
+    kwargs = PyDict_New();
+    bytes = PyString_FromStringAndSize(cell, 16);
+    if (args == NULL || kwargs == NULL || bytes == NULL ||
+        PyDict_SetItemString(kwargs, "bytes", bytes) < 0) {
+        Py_XDECREF(args);
+        Py_XDECREF(kwargs);
+        Py_XDECREF(bytes);
+        return NULL;
+    }
+    ret = PyObject_Call(UUIDType, args, kwargs);
+    Py_DECREF(args);
+    Py_DECREF(kwargs);
+    Py_DECREF(bytes);
+    return ret;
+}
+
+/* text form of a binary numeric, which is a header of four 16-bit words
+   (number of digits, weight of the first digit, sign and display scale)
+   followed by the base-10000 digits; the result must be freed */
+static char *_pg_numeric_binary_text(const char *cell, int cellsize)
+{
+    int ndigits, weight, sign, dscale, i, len;
+    char *buf, *p;
+
+    if (cellsize < 8) {
+        PyErr_SetString(InternalError, "invalid binary numeric value");
+        return NULL;
+    }
+    ndigits = _pg_get_int16(cell);
+    weight = _pg_get_int16(cell + 2);
+    sign = (uint16)_pg_get_int16(cell + 4);
+    dscale = _pg_get_int16(cell + 6);
+    if (cellsize < 8 + ndigits * 2) {
+        PyErr_SetString(InternalError, "invalid binary numeric value");
+        return NULL;
+    }
+
+    /* sign, integral digits, point, fractional digits rounded up to a
+       whole base-10000 digit and the terminating NUL */
+    len = 1 + (weight >= 0 ? weight + 1 : 1) * 4 + 1 + dscale + 4 + 1;
+    if (len < 10)
+        len = 10;
+    if ((buf = malloc(len)) == NULL) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+    switch (sign) {
+        case PG_NUMERIC_NAN:
+            strcpy(buf, "NaN");
+            return buf;
+        case PG_NUMERIC_PINF:
+            strcpy(buf, "Infinity");
+            return buf;
+        case PG_NUMERIC_NINF:
+            strcpy(buf, "-Infinity");
+            return buf;
+    }
+
+    p = buf;
+    if (sign == PG_NUMERIC_NEG)
+        *p++ = '-';
+    if (weight < 0)
+        *p++ = '0';
+    for (i = 0; i <= weight; i++) {
+        int digit = i < ndigits ? _pg_get_int16(cell + 8 + i * 2) : 0;
+        p += sprintf(p, i ? "%04d" : "%d", digit);
+    }
+    if (dscale > 0) {
+        char *point = p;
+        *p++ = '.';
+        for (i = weight + 1; p - point <= dscale; i++) {
+            int digit = (i >= 0 && i < ndigits) ?
+                _pg_get_int16(cell + 8 + i * 2) : 0;
+            p += sprintf(p, "%04d", digit);
+        }
+        p = point + 1 + dscale;
+    }
+    *p = '\0';
+    return buf;
+}
+/* --------------------------------------------------------------------- */
+/* BINARY FORMAT ENCODING */
+
+/* the fixed-size storage of parameter i, for a binary value of a type */
+static char *_pg_fixed_param(pgparams *params, int i, Oid type, int size)
+{
+    params->paramTypes[i] = type;
+    params->paramFormats[i] = 1;
+    params->paramLengths[i] = size;
+    params->paramValues[i] = params->fixed[i];
+    return params->fixed[i];
+}
+
+/* binary numeric from its sign word and the decimal digits of its value,
+   the last of which is multiplied by 10**exponent; returns 0 for values
+   beyond the range of the format */
+static int _pg_encode_numeric(pgparams *params, int i, int sign,
+                              const char *digits, int ndigits, int exponent)
+{
+    static const int pow10[] = {1, 10, 100, 1000};
+    int first, weight, low, ngroups, start, end, dscale, k;
+    int *groups;
+    char *buf;
+
+    dscale = exponent < 0 ? -exponent : 0;
+    if (ndigits == 0)
+        weight = low = ngroups = 0;
+    else {
+        /* base-10000 digits, by the power of ten of the decimal ones */
+        first = ndigits - 1 + exponent;
+        weight = first >= 0 ? first / 4 : -((3 - first) / 4);
+        low = exponent >= 0 ? exponent / 4 : -((3 - exponent) / 4);
+        if (weight > PG_INT16_MAX || low < PG_INT16_MIN || dscale > 0x3FFF)
+            return 0;
+        ngroups = weight - low + 1;
+    }
+    if ((groups = calloc(ngroups + 1, sizeof(int))) == NULL) {
+        PyErr_NoMemory();
+        return -1;
+    }
+    for (k = 0; k < ndigits; k++) {
+        int power = first - k;
+        int group = power >= 0 ? power / 4 : -((3 - power) / 4);
+        groups[weight - group] += (digits[k] - '0') * pow10[power - group * 4];
+    }
+
+    /* without the zeros at either end */
+    for (start = 0; start < ngroups && groups[start] == 0; start++)
+        weight--;
+    for (end = ngroups; end > start && groups[end - 1] == 0; end--)
+        ;
+    if (start == end) {
+        weight = 0;
+        if (sign == PG_NUMERIC_NEG)
+            sign = PG_NUMERIC_POS;
+    }
+
+    if ((buf = malloc(8 + (end - start) * 2)) == NULL) {
+        free(groups);
+        PyErr_NoMemory();
+        return -1;
+    }
+    _pg_put_int16(buf, end - start);
+    _pg_put_int16(buf + 2, weight);
+    _pg_put_int16(buf + 4, sign);
+    _pg_put_int16(buf + 6, dscale);
+    for (k = start; k < end; k++)
+        _pg_put_int16(buf + 8 + (k - start) * 2, groups[k]);
+    free(groups);
+
+    params->paramValues[i] = buf;
+    params->mustFree[i] = 1;
+    params->paramTypes[i] = NUMERICOID;
+    params->paramFormats[i] = 1;
+    params->paramLengths[i] = 8 + (end - start) * 2;
+    return 1;
+}
+
+/* binary numeric of an integer, from its decimal digits */
+static int _pg_encode_integer_numeric(pgparams *params, int i, PyObject *value)
+{
+    PyObject *str;
+    char *digits;
+    int ret, sign = PG_NUMERIC_POS;
+
+    if ((str = PyObject_Str(value)) == NULL)
+        return -1;
+    digits = PyString_AS_STRING(str);
+    if (*digits == '-') {
+        sign = PG_NUMERIC_NEG;
+        digits++;
+    }
+    ret = _pg_encode_numeric(params, i, sign, digits, strlen(digits), 0);
+    Py_DECREF(str);
+    return ret;
+}
+
+/* binary numeric of a Decimal, from its as_tuple() */
+static int _pg_encode_decimal(pgparams *params, int i, PyObject *value,
+                              Oid type, pgadapter *adapter)
+{
+    PyObject *tuple, *items, *exponent;
+    char *digits;
+    int ret, k, ndigits, sign;
+
+    if (type && type != NUMERICOID)
+        return 0;
+    if ((tuple = PyObject_CallMethod(value, "as_tuple", NULL)) == NULL)
+        return -1;
+    if (!PyTuple_Check(tuple) || PyTuple_GET_SIZE(tuple) != 3) {
+        Py_DECREF(tuple);
+        PyErr_SetString(InternalError, "unexpected Decimal.as_tuple()");
+        return -1;
+    }
+    sign = PyInt_AsLong(PyTuple_GET_ITEM(tuple, 0)) ?
+        PG_NUMERIC_NEG : PG_NUMERIC_POS;
+    items = PyTuple_GET_ITEM(tuple, 1);
+    exponent = PyTuple_GET_ITEM(tuple, 2);
+
+    /* NaN, sNaN and Infinity have a letter for their exponent */
+    if (PyString_Check(exponent)) {
+        if (*PyString_AS_STRING(exponent) == 'F')
+            sign = sign == PG_NUMERIC_NEG ? PG_NUMERIC_NINF : PG_NUMERIC_PINF;
+        else
+            sign = PG_NUMERIC_NAN;
+        Py_DECREF(tuple);
+        return _pg_encode_numeric(params, i, sign, NULL, 0, 0);
+    }
+
+    ndigits = PyTuple_Size(items);
+    if (ndigits < 0 || (digits = malloc(ndigits + 1)) == NULL) {
+        Py_DECREF(tuple);
+        if (!PyErr_Occurred())
+            PyErr_NoMemory();
+        return -1;
+    }
+    for (k = 0; k < ndigits; k++)
+        digits[k] = '0' + PyInt_AsLong(PyTuple_GET_ITEM(items, k));
+    ret = _pg_encode_numeric(params, i, sign, digits, ndigits,
+                             PyInt_AsLong(exponent));
+    free(digits);
+    Py_DECREF(tuple);
+    return ret;
+}
+
+/* seconds east of UTC of a datetime or time by its utcoffset(), into
+   *offset; returns 1 for aware values, 0 for naive ones and -1 on errors */
+static int _pg_utcoffset(PyObject *value, long *offset)
+{
+    PyObject *delta;
+
+    if (!((_PyDateTime_BaseTZInfo *)value)->hastzinfo)
+        return 0;
+    if ((delta = PyObject_CallMethod(value, "utcoffset", NULL)) == NULL)
+        return -1;
+    if (delta == Py_None) {
+        Py_DECREF(delta);
+        return 0;
+    }
+    if (!PyDelta_Check(delta)) {
+        Py_DECREF(delta);
+        PyErr_SetString(PyExc_TypeError, "utcoffset() must return a timedelta");
+        return -1;
+    }
+    *offset = ((PyDateTime_Delta *)delta)->days * 86400L +
+        ((PyDateTime_Delta *)delta)->seconds;
+    Py_DECREF(delta);
+    return 1;
+}
+
+/* binary float8, or float4 for float4 parameters */
+static int _pg_encode_double(pgparams *params, int i, double value, Oid type)
+{
+    if (type == FLOAT4OID) {
+        union { int32 i; float f; } u;
+        u.f = value;
+        _pg_put_int32(_pg_fixed_param(params, i, FLOAT4OID, 4), u.i);
+    } else {
+        union { int64 i; double d; } u;
+        u.d = value;
+        _pg_put_int64(_pg_fixed_param(params, i, FLOAT8OID, 8), u.i);
+    }
+    return 1;
+}
+
+static int _pg_encode_bool(pgparams *params, int i, PyObject *value,
+                           Oid type, pgadapter *adapter)
+{
+    if (type && type != BOOLOID)
+        return 0;
+    *_pg_fixed_param(params, i, BOOLOID, 1) = value == Py_True;
+    return 1;
+}
+
+/* integers are sent as bigint, or as numeric beyond its range, or as
+   the integer or float type of their parameter */
+static int _pg_encode_int(pgparams *params, int i, PyObject *value,
+                          Oid type, pgadapter *adapter)
+{
+    PY_LONG_LONG v;
+    int overflow = 0;
+
+    if (PyInt_Check(value))
+        v = PyInt_AS_LONG(value);
+    else if ((v = PyLong_AsLongLongAndOverflow(value, &overflow)) == -1 &&
+             PyErr_Occurred())
+        return -1;
+    if (overflow)
+        type = type ? type : NUMERICOID;
+    switch (type) {
+        case 0:
+        case INT8OID:
+            _pg_put_int64(_pg_fixed_param(params, i, INT8OID, 8), v);
+            return 1;
+        case INT4OID:
+            if (v < PG_INT32_MIN || v > PG_INT32_MAX)
+                return 0;
+            _pg_put_int32(_pg_fixed_param(params, i, INT4OID, 4), v);
+            return 1;
+        case INT2OID:
+            if (v < PG_INT16_MIN || v > PG_INT16_MAX)
+                return 0;
+            _pg_put_int16(_pg_fixed_param(params, i, INT2OID, 2), v);
+            return 1;
+        case NUMERICOID:
+            return _pg_encode_integer_numeric(params, i, value);
+        case FLOAT8OID:
+        case FLOAT4OID:
+            if (overflow)
+                return 0;
+            return _pg_encode_double(params, i, (double) v, type);
+        default:
+            return 0;
+    }
+}
+
+/* floats are sent as their exact bits */
+static int _pg_encode_float(pgparams *params, int i, PyObject *value,
+                            Oid type, pgadapter *adapter)
+{
+    if (type && type != FLOAT8OID && type != FLOAT4OID)
+        return 0;
+    return _pg_encode_double(params, i, PyFloat_AS_DOUBLE(value), type);
+}
+
+/* timestamp with time zone is sent as UTC */
+static int _pg_encode_datetime(pgparams *params, int i, PyObject *value,
+                               Oid type, pgadapter *adapter)
+{
+    int64 usecs;
+    long offset = 0;
+    int aware;
+
+    if ((aware = _pg_utcoffset(value, &offset)) < 0)
+        return -1;
+    if (type && type != (aware ? TIMESTAMPTZOID : TIMESTAMPOID))
+        return 0;
+    usecs = (int64)(_pg_date2j(PyDateTime_GET_YEAR(value),
+                               PyDateTime_GET_MONTH(value),
+                               PyDateTime_GET_DAY(value)) -
+                    PG_EPOCH_JDATE) * PG_USECS_PER_DAY +
+        PyDateTime_DATE_GET_HOUR(value) * PG_USECS_PER_HOUR +
+        PyDateTime_DATE_GET_MINUTE(value) * PG_USECS_PER_MINUTE +
+        (PyDateTime_DATE_GET_SECOND(value) - offset) * PG_USECS_PER_SECOND +
+        PyDateTime_DATE_GET_MICROSECOND(value);
+    _pg_put_int64(_pg_fixed_param(params, i, aware ? TIMESTAMPTZOID :
+                                  TIMESTAMPOID, 8), usecs);
+    return 1;
+}
+
+static int _pg_encode_date(pgparams *params, int i, PyObject *value,
+                           Oid type, pgadapter *adapter)
+{
+    if (type && type != DATEOID)
+        return 0;
+    _pg_put_int32(_pg_fixed_param(params, i, DATEOID, 4),
+                  _pg_date2j(PyDateTime_GET_YEAR(value),
+                             PyDateTime_GET_MONTH(value),
+                             PyDateTime_GET_DAY(value)) - PG_EPOCH_JDATE);
+    return 1;
+}
+
+/* the zone of a time with time zone is sent as seconds west of UTC */
+static int _pg_encode_time(pgparams *params, int i, PyObject *value,
+                           Oid type, pgadapter *adapter)
+{
+    int64 usecs;
+    long offset = 0;
+    int aware;
+    char *buf;
+
+    if ((aware = _pg_utcoffset(value, &offset)) < 0)
+        return -1;
+    if (type && type != (aware ? TIMETZOID : TIMEOID))
+        return 0;
+    usecs = PyDateTime_TIME_GET_HOUR(value) * PG_USECS_PER_HOUR +
+        PyDateTime_TIME_GET_MINUTE(value) * PG_USECS_PER_MINUTE +
+        PyDateTime_TIME_GET_SECOND(value) * PG_USECS_PER_SECOND +
+        PyDateTime_TIME_GET_MICROSECOND(value);
+    if (aware) {
+        buf = _pg_fixed_param(params, i, TIMETZOID, 12);
+        _pg_put_int32(buf + 8, -offset);
+    } else
+        buf = _pg_fixed_param(params, i, TIMEOID, 8);
+    _pg_put_int64(buf, usecs);
+    return 1;
+}
+
+static int _pg_encode_uuid(pgparams *params, int i, PyObject *value,
+                           Oid type, pgadapter *adapter)
+{
+    PyObject *bytes;
+
+    if (type && type != UUIDOID)
+        return 0;
+    if ((bytes = PyObject_GetAttrString(value, "bytes")) == NULL)
+        return -1;
+    if (!PyString_Check(bytes) || PyString_GET_SIZE(bytes) != 16) {
+        Py_DECREF(bytes);
+        PyErr_SetString(PyExc_ValueError, "UUID.bytes is not 16 bytes");
+        return -1;
+    }
+    memcpy(_pg_fixed_param(params, i, UUIDOID, 16),
+           PyString_AS_STRING(bytes), 16);
+    Py_DECREF(bytes);
+    return 1;
+}
+
+/* an interval is sent as microseconds, days and months */
+static int _pg_encode_interval_parts(pgparams *params, int i, int64 usecs,
+                                     PY_LONG_LONG days, PY_LONG_LONG months)
+{
+    char *buf;
+
+    if (days != (int32) days || months != (int32) months)
+        return 0;
+    buf = _pg_fixed_param(params, i, INTERVALOID, 16);
+    _pg_put_int64(buf, usecs);
+    _pg_put_int32(buf + 8, (int32) days);
+    _pg_put_int32(buf + 12, (int32) months);
+    return 1;
+}
+
+static int _pg_encode_timedelta(pgparams *params, int i, PyObject *value,
+                                Oid type, pgadapter *adapter)
+{
+    PyDateTime_Delta *delta = (PyDateTime_Delta *) value;
+
+    if (type && type != INTERVALOID)
+        return 0;
+    return _pg_encode_interval_parts(params, i,
+        delta->seconds * PG_USECS_PER_SECOND + delta->microseconds,
+        delta->days, 0);
+}
+
+/* pgsql.interval, whose years and months are kept apart from its days */
+static int _pg_encode_interval(pgparams *params, int i, PyObject *value,
+                               Oid type, pgadapter *adapter)
+{
+    static char *names[] = {"years", "months", "days", "hours", "minutes",
+                            "seconds", "microseconds"};
+    PY_LONG_LONG fields[7];
+    int k;
+
+    if (type && type != INTERVALOID)
+        return 0;
+    for (k = 0; k < 7; k++) {
+        PyObject *o = PyObject_GetAttrString(value, names[k]);
+        if (o == NULL)
+            return -1;
+        /* fractions are left to the text form */
+        if (!PyInt_Check(o) && !PyLong_Check(o)) {
+            Py_DECREF(o);
+            return 0;
+        }
+        fields[k] = PyLong_AsLongLong(o);
+        Py_DECREF(o);
+        if (fields[k] == -1 && PyErr_Occurred()) {
+            /* too large for the server anyway; let it say so */
+            if (!PyErr_ExceptionMatches(PyExc_OverflowError))
+                return -1;
+            PyErr_Clear();
+            return 0;
+        }
+    }
+    return _pg_encode_interval_parts(params, i,
+        fields[3] * PG_USECS_PER_HOUR + fields[4] * PG_USECS_PER_MINUTE +
+        fields[5] * PG_USECS_PER_SECOND + fields[6],
+        fields[2], fields[0] * 12 + fields[1]);
+}
+
+/* dicts and lists are sent as json text, in the client encoding */
+static int _pg_encode_json(pgparams *params, int i, PyObject *value,
+                           Oid type, pgadapter *adapter)
+{
+    PyObject *dumps = params->pgcnx->dumps, *str;
+
+    if (dumps == NULL && (dumps = _pg_import(&JsonDumps, "json",
+                                             "dumps")) == NULL)
+        return -1;
+    if ((str = PyObject_CallFunctionObjArgs(dumps, value, NULL)) == NULL)
+        return -1;
+    return _pg_param_string(params, i, str, type, 0) ? 1 : -1;
+}
+
+/* --------------------------------------------------------------------- */
+/* PARAMETER ADAPTERS
+
+   The parameters of each class of values are sent by an adapter: the C
+   encoder of a builtin type, an adapter registered with
+   register_adapter(), or, for other objects, their __pgsql_typeoid__,
+   __binary__, __pgquote__ and __quote__ attributes and str(), which are
+   read from each value, as they may be set on instances.  The adapter
+   of a class is looked up along its MRO; only the adapters of builtin
+   types, and those registered, are kept, so that classes made on the
+   fly are not. */
+
+/* registered adapters by class, as capsules of pgadapters */
+static PyObject *Adapters = NULL;
+/* adapters of builtin types by class, as capsules of pgadapters */
+static PyObject *AdapterCache = NULL;
+
+/* values adapted by a function registered for their class */
+static int _pg_encode_adapted(pgparams *params, int i, PyObject *value,
+                              Oid type, pgadapter *adapter)
+{
+    PyObject *str;
+
+    /* a binary value can only be read as a value of its type */
+    if (adapter->format && type && type != adapter->type)
+        return 0;
+    if ((str = PyObject_CallFunctionObjArgs(adapter->adapt, value,
+                                           NULL)) == NULL)
+        return -1;
+    return _pg_param_string(params, i, str, type ? type : adapter->type,
+                            adapter->format) ? 1 : -1;
+}
+
+/* other objects, by their attributes */
+static int _pg_encode_object(pgparams *params, int i, PyObject *value,
+                             Oid type, pgadapter *adapter)
+{
+    PyObject *str;
+    int format;
+
+    if (PyObject_HasAttrString(value, "__pgsql_typeoid__")) {
+        PyObject *o = PyObject_GetAttrString(value, "__pgsql_typeoid__");
+        if (o == NULL)
+            return -1;
+        if (!PyInt_Check(o)) {
+            Py_DECREF(o);
+            PyErr_SetString(ProgrammingError, "__pgsql_typeoid__ not an int");
+            return -1;
+        }
+        if (!type)
+            type = PyInt_AS_LONG(o);
+        Py_DECREF(o);
+    }
+
+    format = PyObject_HasAttrString(value, "__binary__");
+    if (PyObject_HasAttrString(value, "__pgquote__"))
+        str = PyObject_CallMethod(value, "__pgquote__", NULL);
+    else if (PyObject_HasAttrString(value, "__quote__"))
+        str = PyObject_CallMethod(value, "__quote__", NULL);
+    else /* hope for the best */
+        str = PyObject_Str(value);
+    if (str == NULL)
+        return -1;
+    return _pg_param_string(params, i, str, type, format) ? 1 : -1;
+}
+
+/* the adapter of other objects */
+static pgadapter ObjectAdapter = {_pg_encode_object, NULL, 0, 0};
+static PyObject *ObjectAdapterCapsule = NULL;
+
+/* the encoder of the values of a builtin type, or NULL */
+static pgencoder _pg_builtin_encoder(PyObject *cls)
+{
+    if (cls == (PyObject *) &PyBool_Type)
+        return _pg_encode_bool;
+    if (cls == (PyObject *) &PyInt_Type || cls == (PyObject *) &PyLong_Type)
+        return _pg_encode_int;
+    if (cls == (PyObject *) &PyFloat_Type)
+        return _pg_encode_float;
+    if (cls == (PyObject *) PyDateTimeAPI->DateTimeType)
+        return _pg_encode_datetime;
+    if (cls == (PyObject *) PyDateTimeAPI->DateType)
+        return _pg_encode_date;
+    if (cls == (PyObject *) PyDateTimeAPI->TimeType)
+        return _pg_encode_time;
+    if (cls == (PyObject *) PyDateTimeAPI->DeltaType)
+        return _pg_encode_timedelta;
+    if (cls == (PyObject *) &PyDict_Type || cls == (PyObject *) &PyList_Type)
+        return _pg_encode_json;
+    if (cls == IntervalType)
+        return _pg_encode_interval;
+    if (cls == DecimalType)
+        return _pg_encode_decimal;
+    if (cls == UUIDType)
+        return _pg_encode_uuid;
+    return NULL;
+}
+
+static void _pg_adapter_free(PyObject *capsule)
+{
+    pgadapter *adapter = PyCapsule_GetPointer(capsule, NULL);
+
+    Py_XDECREF(adapter->adapt);
+    free(adapter);
+}
+
+/* a capsule of an adapter, which frees it */
+static PyObject *_pg_adapter_new(pgencoder encode, PyObject *adapt,
+                                 Oid type, int format)
+{
+    pgadapter *adapter;
+    PyObject *capsule;
+
+    if ((adapter = calloc(1, sizeof(pgadapter))) == NULL)
+        return PyErr_NoMemory();
+    adapter->encode = encode;
+    adapter->adapt = adapt;
+    Py_XINCREF(adapt);
+    adapter->type = type;
+    adapter->format = format;
+    if ((capsule = PyCapsule_New(adapter, NULL, _pg_adapter_free)) == NULL) {
+        Py_XDECREF(adapter->adapt);
+        free(adapter);
+    }
+    return capsule;
+}
+
+/* the adapter of a class: the first registered or builtin one along
+   its MRO, or that of other objects */
+static PyObject *_pg_adapter_get(PyObject *key)
+{
+    PyObject *mro = NULL, *capsule;
+    pgencoder encode;
+    Py_ssize_t k, n;
+
+    if (_pg_import(&DecimalType, "decimal", "Decimal") == NULL ||
+        _pg_import(&UUIDType, "uuid", "UUID") == NULL)
+        return NULL;
+    /* values of pgsql.interval can only exist once it is imported */
+    if (_pg_import(&IntervalType, "pgsql", "interval") == NULL)
+        PyErr_Clear();
+
+    if (PyType_Check(key))
+        mro = ((PyTypeObject *) key)->tp_mro;
+    n = mro ? PyTuple_GET_SIZE(mro) : 1;
+    for (k = 0; k < n; k++) {
+        PyObject *cls = mro ? PyTuple_GET_ITEM(mro, k) : key;
+
+        if ((capsule = PyDict_GetItem(Adapters, cls)) != NULL ||
+            (capsule = PyDict_GetItem(AdapterCache, cls)) != NULL) {
+            Py_INCREF(capsule);
+            return capsule;
+        }
+        if ((encode = _pg_builtin_encoder(cls)) != NULL) {
+            if ((capsule = _pg_adapter_new(encode, NULL, 0, 0)) == NULL)
+                return NULL;
+            if (PyDict_SetItem(AdapterCache, cls, capsule) < 0) {
+                Py_DECREF(capsule);
+                return NULL;
+            }
+            return capsule;
+        }
+    }
+    Py_INCREF(ObjectAdapterCapsule);
+    return ObjectAdapterCapsule;
+}
+
+static char pg_register_adapter__doc__[] =
+"register_adapter(cls, adapt[, oid[, binary]]) -- send parameters of the "
+"class cls, and of its subclasses, as the string adapt(value), the text "
+"of a value of the type with the OID oid, or of a type left to the server "
+"if it is 0.  With binary, the string is the binary format of the type.  "
+"An adapt of None removes the adapter of cls.";
+static PyObject *
+pg_register_adapter(PyObject *self, PyObject *args)
+{
+    PyObject *cls, *adapt, *binary = Py_False, *capsule;
+    long oid = 0;
+
+    if (!PyArg_ParseTuple(args, "OO|lO:register_adapter",
+                          &cls, &adapt, &oid, &binary))
+        return NULL;
+    if (!PyType_Check(cls) && !PyClass_Check(cls)) {
+        PyErr_SetString(PyExc_TypeError, "register_adapter() needs a class");
+        return NULL;
+    }
+    if (adapt == Py_None) {
+        if (PyDict_DelItem(Adapters, cls) < 0)
+            PyErr_Clear();
+    } else {
+        if (!PyCallable_Check(adapt)) {
+            PyErr_SetString(PyExc_TypeError, "adapt must be callable");
+            return NULL;
+        }
+        if (oid == 0 && PyObject_IsTrue(binary)) {
+            PyErr_SetString(ProgrammingError,
+                            "binary parameters need the OID of their type");
+            return NULL;
+        }
+        if ((capsule = _pg_adapter_new(_pg_encode_adapted, adapt, oid,
+                                       PyObject_IsTrue(binary))) == NULL)
+            return NULL;
+        if (PyDict_SetItem(Adapters, cls, capsule) < 0) {
+            Py_DECREF(capsule);
+            return NULL;
+        }
+        Py_DECREF(capsule);
+    }
+
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+/* values of types we have no decoder for are returned as buffers */
+static PyObject *_pg_unknown_cell(char *cell, int cellsize)
+{
+    PyObject *ret;
+    void *tmpstr = NULL;
+    Py_ssize_t tmplen = 0;
+
+    if ((ret = PyBuffer_New(cellsize)) == NULL)
+        return NULL;
+    if (PyObject_AsWriteBuffer(ret, &tmpstr, &tmplen) < 0) {
+        Py_DECREF(ret);
+        return NULL;
+    }
+    memcpy(tmpstr, cell, cellsize);
+    return ret;
+}
+
+/* warns, once per result, of a type without decoder or typecast */
+static int _pg_unknown_type(Oid type)
+{
+    char notice[64];
+
+    snprintf(notice, sizeof(notice),
+             "Unknown datatype %ld processed as string", (long)type);
+    return PyErr_Warn(NULL, notice) == 0;
+}
+
+/* --------------------------------------------------------------------- */
+/* DATE/TIME TEXT DECODING */
+
+/* These parse the ISO DateStyle and the postgres IntervalStyle, which are
+   the server defaults. */
+
+/* reads an unsigned number of at most maxdigits digits, returns the
+   number of digits read */
+static int _pg_parse_uint(const char **s, int maxdigits, int *value)
+{
+    int n;
+
+    *value = 0;
+    for (n = 0; n < maxdigits && **s >= '0' && **s <= '9'; n++, (*s)++)
+        *value = *value * 10 + (**s - '0');
+    return n;
+}
+
+/* YYYY-MM-DD */
+static int _pg_parse_date(const char **s, int *year, int *month, int *day)
+{
+    if (_pg_parse_uint(s, 9, year) < 4 || *(*s)++ != '-' ||
+        _pg_parse_uint(s, 2, month) != 2 || *(*s)++ != '-' ||
+        _pg_parse_uint(s, 2, day) != 2)
+        return 0;
+    return 1;
+}
+
+/* HH:MM:SS[.ffffff] as microseconds; hours are unbounded in intervals */
+static int _pg_parse_time(const char **s, int64 *usecs)
+{
+    int64 hours = 0;
+    int minutes, seconds, fraction = 0, n;
+
+    for (n = 0; **s >= '0' && **s <= '9'; n++, (*s)++)
+        hours = hours * 10 + (**s - '0');
+    if (n < 2 || *(*s)++ != ':' ||
+        _pg_parse_uint(s, 2, &minutes) != 2 || *(*s)++ != ':' ||
+        _pg_parse_uint(s, 2, &seconds) != 2)
+        return 0;
+    if (**s == '.') {
+        (*s)++;
+        if ((n = _pg_parse_uint(s, 6, &fraction)) == 0)
+            return 0;
+        for (; n < 6; n++)
+            fraction *= 10;
+        /* the server never prints more than microseconds */
+        while (**s >= '0' && **s <= '9')
+            (*s)++;
+    }
+    *usecs = ((hours * 60 + minutes) * 60 + seconds) * PG_USECS_PER_SECOND
+             + fraction;
+    return 1;
+}
+
+/* +HH[:MM[:SS]] as seconds east of UTC */
+static int _pg_parse_tz(const char **s, int *offset)
+{
+    int sign, hours, minutes = 0, seconds = 0;
+
+    if (**s != '+' && **s != '-')
+        return 0;
+    sign = *(*s)++ == '-' ? -1 : 1;
+    if (_pg_parse_uint(s, 2, &hours) != 2)
+        return 0;
+    if (**s == ':') {
+        (*s)++;
+        if (_pg_parse_uint(s, 2, &minutes) != 2)
+            return 0;
+        if (**s == ':') {
+            (*s)++;
+            if (_pg_parse_uint(s, 2, &seconds) != 2)
+                return 0;
+        }
+    }
+    *offset = sign * ((hours * 60 + minutes) * 60 + seconds);
+    return 1;
+}
+
+/* parses an optional time zone suffix, returns a borrowed tzinfo or
+   Py_None, and NULL on errors */
+static PyObject *_pg_parse_tzinfo(const char **s)
+{
+    int offset;
+
+    if (**s == '\0')
+        return Py_None;
+    if (!_pg_parse_tz(s, &offset))
+        return NULL;
+    return _pg_tzinfo(offset);
+}
+
+static PyObject *_pg_bad_value(const char *what, const char *value)
+{
+    if (!PyErr_Occurred())
+        PyErr_Format(PyExc_ValueError, "invalid %s value: '%s'", what, value);
+    return NULL;
+}
+
+/* date from YYYY-MM-DD */
+static PyObject *_pg_date_from_text(const char *value)
+{
+    const char *s = value;
+    int year, month, day;
+
+    if (!strcmp(value, "infinity"))
+        return _pg_date_from_days(PG_INT32_MAX);
+    if (!strcmp(value, "-infinity"))
+        return _pg_date_from_days(PG_INT32_MIN);
+    if (!_pg_parse_date(&s, &year, &month, &day) || *s)
+        return _pg_bad_value("date", value);
+    if (!_pg_check_date(year, month, day))
+        return NULL;
+    return PyDate_FromDate(year, month, day);
+}
+
+/* datetime from YYYY-MM-DD HH:MM:SS[.ffffff][+HH[:MM[:SS]]] */
+static PyObject *_pg_datetime_from_text(const char *value)
+{
+    const char *s = value;
+    int year, month, day;
+    int64 usecs;
+    PyObject *tz;
+
+    if (!strcmp(value, "infinity"))
+        return _pg_datetime_from_usecs(PG_INT64_MAX, Py_None);
+    if (!strcmp(value, "-infinity"))
+        return _pg_datetime_from_usecs(PG_INT64_MIN, Py_None);
+    if (!_pg_parse_date(&s, &year, &month, &day) || *s++ != ' ' ||
+        !_pg_parse_time(&s, &usecs) || usecs >= PG_USECS_PER_DAY ||
+        (tz = _pg_parse_tzinfo(&s)) == NULL || *s)
+        return _pg_bad_value("timestamp", value);
+    if (!_pg_check_date(year, month, day))
+        return NULL;
+    return PyDateTimeAPI->DateTime_FromDateAndTime(year, month, day,
+            (int)(usecs / PG_USECS_PER_HOUR),
+            (int)(usecs / PG_USECS_PER_MINUTE % 60),
+            (int)(usecs / PG_USECS_PER_SECOND % 60),
+            (int)(usecs % PG_USECS_PER_SECOND),
+            tz, PyDateTimeAPI->DateTimeType);
+}
+
+/* time from HH:MM:SS[.ffffff][+HH[:MM[:SS]]] */
+static PyObject *_pg_time_from_text(const char *value)
+{
+    const char *s = value;
+    int64 usecs;
+    PyObject *tz;
+
+    if (!_pg_parse_time(&s, &usecs) || usecs > PG_USECS_PER_DAY ||
+        (tz = _pg_parse_tzinfo(&s)) == NULL || *s)
+        return _pg_bad_value("time", value);
+    return _pg_time_from_usecs(usecs, tz);
+}
+
+/* is the interval unit [unit, unit+len) the given unit or its plural */
+static int _pg_unit_is(const char *unit, int len, const char *name)
+{
+    int n = strlen(name);
+
+    if (strncmp(unit, name, n))
+        return 0;
+    return len == n || (len == n + 1 && unit[n] == 's');
+}
+
+/* pgsql.interval from [N year[s]] [N mon[s]] [N day[s]] [[-]HH:MM:SS[.f]],
+   where every number carries its own sign */
+static PyObject *_pg_interval_from_text(const char *value)
+{
+    const char *s = value;
+    int32 months = 0, days = 0;
+    int64 usecs = 0;
+
+    while (*s) {
+        const char *digits;
+        int sign = 1;
+
+        if (*s == '-' || *s == '+')
+            sign = *s++ == '-' ? -1 : 1;
+        for (digits = s; *digits >= '0' && *digits <= '9'; digits++)
+            ;
+        if (*digits == ':') {
+            if (!_pg_parse_time(&s, &usecs))
+                return _pg_bad_value("interval", value);
+            usecs *= sign;
+        } else {
+            const char *unit;
+            int n;
+
+            if (!_pg_parse_uint(&s, 9, &n) || *s++ != ' ')
+                return _pg_bad_value("interval", value);
+            for (unit = s; *s && *s != ' '; s++)
+                ;
+            if (_pg_unit_is(unit, s - unit, "year"))
+                months += sign * n * 12;
+            else if (_pg_unit_is(unit, s - unit, "mon"))
+                months += sign * n;
+            else if (_pg_unit_is(unit, s - unit, "day"))
+                days += sign * n;
+            else
+                return _pg_bad_value("interval", value);
+        }
+        if (*s == ' ')
+            s++;
+        else if (*s)
+            return _pg_bad_value("interval", value);
+    }
+    return _pg_interval_new(months, days, usecs);
+}
+
+/* --------------------------------------------------------------------- */
+/* NUMERIC TEXT DECODING */
+
+/* numeric as a Decimal */
+static PyObject *_pg_decimal_from_text(const char *value)
+{
+    if (_pg_import(&DecimalType, "decimal", "Decimal") == NULL)
+        return NULL;
+    return PyObject_CallFunction(DecimalType, "s", value);
+}
+
+/* numeric as a float */
+static PyObject *_pg_float_from_text(const char *value)
+{
+    PyObject *tmp, *ret;
+
+    if ((tmp = PyString_FromString(value)) == NULL)
+        return NULL;
+    ret = PyFloat_FromString(tmp, NULL);
+    Py_DECREF(tmp);
+    return ret;
+}
+
+/* numeric as an integer scaled by 10**scale; digits beyond the scale
+   must be zeros, so that no value is silently rounded */
+static PyObject *_pg_scaled_from_text(const char *value, int scale)
+{
+    const char *s, *point;
+    char *buf, *p;
+    int i, fraclen;
+    PyObject *ret;
+
+    for (s = value; *s == '-' || *s == '+' || (*s >= '0' && *s <= '9'); s++)
+        ;
+    point = s;
+    if (*point == '.')
+        for (s++; *s >= '0' && *s <= '9'; s++)
+            ;
+    if (*s || point == value)
+        return _pg_bad_value("numeric", value);
+
+    fraclen = *point == '.' ? s - point - 1 : 0;
+    for (i = scale; i < fraclen; i++)
+        if (point[1 + i] != '0') {
+            PyErr_Format(DataError, "numeric value %s does not fit scale %d",
+                         value, scale);
+            return NULL;
+        }
+
+    if ((buf = malloc((point - value) + scale + 1)) == NULL)
+        return PyErr_NoMemory();
+    memcpy(buf, value, point - value);
+    p = buf + (point - value);
+    for (i = 0; i < scale; i++)
+        *p++ = i < fraclen ? point[1 + i] : '0';
+    *p = '\0';
+    ret = PyInt_FromString(buf, NULL, 10);
+    free(buf);
+    return ret;
+}
+
+/* --------------------------------------------------------------------- */
+/* BUILTIN TYPECASTS */
+
+/* builtin typecasts, the defaults of the typecasts of pgsql connections;
+   values which are not strings have been decoded already, and are
+   returned as they are */
+static PyObject *
+_pg_typecast(PyObject *args, const char *format,
+             PyObject *(*decode)(const char *))
+{
+    PyObject *typ, *value;
+
+    if (!PyArg_ParseTuple(args, (char *)format, &typ, &value))
+        return NULL;
+    if (!PyString_Check(value)) {
+        Py_INCREF(value);
+        return value;
+    }
+    return decode(PyString_AS_STRING(value));
+}
+
+static char pg_typecast_date__doc__[] =
+"typecast_date(type, value) -- convert a date string to a datetime.date.";
+static PyObject *
+pg_typecast_date(PyObject *self, PyObject *args)
+{
+    return _pg_typecast(args, "OO:typecast_date", _pg_date_from_text);
+}
+
+static char pg_typecast_datetime__doc__[] =
+"typecast_datetime(type, value) -- convert a timestamp string to a "
+"datetime.datetime, which has a tzinfo if the string has a time zone.";
+static PyObject *
+pg_typecast_datetime(PyObject *self, PyObject *args)
+{
+    return _pg_typecast(args, "OO:typecast_datetime", _pg_datetime_from_text);
+}
+
+static char pg_typecast_time__doc__[] =
+"typecast_time(type, value) -- convert a time string to a datetime.time, "
+"which has a tzinfo if the string has a time zone.";
+static PyObject *
+pg_typecast_time(PyObject *self, PyObject *args)
+{
+    return _pg_typecast(args, "OO:typecast_time", _pg_time_from_text);
+}
+
+static char pg_typecast_interval__doc__[] =
+"typecast_interval(type, value) -- convert an interval string to a "
+"pgsql.interval.";
+static PyObject *
+pg_typecast_interval(PyObject *self, PyObject *args)
+{
+    return _pg_typecast(args, "OO:typecast_interval", _pg_interval_from_text);
+}
+
+static char pg_typecast_numeric__doc__[] =
+"typecast_numeric(type, value) -- convert a numeric string to a "
+"decimal.Decimal.";
+static PyObject *
+pg_typecast_numeric(PyObject *self, PyObject *args)
+{
+    return _pg_typecast(args, "OO:typecast_numeric", _pg_decimal_from_text);
+}
+
+static char pg_typecast_numeric_float__doc__[] =
+"typecast_numeric_float(type, value) -- convert a numeric value to a float.";
+static PyObject *
+pg_typecast_numeric_float(PyObject *self, PyObject *args)
+{
+    PyObject *typ, *value;
+
+    if (!PyArg_ParseTuple(args, "OO:typecast_numeric_float", &typ, &value))
+        return NULL;
+    if (PyString_Check(value))
+        return _pg_float_from_text(PyString_AS_STRING(value));
+    return PyNumber_Float(value);
+}
+
+/* the typecasts made by scaled_numeric are bound to their scale */
+static PyObject *
+pg_typecast_numeric_scaled(PyObject *self, PyObject *args)
+{
+    PyObject *typ, *value, *spec, *str, *ret;
+
+    if (!PyArg_ParseTuple(args, "OO:typecast_numeric_scaled", &typ, &value))
+        return NULL;
+    if (PyString_Check(value))
+        return _pg_scaled_from_text(PyString_AS_STRING(value),
+                                    PyInt_AS_LONG(self));
+
+    /* an already decoded Decimal, formatted without exponent */
+    if ((spec = PyString_FromString("f")) == NULL)
+        return NULL;
+    str = PyObject_Format(value, spec);
+    Py_DECREF(spec);
+    if (str == NULL)
+        return NULL;
+    ret = _pg_scaled_from_text(PyString_AsString(str), PyInt_AS_LONG(self));
+    Py_DECREF(str);
+    return ret;
+}
+
+static PyMethodDef pg_typecast_numeric_scaled_def = {
+    "typecast_numeric_scaled", (PyCFunction) pg_typecast_numeric_scaled,
+    METH_VARARGS,
+    "typecast_numeric_scaled(type, value) -- convert a numeric value to an "
+    "integer scaled by 10**scale."
+};
+
+static char pg_scaled_numeric__doc__[] =
+"scaled_numeric(scale) -- return a typecast converting numeric values to "
+"integers scaled by 10**scale, e.g. 12.34 to 1234 for a scale of 2. "
+"Values with more significant decimals than the scale raise DataError.";
+static PyObject *
+pg_scaled_numeric(PyObject *self, PyObject *args)
+{
+    int scale;
+    PyObject *scaleobj, *ret;
+
+    if (!PyArg_ParseTuple(args, "i:scaled_numeric", &scale))
+        return NULL;
+    if (scale < 0) {
+        PyErr_SetString(PyExc_ValueError, "scale must not be negative");
+        return NULL;
+    }
+    if ((scaleobj = PyInt_FromLong(scale)) == NULL)
+        return NULL;
+    ret = PyCFunction_New(&pg_typecast_numeric_scaled_def, scaleobj);
+    Py_DECREF(scaleobj);
+    return ret;
+}
+
+/* the typecasts made by json_typecast are bound to their loads function */
+static PyObject *
+pg_typecast_json(PyObject *self, PyObject *args)
+{
+    PyObject *typ, *value;
+
+    if (!PyArg_ParseTuple(args, "OO:typecast_json", &typ, &value))
+        return NULL;
+    if (!PyString_Check(value)) {
+        Py_INCREF(value);
+        return value;
+    }
+    return PyObject_CallFunctionObjArgs(self, value, NULL);
+}
+
+static PyMethodDef pg_typecast_json_def = {
+    "typecast_json", (PyCFunction) pg_typecast_json, METH_VARARGS,
+    "typecast_json(type, value) -- parse a json value with the loads "
+    "function of the typecast."
+};
+
+static char pg_json_typecast__doc__[] =
+"json_typecast(loads) -- return a typecast parsing json and jsonb values "
+"by calling loads with their text.";
+static PyObject *
+pg_json_typecast(PyObject *self, PyObject *args)
+{
+    PyObject *loads;
+
+    if (!PyArg_ParseTuple(args, "O:json_typecast", &loads))
+        return NULL;
+    if (!PyCallable_Check(loads)) {
+        PyErr_SetString(PyExc_TypeError, "loads must be callable");
+        return NULL;
+    }
+    return PyCFunction_New(&pg_typecast_json_def, loads);
+}
+
+static char pg_typecast_buffer__doc__[] =
+"typecast_buffer(type, value) -- return a read-only buffer of a string "
+"value.  For bytea values in binary format and character strings, the "
+"buffer references the memory of the result instead of a copy.";
+static PyObject *
+pg_typecast_buffer(PyObject *self, PyObject *args)
+{
+    PyObject *typ, *value;
+
+    if (!PyArg_ParseTuple(args, "OO:typecast_buffer", &typ, &value))
+        return NULL;
+    if (PyBuffer_Check(value)) {
+        Py_INCREF(value);
+        return value;
+    }
+    if (!PyString_Check(value)) {
+        PyErr_SetString(PyExc_TypeError, "typecast_buffer needs a string");
+        return NULL;
+    }
+    return PyBuffer_FromObject(value, 0, Py_END_OF_BUFFER);
+}
+
+/* --------------------------------------------------------------------- */
+/* ZERO-COPY VALUES */
+
+/* Values which reference the memory of a result are buffers of pg cell
+   objects, which keep a pg result object of the result. */
+
+typedef struct
+{
+    PyObject_HEAD
+    PyObject        *result;        /* pg result object of the memory */
+    char        *data;                /* the value */
+    Py_ssize_t        len;                /* length of the value */
+}        pgcellobject;
+
+staticforward PyTypeObject PgCellType;
+
+/* the pg result object of the last result; the source no longer frees
+   the result once it is made */
+static PyObject *_pg_source_result(pgsourceobject *self)
+{
+    pgresultobject *result;
+
+    if (self->result == NULL && self->last_result != NULL) {
+        if ((result = PyObject_NEW(pgresultobject, &PgResultType)) == NULL)
+            return NULL;
+        result->result = self->last_result;
+        self->result = (PyObject *) result;
+    }
+    return self->result;
+}
+
+static void
+pgresult_dealloc(pgresultobject * self)
+{
+    PQclear(self->result);
+    PyObject_Del(self);
+}
+
+staticforward PyTypeObject PgResultType = {
+        PyObject_HEAD_INIT(NULL)
+
+        0,                                /* ob_size */
+        "pgresult",                        /* tp_name */
+        sizeof(pgresultobject),                /* tp_basicsize */
+        0,                                /* tp_itemsize */
+        /* methods */
+        (destructor) pgresult_dealloc,        /* tp_dealloc */
+};
+
+static void
+pgcell_dealloc(pgcellobject * self)
+{
+    Py_DECREF(self->result);
+    PyObject_Del(self);
+}
+
+static Py_ssize_t
+pgcell_getreadbuffer(pgcellobject * self, Py_ssize_t segment, void **ptr)
+{
+    if (segment != 0) {
+        PyErr_SetString(PyExc_SystemError,
+                        "accessing non-existent cell segment");
+        return -1;
+    }
+    *ptr = self->data;
+    return self->len;
+}
+
+static Py_ssize_t
+pgcell_getsegcount(pgcellobject * self, Py_ssize_t * lenp)
+{
+    if (lenp)
+        *lenp = self->len;
+    return 1;
+}
+
+static int
+pgcell_getbuffer(pgcellobject * self, Py_buffer * view, int flags)
+{
+    return PyBuffer_FillInfo(view, (PyObject *) self, self->data, self->len,
+                             1, flags);
+}
+
+static PyBufferProcs pgcell_as_buffer = {
+        (readbufferproc) pgcell_getreadbuffer, /* bf_getreadbuffer */
+        0,                                /* bf_getwritebuffer */
+        (segcountproc) pgcell_getsegcount, /* bf_getsegcount */
+        (charbufferproc) pgcell_getreadbuffer, /* bf_getcharbuffer */
+        (getbufferproc) pgcell_getbuffer, /* bf_getbuffer */
+        0,                                /* bf_releasebuffer */
+};
+
+staticforward PyTypeObject PgCellType = {
+        PyObject_HEAD_INIT(NULL)
+
+        0,                                /* ob_size */
+        "pgcell",                        /* tp_name */
+        sizeof(pgcellobject),                /* tp_basicsize */
+        0,                                /* tp_itemsize */
+        /* methods */
+        (destructor) pgcell_dealloc,        /* tp_dealloc */
+        0,                                /* tp_print */
+        0,                                /* tp_getattr */
+        0,                                /* tp_setattr */
+        0,                                /* tp_compare */
+        0,                                /* tp_repr */
+        0,                                /* tp_as_number */
+        0,                                /* tp_as_sequence */
+        0,                                /* tp_as_mapping */
+        0,                                /* tp_hash */
+        0,                                /* tp_call */
+        0,                                /* tp_str */
+        0,                                /* tp_getattro */
+        0,                                /* tp_setattro */
+        &pgcell_as_buffer,                /* tp_as_buffer */
+        Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_NEWBUFFER, /* tp_flags */
+};
+
+/* a read-only buffer of the memory of a cell of the result of a pg
+   result object */
+static PyObject *_pg_cell_buffer(PyObject *result, char *cell, int len)
+{
+    pgcellobject *obj;
+    PyObject *ret;
+
+    if ((obj = PyObject_NEW(pgcellobject, &PgCellType)) == NULL)
+        return NULL;
+    Py_INCREF(result);
+    obj->result = result;
+    obj->data = cell;
+    obj->len = len;
+    ret = PyBuffer_FromObject((PyObject *) obj, 0, Py_END_OF_BUFFER);
+    Py_DECREF(obj);
+    return ret;
+}
+
+/* --------------------------------------------------------------------- */
+/* TYPE REGISTRY */
+
+/* The types of a database, as a dict of (typtype, typelem, typbasetype,
+   isarray, typdelim) tuples by type oid, are looked up by each connection
+   with a query in its current transaction. They are (re)loaded when a
+   result has a type they do not know; types still unknown then are kept
+   as None, so that they are not looked for again. Details of some kinds
+   of types, loaded when first needed, are kept in a dict by type oid
+   too. Both are kept until reset_types(), e.g. after an ALTER TYPE. */
+
+/* loads the types of the database of a connection */
+static PyObject *_pg_load_types(PGconn *cnx)
+{
+    PGresult *result;
+    PyObject *types, *key, *info;
+    int row;
+
+    Py_BEGIN_ALLOW_THREADS ;
+    result = PQexec(cnx, "SELECT oid, typtype, typelem, typbasetype, "
+                         "typinput = 'array_in'::regproc, typdelim "
+                         "FROM pg_type");
+    Py_END_ALLOW_THREADS ;
+    if (PQresultStatus(result) != PGRES_TUPLES_OK) {
+        PyErr_SetString(OperationalError, PQerrorMessage(cnx));
+        PQclear(result);
+        return NULL;
+    }
+    if ((types = PyDict_New()) == NULL) {
+        PQclear(result);
+        return NULL;
+    }
+    for (row = 0; row < PQntuples(result); row++) {
+        key = PyInt_FromLong(atol(PQgetvalue(result, row, 0)));
+        info = Py_BuildValue("(cllic)", *PQgetvalue(result, row, 1),
+                             atol(PQgetvalue(result, row, 2)),
+                             atol(PQgetvalue(result, row, 3)),
+                             *PQgetvalue(result, row, 4) == 't',
+                             *PQgetvalue(result, row, 5));
+        if (key == NULL || info == NULL ||
+            PyDict_SetItem(types, key, info) < 0) {
+            Py_XDECREF(key);
+            Py_XDECREF(info);
+            Py_DECREF(types);
+            PQclear(result);
+            return NULL;
+        }
+        Py_DECREF(key);
+        Py_DECREF(info);
+    }
+    PQclear(result);
+    return types;
+}
+
+/* what the registry knows of a type, as a borrowed reference, or NULL
+   if it does not know it, or with an exception set if it could not be
+   loaded; nothing is loaded while the connection is streaming a result
+   or its transaction has failed */
+static PyObject *_pg_type_info(pgobject *pgcnx, Oid type)
+{
+    PyObject *oid, *types, *info = NULL;
+
+    if ((oid = PyInt_FromLong(type)) == NULL)
+        return NULL;
+    if (pgcnx->types != NULL)
+        info = PyDict_GetItem(pgcnx->types, oid);
+    if (info == NULL && !pgcnx->streaming &&
+        PQtransactionStatus(pgcnx->cnx) != PQTRANS_INERROR &&
+        (types = _pg_load_types(pgcnx->cnx)) != NULL) {
+        /* the details of types may have changed too */
+        Py_CLEAR(pgcnx->typedetails);
+        Py_XDECREF(pgcnx->types);
+        pgcnx->types = types;
+        if ((info = PyDict_GetItem(types, oid)) == NULL &&
+            PyDict_SetItem(types, oid, Py_None) < 0) {
+            Py_DECREF(oid);
+            return NULL;
+        }
+    }
+    Py_DECREF(oid);
+    return info == Py_None ? NULL : info;
+}
+
+/* the type the values of a type are decoded as: the base type of a
+   domain, and text for an enum */
+static Oid _pg_type_alias(pgobject *pgcnx, Oid type)
+{
+    PyObject *info = _pg_type_info(pgcnx, type);
+
+    if (info == NULL)
+        return InvalidOid;
+    switch (PyString_AS_STRING(PyTuple_GET_ITEM(info, 0))[0]) {
+        case 'd':
+            return (Oid)PyInt_AS_LONG(PyTuple_GET_ITEM(info, 2));
+        case 'e':
+            return TEXTOID;
+        default:
+            return InvalidOid;
+    }
+}
+
+/* the details of a type, as a borrowed reference, loaded with load */
+static PyObject *_pg_type_details(pgobject *pgcnx, Oid type,
+                                  PyObject *(*load)(PGconn *, Oid))
+{
+    PyObject *oid, *details, *info = NULL;
+
+    if (pgcnx->typedetails == NULL &&
+        (pgcnx->typedetails = PyDict_New()) == NULL)
+        return NULL;
+    details = pgcnx->typedetails;
+    if ((oid = PyInt_FromLong(type)) == NULL)
+        return NULL;
+
+    if ((info = PyDict_GetItem(details, oid)) == NULL && pgcnx->streaming) {
+        PyErr_Format(NotSupportedError, "type %u cannot be loaded while "
+                     "streaming a result.", type);
+        goto done;
+    }
+    if (info == NULL && (info = load(pgcnx->cnx, type)) != NULL) {
+        if (PyDict_SetItem(details, oid, info) < 0) {
+            Py_DECREF(info);
+            info = NULL;
+            goto done;
+        }
+        Py_DECREF(info);
+    }
+
+done:
+    Py_DECREF(oid);
+    return info;
+}
+
+/* Composite types are decoded as records, instances of a namedtuple class
+   made from the names of their attributes. These and the types of the
+   attributes are looked up once per type and connection, as a
+   (class, types) tuple. */
+
+static PyObject *NamedTupleFactory = NULL;
+
+/* the kind of a type, its typtype, or 0 if unknown */
+static char _pg_type_kind(pgobject *pgcnx, Oid type)
+{
+    PyObject *info = _pg_type_info(pgcnx, type);
+
+    if (info == NULL)
+        return 0;
+    return PyString_AS_STRING(PyTuple_GET_ITEM(info, 0))[0];
+}
+
+/* loads the record class and attribute types of a composite type */
+static PyObject *_pg_load_composite(PGconn *cnx, Oid type)
+{
+    PGresult *result;
+    PyObject *names, *types, *args, *kwargs, *cls, *info;
+    char query[256];
+    int row, n;
+
+    if (_pg_import(&NamedTupleFactory, "collections", "namedtuple") == NULL)
+        return NULL;
+
+    snprintf(query, sizeof(query),
+             "SELECT t.typname, a.attname, a.atttypid "
+             "FROM pg_type t JOIN pg_attribute a ON a.attrelid = t.typrelid "
+             "WHERE t.oid = %u AND a.attnum > 0 AND NOT a.attisdropped "
+             "ORDER BY a.attnum", type);
+    Py_BEGIN_ALLOW_THREADS ;
+    result = PQexec(cnx, query);
+    Py_END_ALLOW_THREADS ;
+    if (PQresultStatus(result) != PGRES_TUPLES_OK) {
+        PyErr_SetString(OperationalError, PQerrorMessage(cnx));
+        PQclear(result);
+        return NULL;
+    }
+
+    n = PQntuples(result);
+    names = PyTuple_New(n);
+    types = PyTuple_New(n);
+    kwargs = Py_BuildValue("{sO}", "rename", Py_True);
+    if (names == NULL || types == NULL || kwargs == NULL)
+        goto error;
+    for (row = 0; row < n; row++) {
+        PyObject *name, *oid;
+        name = PyString_FromString(PQgetvalue(result, row, 1));
+        oid = PyInt_FromLong(atol(PQgetvalue(result, row, 2)));
+        if (name == NULL || oid == NULL) {
+            Py_XDECREF(name);
+            Py_XDECREF(oid);
+            goto error;
+        }
+        PyTuple_SET_ITEM(names, row, name);
+        PyTuple_SET_ITEM(types, row, oid);
+    }
+
+    args = Py_BuildValue("(sO)", n ? PQgetvalue(result, 0, 0) : "record",
+                         names);
+    cls = args ? PyObject_Call(NamedTupleFactory, args, kwargs) : NULL;
+    info = cls ? PyTuple_Pack(2, cls, types) : NULL;
+    Py_XDECREF(args);
+    Py_XDECREF(cls);
+    Py_DECREF(names);
+    Py_DECREF(types);
+    Py_DECREF(kwargs);
+    PQclear(result);
+    return info;
+
+error:
+    Py_XDECREF(names);
+    Py_XDECREF(types);
+    Py_XDECREF(kwargs);
+    PQclear(result);
+    return NULL;
+}
+
+/* Range types are decoded as pgsql.Range values, and multiranges as
+   pgsql.Multirange tuples of them. The subtypes of ranges and the range
+   types of multiranges other than the builtin ones are looked up in
+   pg_range. */
+
+static const Oid pg_range_types[][2] = {
+    {3904, INT4OID},
+    {3906, NUMERICOID},
+    {3908, TIMESTAMPOID},
+    {3910, TIMESTAMPTZOID},
+    {3912, DATEOID},
+    {3926, INT8OID},
+    {InvalidOid, InvalidOid}
+};
+
+static const Oid pg_multirange_types[][2] = {
+    {4451, 3904},
+    {4532, 3906},
+    {4533, 3908},
+    {4534, 3910},
+    {4535, 3912},
+    {4536, 3926},
+    {InvalidOid, InvalidOid}
+};
+
+/* loads a number, by a query with the oid of a type */
+static PyObject *_pg_load_int(PGconn *cnx, const char *sql, Oid type)
+{
+    PGresult *result;
+    PyObject *ret;
+    char query[128];
+
+    snprintf(query, sizeof(query), sql, type);
+    Py_BEGIN_ALLOW_THREADS ;
+    result = PQexec(cnx, query);
+    Py_END_ALLOW_THREADS ;
+    if (PQresultStatus(result) != PGRES_TUPLES_OK || PQntuples(result) != 1) {
+        PyErr_SetString(OperationalError, PQerrorMessage(cnx));
+        PQclear(result);
+        return NULL;
+    }
+    ret = PyInt_FromLong(atol(PQgetvalue(result, 0, 0)));
+    PQclear(result);
+    return ret;
+}
+
+static PyObject *_pg_load_range(PGconn *cnx, Oid type)
+{
+    return _pg_load_int(cnx,
+        "SELECT rngsubtype FROM pg_range WHERE rngtypid = %u", type);
+}
+
+static PyObject *_pg_load_multirange(PGconn *cnx, Oid type)
+{
+    return _pg_load_int(cnx,
+        "SELECT rngtypid FROM pg_range WHERE rngmultitypid = %u", type);
+}
+
+/* the digits after the point of money, by lc_monetary */
+static PyObject *_pg_load_cash(PGconn *cnx, Oid type)
+{
+    return _pg_load_int(cnx, "SELECT scale('1'::money::numeric)", type);
+}
+
+/* the subtype of a range type, or the range type of a multirange type,
+   as told by table or loaded with load for types of kind kind */
+static Oid _pg_range_lookup(pgobject *pgcnx, Oid type, const Oid table[][2],
+                            char kind, PyObject *(*load)(PGconn *, Oid))
+{
+    PyObject *info;
+    int i;
+
+    for (i = 0; table[i][0] != InvalidOid; i++)
+        if (table[i][0] == type)
+            return table[i][1];
+    if (_pg_type_kind(pgcnx, type) != kind)
+        return InvalidOid;
+    if ((info = _pg_type_details(pgcnx, type, load)) == NULL)
+        return InvalidOid;
+    return (Oid)PyInt_AS_LONG(info);
+}
+
+/* --------------------------------------------------------------------- */
+/* COLUMN DECODERS */
+
+/* values of types we have no decoder for are returned as buffers */
+static PyObject *_pg_decode_unknown(pgcolumn *column, char *cell, int len)
+{
+    return _pg_unknown_cell(cell, len);
+}
+
+/* text format */
+
+static PyObject *_pg_decode_bool(pgcolumn *column, char *cell, int len)
+{
+    return PyBool_FromLong(*cell == 't' || *cell == 'T');
+}
+
+static PyObject *_pg_decode_int(pgcolumn *column, char *cell, int len)
+{
+    return PyInt_FromString(cell, NULL, 10);
+}
+
+static PyObject *_pg_decode_int8(pgcolumn *column, char *cell, int len)
+{
+#if(SIZEOF_LONG > 4)
+    return PyInt_FromString(cell, NULL, 10);
+#else
+    return PyLong_FromString(cell, NULL, 10);
+#endif
+}
+
+static PyObject *_pg_decode_float(pgcolumn *column, char *cell, int len)
+{
+    return _pg_float_from_text(cell);
+}
+
+/* nasty $-x,yyy.zzz format */
+static PyObject *_pg_decode_cash(pgcolumn *column, char *cell, int len)
+{
+    int cashsign = 1;
+    char *cashbuf = malloc(len + 1);
+    char *s = cell;
+    int k = 0;
+    PyObject *ret;
+
+    if (cashbuf == NULL)
+        return PyErr_NoMemory();
+    /* get rid of the '$' and commas */
+    for (k=0 ; *s ; s++) {
+        if (*s == '$' || *s ==',' || *s == ' ' || *s == ')') continue;
+        if (*s == '-' || *s == '(') {
+            cashsign = -1;
+            continue;
+        }
+        cashbuf[k++] = *s;
+    }
+    cashbuf[k] = 0;
+    ret = PyFloat_FromDouble(strtod(cashbuf, NULL) * cashsign);
+    free(cashbuf);
+    return ret;
+}
+
+/* also the binary format of the character string types */
+static PyObject *_pg_decode_string(pgcolumn *column, char *cell, int len)
+{
+    return PyString_FromStringAndSize(cell, len);
+}
+
+/* character strings decoded with the client encoding */
+static PyObject *_pg_unicode_from_text(PyObject *encoding, const char *cell,
+                                       Py_ssize_t len)
+{
+    if (encoding == NULL)
+        return PyUnicode_DecodeUTF8(cell, len, NULL);
+    return PyUnicode_Decode(cell, len, PyString_AS_STRING(encoding), NULL);
+}
+
+static PyObject *_pg_decode_unicode(pgcolumn *column, char *cell, int len)
+{
+    return _pg_unicode_from_text(column->encoding, cell, len);
+}
+
+static PyObject *_pg_decode_bytea(pgcolumn *column, char *cell, int len)
+{
+    /* bytea values returned in text mode need to be decoded */
+    char *newStr;
+    size_t newLen;
+    PyObject *ret;
+
+    if ((newStr = (char *)PQunescapeBytea((unsigned char *)cell, &newLen)) == NULL)
+        return PyErr_NoMemory();
+    ret = PyString_FromStringAndSize(newStr, (Py_ssize_t)newLen);
+    PQfreemem(newStr);
+    return ret;
+}
+
+/* bytea in binary format and character strings, as they are */
+static PyObject *_pg_decode_buffer(pgcolumn *column, char *cell, int len)
+{
+    if (column->result == NULL)
+        return _pg_unknown_cell(cell, len);
+    return _pg_cell_buffer(column->result, cell, len);
+}
+
+static PyObject *_pg_decode_uuid(pgcolumn *column, char *cell, int len)
+{
+    PyObject *tmp, *ret;
+
+    if (_pg_import(&UUIDType, "uuid", "UUID") == NULL)
+        return NULL;
+    if ((tmp = PyString_FromStringAndSize(cell, len)) == NULL)
+        return NULL;
+    ret = PyObject_CallFunctionObjArgs(UUIDType, tmp, NULL);
+    Py_DECREF(tmp);
+    return ret;
+}
+
+static PyObject *_pg_decode_json(pgcolumn *column, char *cell, int len)
+{
+    PyObject *text, *ret;
+
+    if ((text = PyString_FromStringAndSize(cell, len)) == NULL)
+        return NULL;
+    ret = PyObject_CallFunctionObjArgs(column->loads, text, NULL);
+    Py_DECREF(text);
+    return ret;
+}
+
+static PyObject *_pg_decode_date(pgcolumn *column, char *cell, int len)
+{
+    return _pg_date_from_text(cell);
+}
+
+static PyObject *_pg_decode_datetime(pgcolumn *column, char *cell, int len)
+{
+    return _pg_datetime_from_text(cell);
+}
+
+static PyObject *_pg_decode_time(pgcolumn *column, char *cell, int len)
+{
+    return _pg_time_from_text(cell);
+}
+
+static PyObject *_pg_decode_interval(pgcolumn *column, char *cell, int len)
+{
+    return _pg_interval_from_text(cell);
+}
+
+static PyObject *_pg_decode_decimal(pgcolumn *column, char *cell, int len)
+{
+    return _pg_decimal_from_text(cell);
+}
+
+static PyObject *_pg_decode_scaled(pgcolumn *column, char *cell, int len)
+{
+    return _pg_scaled_from_text(cell, column->scale);
+}
+
+/* binary format */
+
+static PyObject *_pg_decode_bool_bin(pgcolumn *column, char *cell, int len)
+{
+    return PyBool_FromLong(*cell);
+}
+
+static PyObject *_pg_decode_int2_bin(pgcolumn *column, char *cell, int len)
+{
+    return PyInt_FromLong(_pg_get_int16(cell));
+}
+
+static PyObject *_pg_decode_int4_bin(pgcolumn *column, char *cell, int len)
+{
+    return PyInt_FromLong(_pg_get_int32(cell));
+}
+
+static PyObject *_pg_decode_oid_bin(pgcolumn *column, char *cell, int len)
+{
+#if(SIZEOF_LONG > 4)
+    return PyInt_FromLong((uint32)_pg_get_int32(cell));
+#else
+    return PyLong_FromUnsignedLong((uint32)_pg_get_int32(cell));
+#endif
+}
+
+static PyObject *_pg_decode_int8_bin(pgcolumn *column, char *cell, int len)
+{
+#if(SIZEOF_LONG > 4)
+    return PyInt_FromLong(_pg_get_int64(cell));
+#else
+    return PyLong_FromLongLong(_pg_get_int64(cell));
+#endif
+}
+
+static PyObject *_pg_decode_float4_bin(pgcolumn *column, char *cell, int len)
+{
+    union { int32 i; float f; } u;
+    u.i = _pg_get_int32(cell);
+    return PyFloat_FromDouble(u.f);
+}
+
+static PyObject *_pg_decode_float8_bin(pgcolumn *column, char *cell, int len)
+{
+    union { int64 i; double d; } u;
+    u.i = _pg_get_int64(cell);
+    return PyFloat_FromDouble(u.d);
+}
+
+static PyObject *_pg_decode_date_bin(pgcolumn *column, char *cell, int len)
+{
+    return _pg_date_from_days(_pg_get_int32(cell));
+}
+
+static PyObject *_pg_decode_timestamp_bin(pgcolumn *column, char *cell, int len)
+{
+    return _pg_datetime_from_usecs(_pg_get_int64(cell), Py_None);
+}
+
+/* timestamp with time zone is sent as UTC */
+static PyObject *_pg_decode_timestamptz_bin(pgcolumn *column, char *cell, int len)
+{
+    PyObject *tz = _pg_tzinfo(0);
+    if (tz == NULL)
+        return NULL;
+    return _pg_datetime_from_usecs(_pg_get_int64(cell), tz);
+}
+
+static PyObject *_pg_decode_time_bin(pgcolumn *column, char *cell, int len)
+{
+    return _pg_time_from_usecs(_pg_get_int64(cell), Py_None);
+}
+
+/* the zone is sent as seconds west of UTC */
+static PyObject *_pg_decode_timetz_bin(pgcolumn *column, char *cell, int len)
+{
+    PyObject *tz = _pg_tzinfo(-_pg_get_int32(cell + 8));
+    if (tz == NULL)
+        return NULL;
+    return _pg_time_from_usecs(_pg_get_int64(cell), tz);
+}
+
+static PyObject *_pg_decode_interval_bin(pgcolumn *column, char *cell, int len)
+{
+    return _pg_interval_new(_pg_get_int32(cell + 12), _pg_get_int32(cell + 8),
+                            _pg_get_int64(cell));
+}
+
+static PyObject *_pg_decode_uuid_bin(pgcolumn *column, char *cell, int len)
+{
+    return _pg_uuid_from_bytes(cell);
+}
+
+/* money is sent as an int64 of the smallest unit, of which there are
+   10 ** scale in one, as set up from lc_monetary */
+static PyObject *_pg_decode_cash_bin(pgcolumn *column, char *cell, int len)
+{
+    double value = (double)_pg_get_int64(cell);
+    long i;
+
+    for (i = 0; i < column->scale; i++)
+        value /= 10;
+    return PyFloat_FromDouble(value);
+}
+
+/* inet and cidr are sent as family, bits, is_cidr, the length of the
+   address and the address; they are decoded to their text, which is the
+   address, followed by /bits unless it is a single host of an inet */
+static PyObject *_pg_decode_inet_bin(pgcolumn *column, char *cell, int len)
+{
+    unsigned char *p = (unsigned char *)cell;
+    char text[INET6_ADDRSTRLEN + 8];
+    int family, maxbits;
+
+    /* PGSQL_AF_INET and PGSQL_AF_INET6 */
+    if (len == 8 && p[0] == AF_INET + 0 && p[3] == 4) {
+        family = AF_INET;
+        maxbits = 32;
+    } else if (len == 20 && p[0] == AF_INET + 1 && p[3] == 16) {
+        family = AF_INET6;
+        maxbits = 128;
+    } else {
+        PyErr_SetString(InternalError, "invalid binary inet value");
+        return NULL;
+    }
+    if (inet_ntop(family, p + 4, text, sizeof(text)) == NULL)
+        return PyErr_SetFromErrno(InternalError);
+    if (p[2] || p[1] != maxbits)
+        snprintf(text + strlen(text), 8, "/%u", p[1]);
+    return PyString_FromString(text);
+}
+
+/* binary jsonb is a format version, 1, followed by the text */
+static PyObject *_pg_decode_jsonb_bin(pgcolumn *column, char *cell, int len)
+{
+    if (len < 1 || *cell != 1) {
+        PyErr_SetString(InternalError, "unsupported binary jsonb version");
+        return NULL;
+    }
+    return PyString_FromStringAndSize(cell + 1, len - 1);
+}
+
+static PyObject *_pg_decode_jsonb_json(pgcolumn *column, char *cell, int len)
+{
+    if (len < 1 || *cell != 1) {
+        PyErr_SetString(InternalError, "unsupported binary jsonb version");
+        return NULL;
+    }
+    return _pg_decode_json(column, cell + 1, len - 1);
+}
+
+/* binary numerics are decoded through their text form */
+static PyObject *_pg_decode_numeric_bin(pgcolumn *column, char *cell, int len)
+{
+    char *text;
+    PyObject *ret;
+
+    if ((text = _pg_numeric_binary_text(cell, len)) == NULL)
+        return NULL;
+    ret = column->numeric(column, text, strlen(text));
+    free(text);
+    return ret;
+}
+
+/* the decoder of the values of a type in a format */
+static pgdecoder _pg_type_decoder(Oid type, int format)
+{
+    if (format == 1) {
+        switch (type) {
+            case BOOLOID:
+                return _pg_decode_bool_bin;
+            case INT2OID:
+                return _pg_decode_int2_bin;
+            case INT4OID:
+                return _pg_decode_int4_bin;
+            case OIDOID:
+            case XIDOID:
+                return _pg_decode_oid_bin;
+            case INT8OID:
+                return _pg_decode_int8_bin;
+            case FLOAT4OID:
+                return _pg_decode_float4_bin;
+            case FLOAT8OID:
+                return _pg_decode_float8_bin;
+            case NUMERICOID:
+                return _pg_decode_numeric_bin;
+            case DATEOID:
+                return _pg_decode_date_bin;
+            case TIMESTAMPOID:
+                return _pg_decode_timestamp_bin;
+            case TIMESTAMPTZOID:
+                return _pg_decode_timestamptz_bin;
+            case TIMEOID:
+                return _pg_decode_time_bin;
+            case TIMETZOID:
+                return _pg_decode_timetz_bin;
+            case INTERVALOID:
+                return _pg_decode_interval_bin;
+            case UUIDOID:
+                return _pg_decode_uuid_bin;
+            case CASHOID:
+                return _pg_decode_cash_bin;
+            case INETOID:
+            case CIDROID:
+                return _pg_decode_inet_bin;
+            case JSONBOID:
+                return _pg_decode_jsonb_bin;
+            /* character strings and bytea are sent as-is */
+            case BPCHAROID:
+            case VARCHAROID:
+            case NAMEOID:
+            case CHAROID:
+            case TEXTOID:
+            case BYTEAOID:
+            case JSONOID:
+                return _pg_decode_string;
+            default:
+                return _pg_decode_unknown;
+        }
+    }
+
+    switch (type) {
+        case BOOLOID:
+            return _pg_decode_bool;
+        case INT2OID:
+        case INT4OID:
+            return _pg_decode_int;
+        case INT8OID:
+        case OIDOID:
+        case XIDOID:
+            return _pg_decode_int8;
+        case FLOAT8OID:
+        case FLOAT4OID:
+            return _pg_decode_float;
+        case CASHOID:
+            return _pg_decode_cash;
+        /* Decoding these is up to the typecasts */
+        case DATEOID:
+        case ABSTIMEOID:
+        case RELTIMEOID:
+        case TIMESTAMPOID:
+        case TIMESTAMPTZOID:
+        case TINTERVALOID:
+        case INTERVALOID:
+        case TIMEOID:
+        case TIMETZOID:
+        case NUMERICOID:
+        case JSONOID:
+        case JSONBOID:
+        /* .. and these are actual character string types */
+        case BPCHAROID:
+        case VARCHAROID:
+        case NAMEOID:
+        case CHAROID:
+        case TEXTOID:
+            return _pg_decode_string;
+        case BYTEAOID:
+            return _pg_decode_bytea;
+        case UUIDOID:
+            return _pg_decode_uuid;
+        default:
+            return _pg_decode_unknown;
+    }
+}
+
+static PyObject *_pgsource_typecode(int typecode);
+static PyObject *pg_typecast_string(pgobject *self, PyObject *args);
+
+/* builtin typecasts are replaced by their decoders, instead of being
+   called with the string value of each cell */
+typedef struct
+{
+    PyCFunction        typecast;
+    pgdecoder        decode;                /* decoder of the string value */
+    int                passthrough;        /* returns other values unchanged */
+} pgbuiltincast;
+
+static pgbuiltincast pg_builtin_casts[] = {
+    {(PyCFunction) pg_typecast_string, _pg_decode_unicode, 0},
+    {pg_typecast_date, _pg_decode_date, 1},
+    {pg_typecast_datetime, _pg_decode_datetime, 1},
+    {pg_typecast_time, _pg_decode_time, 1},
+    {pg_typecast_interval, _pg_decode_interval, 1},
+    {pg_typecast_numeric, _pg_decode_decimal, 1},
+    {pg_typecast_numeric_float, _pg_decode_float, 0},
+    {pg_typecast_numeric_scaled, _pg_decode_scaled, 0},
+    {pg_typecast_json, _pg_decode_json, 1},
+    {pg_typecast_buffer, _pg_decode_buffer, 0},
+    {NULL, NULL, 0}
+};
+
+/* the typecast of a type: by type oid or type code in the typecasts */
+static PyObject *_pg_type_cast(pgsourceobject *self, Oid type,
+                               PyObject *typecode)
+{
+    PyObject *key, *cast = NULL;
+
+    if (self->typecasts) {
+        if ((key = PyInt_FromLong(type)) == NULL)
+            return NULL;
+        cast = PyDict_GetItem(self->typecasts, key);
+        Py_DECREF(key);
+        if (cast == NULL)
+            cast = PyDict_GetItem(self->typecasts, typecode);
+    }
+    if (cast == NULL)
+        cast = Py_None;
+    Py_INCREF(cast);
+    return cast;
+}
+
+/* the typecast of a column: by column index or name in the columncasts,
+   then that of its type */
+static PyObject *_pg_column_cast(pgsourceobject *self, int col,
+                                 PyObject *typecode)
+{
+    PyObject *key, *cast = NULL;
+
+    if (self->columncasts) {
+        if ((key = PyInt_FromLong(col)) == NULL)
+            return NULL;
+        cast = PyDict_GetItem(self->columncasts, key);
+        Py_DECREF(key);
+        if (cast == NULL)
+            cast = PyDict_GetItemString(self->columncasts,
+                                        PQfname(self->last_result, col));
+    }
+    if (cast == NULL)
+        return _pg_type_cast(self, PQftype(self->last_result, col), typecode);
+    Py_INCREF(cast);
+    return cast;
+}
+
+/* the slot of the value of a cell in the interned values of a column */
+static pginterned *_pg_intern_slot(pginterns *interns, const char *cell,
+                                   int len, unsigned long *hash)
+{
+    pginterned *slot;
+    unsigned long h = 2166136261UL;
+    int i;
+
+    /* FNV-1a */
+    for (i = 0; i < len; i++)
+        h = (h ^ (unsigned char)cell[i]) * 16777619UL;
+    *hash = h;
+    for (i = h & (PG_INTERN_SIZE - 1); ; i = (i + 1) & (PG_INTERN_SIZE - 1)) {
+        slot = interns->slots + i;
+        if (slot->cell == NULL || (slot->hash == h && slot->len == len &&
+                                   !memcmp(slot->cell, cell, len)))
+            return slot;
+    }
+}
+
+/* decodes a value, shared with the cells of the same text */
+static PyObject *_pg_decode_interned(pgcolumn *column, char *cell, int len)
+{
+    pginterned *slot;
+    unsigned long hash;
+    PyObject *value;
+
+    slot = _pg_intern_slot(column->interns, cell, len, &hash);
+    if (slot->cell) {
+        Py_INCREF(slot->value);
+        return slot->value;
+    }
+    if ((value = column->decode(column, cell, len)) == NULL)
+        return NULL;
+    /* values beyond the first PG_INTERN_MAX are not shared */
+    if (column->interns->count < PG_INTERN_MAX &&
+        (slot->cell = malloc(len + 1)) != NULL) {
+        memcpy(slot->cell, cell, len);
+        slot->len = len;
+        slot->hash = hash;
+        Py_INCREF(value);
+        slot->value = value;
+        column->interns->count++;
+    }
+    return value;
+}
+
+/* decodes a value and applies its typecast */
+static PyObject *_pg_decode_value(pgcolumn *column, char *cell, int len)
+{
+    PyObject *value, *ret;
+
+    if (column->interns)
+        return _pg_decode_interned(column, cell, len);
+    value = column->decode(column, cell, len);
+    if (value == NULL || column->cast == NULL)
+        return value;
+    ret = PyObject_CallFunctionObjArgs(column->cast, column->typecode,
+                                       value, NULL);
+    Py_DECREF(value);
+    return ret;
+}
+
+/* ARRAYS */
+
+/* the most dimensions a PostgreSQL array can have */
+#define PG_ARRAY_MAXDIM 6
+
+/* element types of the builtin array types */
+static const Oid pg_array_types[][2] = {
+    {1000, BOOLOID},
+    {1001, BYTEAOID},
+    {1002, CHAROID},
+    {1003, NAMEOID},
+    {1005, INT2OID},
+    {1007, INT4OID},
+    {1009, TEXTOID},
+    {1011, XIDOID},
+    {1014, BPCHAROID},
+    {1015, VARCHAROID},
+    {1016, INT8OID},
+    {1021, FLOAT4OID},
+    {1022, FLOAT8OID},
+    {1028, OIDOID},
+    {791, CASHOID},
+    {1115, TIMESTAMPOID},
+    {1182, DATEOID},
+    {1183, TIMEOID},
+    {1185, TIMESTAMPTZOID},
+    {1187, INTERVALOID},
+    {1231, NUMERICOID},
+    {1270, TIMETZOID},
+    {2951, UUIDOID},
+    {3905, 3904},
+    {3907, 3906},
+    {3909, 3908},
+    {3911, 3910},
+    {3913, 3912},
+    {3927, 3926},
+    {199, JSONOID},
+    {3807, JSONBOID},
+    {InvalidOid, InvalidOid}
+};
+
+/* the element type of an array type, and the delimiter of its elements
+   in text, looked up in the registry for other than the builtin array
+   types */
+static Oid _pg_array_element(pgobject *pgcnx, Oid type, pgdecoder decode,
+                             char *delim)
+{
+    PyObject *info;
+    Oid element;
+    int i;
+
+    *delim = ',';
+    for (i = 0; pg_array_types[i][0] != InvalidOid; i++)
+        if (pg_array_types[i][0] == type)
+            return pg_array_types[i][1];
+    if (decode != _pg_decode_unknown)
+        return InvalidOid;
+
+    /* arrays are the types read by array_in, which int2vector and
+       oidvector are not; the delimiter is that of the element type,
+       e.g. ';' for box */
+    if ((info = _pg_type_info(pgcnx, type)) == NULL ||
+        !PyInt_AS_LONG(PyTuple_GET_ITEM(info, 3)))
+        return InvalidOid;
+    element = (Oid)PyInt_AS_LONG(PyTuple_GET_ITEM(info, 1));
+    if ((info = _pg_type_info(pgcnx, element)) == NULL)
+        return InvalidOid;
+    *delim = PyString_AS_STRING(PyTuple_GET_ITEM(info, 4))[0];
+    return element;
+}
+
+static PyObject *_pg_bad_array(void)
+{
+    PyErr_SetString(InternalError, "invalid array value");
+    return NULL;
+}
+
+/* parses the array literal at *s, which starts with its '{', into a
+   (nested) list of elements separated by delim; buf has room for any
+   element */
+static PyObject *_pg_array_from_text(pgcolumn *element, const char **s,
+                                     char *buf, char delim)
+{
+    PyObject *list, *item;
+    const char *p = *s + 1;
+    char *b;
+    int quoted;
+
+    if ((list = PyList_New(0)) == NULL)
+        return NULL;
+    while (isspace((unsigned char)*p))
+        p++;
+    if (*p == '}') {
+        *s = p + 1;
+        return list;
+    }
+
+    for (;;) {
+        while (isspace((unsigned char)*p))
+            p++;
+        if (*p == '{') {
+            item = _pg_array_from_text(element, &p, buf, delim);
+        } else {
+            b = buf;
+            quoted = *p == '"';
+            if (quoted) {
+                for (p++; *p && *p != '"'; *b++ = *p++)
+                    if (*p == '\\' && p[1])
+                        p++;
+                if (*p++ != '"')
+                    goto bad;
+            } else {
+                for (; *p && *p != delim && *p != '}'; *b++ = *p++)
+                    if (*p == '\\' && p[1])
+                        p++;
+                while (b > buf && isspace((unsigned char)b[-1]))
+                    b--;
+            }
+            *b = '\0';
+            if (!quoted && !strcasecmp(buf, "NULL")) {
+                Py_INCREF(Py_None);
+                item = Py_None;
+            } else
+                item = _pg_decode_value(element, buf, b - buf);
+        }
+        if (item == NULL || PyList_Append(list, item) < 0) {
+            Py_XDECREF(item);
+            Py_DECREF(list);
+            return NULL;
+        }
+        Py_DECREF(item);
+
+        while (isspace((unsigned char)*p))
+            p++;
+        if (*p == '}') {
+            *s = p + 1;
+            return list;
+        }
+        if (*p++ != delim)
+            goto bad;
+    }
+
+bad:
+    Py_DECREF(list);
+    return _pg_bad_array();
+}
+
+static PyObject *_pg_decode_array(pgcolumn *column, char *cell, int len)
+{
+    const char *p = cell;
+    PyObject *ret;
+    char *buf;
+
+    /* skip the dimensions, given if a lower bound is not 1 */
+    if (*p == '[' && (p = strchr(p, '=')) != NULL)
+        p++;
+    if (p == NULL || *p != '{')
+        return _pg_bad_array();
+    if ((buf = malloc(len + 1)) == NULL)
+        return PyErr_NoMemory();
+    ret = _pg_array_from_text(column->element, &p, buf, column->delim);
+    free(buf);
+    return ret;
+}
+
+/* reads the elements of the binary array dimensions dims[0..ndim-1]
+   from *p into a (nested) list */
+static PyObject *_pg_array_from_binary(pgcolumn *element, char **p,
+                                       char *end, int ndim, int32 *dims)
+{
+    PyObject *list, *item;
+    int32 i, len;
+
+    if ((list = PyList_New(dims[0])) == NULL)
+        return NULL;
+    for (i = 0; i < dims[0]; i++) {
+        if (ndim > 1)
+            item = _pg_array_from_binary(element, p, end, ndim - 1, dims + 1);
+        else {
+            if (end - *p < 4)
+                goto bad;
+            len = _pg_get_int32(*p);
+            *p += 4;
+            if (len < 0) {
+                Py_INCREF(Py_None);
+                item = Py_None;
+            } else {
+                if (end - *p < len)
+                    goto bad;
+                item = _pg_decode_value(element, *p, len);
+                *p += len;
+            }
+        }
+        if (item == NULL) {
+            Py_DECREF(list);
+            return NULL;
+        }
+        PyList_SET_ITEM(list, i, item);
+    }
+    return list;
+
+bad:
+    Py_DECREF(list);
+    return _pg_bad_array();
+}
+
+/* a binary array is its number of dimensions, a has-nulls flag, the
+   element type, the size and lower bound of each dimension, and then
+   the elements, each a length (-1 for NULL) and its bytes */
+static PyObject *_pg_decode_array_bin(pgcolumn *column, char *cell, int len)
+{
+    int32 ndim, dims[PG_ARRAY_MAXDIM], i;
+    char *p = cell + 12, *end = cell + len;
+
+    if (len < 12)
+        return _pg_bad_array();
+    ndim = _pg_get_int32(cell);
+    if (ndim == 0)
+        return PyList_New(0);
+    if (ndim < 0 || ndim > PG_ARRAY_MAXDIM || len < 12 + ndim * 8)
+        return _pg_bad_array();
+    for (i = 0; i < ndim; i++, p += 8)
+        dims[i] = _pg_get_int32(p);
+    return _pg_array_from_binary(column->element, &p, end, ndim, dims);
+}
+
+/* RECORDS */
+
+static int _pg_column_init(pgsourceobject *self, pgcolumn *column,
+                           Oid type, int format, int col);
+
+static PyObject *_pg_bad_record(void)
+{
+    PyErr_SetString(InternalError, "invalid record value");
+    return NULL;
+}
+
+/* the decoding of field i of a record of type type, set up when it is
+   first needed; anonymous records only tell the types of their fields
+   with their values */
+static pgcolumn *_pg_record_field(pgcolumn *column, int i, Oid type,
+                                  int format)
+{
+    pgcolumn *field;
+
+    if (i >= column->nfields) {
+        if ((field = realloc(column->fields, (i + 1) * sizeof(pgcolumn))) == NULL) {
+            PyErr_NoMemory();
+            return NULL;
+        }
+        memset(field + column->nfields, 0,
+               (i + 1 - column->nfields) * sizeof(pgcolumn));
+        column->fields = field;
+        column->nfields = i + 1;
+    }
+    field = column->fields + i;
+    if (field->decode == NULL || field->type != type) {
+        _pg_column_clear(field);
+        memset(field, 0, sizeof(pgcolumn));
+        if (!_pg_column_init(column->source, field, type, format, -1))
+            return NULL;
+        field->type = type;
+        /* the source may have moved on to another result */
+        if (field->decode == _pg_decode_buffer) {
+            Py_XDECREF(field->result);
+            Py_XINCREF(column->result);
+            field->result = column->result;
+        }
+    }
+    return field;
+}
+
+/* makes a record of the values of its fields */
+static PyObject *_pg_record_new(pgcolumn *column, PyObject *values)
+{
+    PyObject *args, *ret;
+
+    if (column->record == NULL) {
+        Py_INCREF(values);
+        return values;
+    }
+    if ((args = PyTuple_Pack(1, values)) == NULL)
+        return NULL;
+    /* the namedtuple classes' __new__ would just do this, in Python */
+    ret = PyTuple_Type.tp_new((PyTypeObject *)column->record, args, NULL);
+    Py_DECREF(args);
+    return ret;
+}
+
+/* a record literal is its fields in parentheses, separated by commas;
+   NULL fields are empty, and fields may be quoted, with quotes doubled or
+   backslash escaped */
+static PyObject *_pg_decode_record(pgcolumn *column, char *cell, int len)
+{
+    const char *p = cell;
+    PyObject *values, *tuple, *ret, *item;
+    pgcolumn *field;
+    char *buf, *b;
+    int i, quoted, inquotes;
+
+    if (*p++ != '(')
+        return _pg_bad_record();
+    if ((values = PyList_New(0)) == NULL)
+        return NULL;
+    if ((buf = malloc(len + 1)) == NULL) {
+        Py_DECREF(values);
+        return PyErr_NoMemory();
+    }
+
+    /* anonymous records can have no fields */
+    if (column->record == NULL && !strcmp(p, ")"))
+        p++;
+    else for (i = 0; ; i++) {
+        b = buf;
+        quoted = inquotes = 0;
+        while (*p && (inquotes || (*p != ',' && *p != ')'))) {
+            if (*p == '"') {
+                if (inquotes && p[1] == '"') {
+                    *b++ = '"';
+                    p += 2;
+                    continue;
+                }
+                inquotes = !inquotes;
+                quoted = 1;
+                p++;
+                continue;
+            }
+            if (*p == '\\' && p[1])
+                p++;
+            *b++ = *p++;
+        }
+        if (!*p)
+            goto bad;
+        *b = '\0';
+
+        if (b == buf && !quoted) {
+            Py_INCREF(Py_None);
+            item = Py_None;
+        } else {
+            if (column->record && i >= column->nfields)
+                goto bad;
+            if ((field = _pg_record_field(column, i,
+                         column->record ? column->fields[i].type : TEXTOID,
+                         0)) == NULL)
+                goto error;
+            item = _pg_decode_value(field, buf, b - buf);
+        }
+        if (item == NULL || PyList_Append(values, item) < 0) {
+            Py_XDECREF(item);
+            goto error;
+        }
+        Py_DECREF(item);
+        if (*p++ == ')')
+            break;
+    }
+    if (*p || (column->record && PyList_GET_SIZE(values) != column->nfields))
+        goto bad;
+
+    free(buf);
+    tuple = PyList_AsTuple(values);
+    Py_DECREF(values);
+    if (tuple == NULL)
+        return NULL;
+    ret = _pg_record_new(column, tuple);
+    Py_DECREF(tuple);
+    return ret;
+
+bad:
+    _pg_bad_record();
+error:
+    free(buf);
+    Py_DECREF(values);
+    return NULL;
+}
+
+/* a binary record is its number of fields, followed by the type, length
+   (-1 for NULL) and bytes of each */
+static PyObject *_pg_decode_record_bin(pgcolumn *column, char *cell, int len)
+{
+    char *p = cell + 4, *end = cell + len;
+    PyObject *values, *ret, *item;
+    pgcolumn *field;
+    int32 n, i, flen;
+
+    if (len < 4)
+        return _pg_bad_record();
+    n = _pg_get_int32(cell);
+    if (n < 0 || (column->record && n != column->nfields))
+        return _pg_bad_record();
+    if ((values = PyTuple_New(n)) == NULL)
+        return NULL;
+    for (i = 0; i < n; i++) {
+        if (end - p < 8)
+            goto bad;
+        flen = _pg_get_int32(p + 4);
+        if (flen < 0) {
+            Py_INCREF(Py_None);
+            item = Py_None;
+        } else {
+            if (end - p - 8 < flen)
+                goto bad;
+            field = _pg_record_field(column, i, (Oid)_pg_get_int32(p), 1);
+            if (field == NULL)
+                goto error;
+            item = _pg_decode_value(field, p + 8, flen);
+            if (item == NULL)
+                goto error;
+        }
+        PyTuple_SET_ITEM(values, i, item);
+        p += 8 + (flen < 0 ? 0 : flen);
+    }
+    ret = _pg_record_new(column, values);
+    Py_DECREF(values);
+    return ret;
+
+bad:
+    _pg_bad_record();
+error:
+    Py_DECREF(values);
+    return NULL;
+}
+
+/* sets up the decoding of records of a composite type, or anonymous
+   records, of which the fields are set up as they are met */
+static int _pg_record_init(pgsourceobject *self, pgcolumn *column,
+                           Oid type, int format)
+{
+    PyObject *info, *types;
+    int i;
+
+    column->decode = format ? _pg_decode_record_bin : _pg_decode_record;
+    column->source = self;
+    /* for the fields of anonymous records, which are set up later */
+    if (!self->streaming) {
+        if ((column->result = _pg_source_result(self)) == NULL)
+            return 0;
+        Py_INCREF(column->result);
+    }
+    if (type == RECORDOID)
+        return 1;
+
+    if ((info = _pg_type_details(self->pgcnx, type, _pg_load_composite)) == NULL)
+        return 0;
+    column->record = PyTuple_GET_ITEM(info, 0);
+    Py_INCREF(column->record);
+    /* the fields may reload the registry, and with it the details */
+    types = PyTuple_GET_ITEM(info, 1);
+    Py_INCREF(types);
+    for (i = 0; i < PyTuple_GET_SIZE(types); i++)
+        if (_pg_record_field(column, i,
+                             (Oid)PyInt_AS_LONG(PyTuple_GET_ITEM(types, i)),
+                             format) == NULL) {
+            Py_DECREF(types);
+            return 0;
+        }
+    Py_DECREF(types);
+    return 1;
+}
+
+/* RANGES */
+
+static PyObject *_pg_bad_range(void)
+{
+    PyErr_SetString(InternalError, "invalid range value");
+    return NULL;
+}
+
+/* makes a pgsql.Range, or a pgsql.Multirange of a tuple of ranges */
+static PyObject *_pg_range_new(PyObject **cache, const char *name,
+                               PyObject *values)
+{
+    PyObject *args, *ret;
+
+    if (_pg_import(cache, "pgsql", name) == NULL)
+        return NULL;
+    if ((args = PyTuple_Pack(1, values)) == NULL)
+        return NULL;
+    ret = PyTuple_Type.tp_new((PyTypeObject *)*cache, args, NULL);
+    Py_DECREF(args);
+    return ret;
+}
+
+static PyObject *_pg_range_build(PyObject *lower, PyObject *upper,
+                                 const char *bounds)
+{
+    PyObject *values, *ret;
+
+    values = Py_BuildValue("(OOs)", lower ? lower : Py_None,
+                           upper ? upper : Py_None, bounds);
+    if (values == NULL)
+        return NULL;
+    ret = _pg_range_new(&RangeType, "Range", values);
+    Py_DECREF(values);
+    return ret;
+}
+
+/* parses a range bound at *p, which ends at one of the stop characters;
+   unquoted empty bounds are unbounded */
+static PyObject *_pg_range_bound(pgcolumn *subtype, const char **p,
+                                 char *buf, const char *stop)
+{
+    const char *s = *p;
+    char *b = buf;
+    int quoted = 0, inquotes = 0;
+
+    while (*s && (inquotes || !strchr(stop, *s))) {
+        if (*s == '"') {
+            if (inquotes && s[1] == '"') {
+                *b++ = '"';
+                s += 2;
+                continue;
+            }
+            inquotes = !inquotes;
+            quoted = 1;
+            s++;
+            continue;
+        }
+        if (*s == '\\' && s[1])
+            s++;
+        *b++ = *s++;
+    }
+    if (!*s)
+        return _pg_bad_range();
+    *b = '\0';
+    *p = s;
+    if (b == buf && !quoted) {
+        Py_INCREF(Py_None);
+        return Py_None;
+    }
+    return _pg_decode_value(subtype, buf, b - buf);
+}
+
+/* parses the range literal at *p, e.g. [1,5) or empty */
+static PyObject *_pg_range_from_text(pgcolumn *subtype, const char **p,
+                                     char *buf)
+{
+    PyObject *lower, *upper, *ret;
+    char bounds[3];
+
+    if (!strncasecmp(*p, "empty", 5)) {
+        *p += 5;
+        return _pg_range_build(NULL, NULL, "empty");
+    }
+    if (**p != '[' && **p != '(')
+        return _pg_bad_range();
+    bounds[0] = *(*p)++;
+    if ((lower = _pg_range_bound(subtype, p, buf, ",")) == NULL)
+        return NULL;
+    (*p)++;
+    if ((upper = _pg_range_bound(subtype, p, buf, ")]")) == NULL) {
+        Py_DECREF(lower);
+        return NULL;
+    }
+    bounds[1] = *(*p)++;
+    bounds[2] = '\0';
+    ret = _pg_range_build(lower, upper, bounds);
+    Py_DECREF(lower);
+    Py_DECREF(upper);
+    return ret;
+}
+
+static PyObject *_pg_decode_range(pgcolumn *column, char *cell, int len)
+{
+    const char *p = cell;
+    PyObject *ret;
+    char *buf;
+
+    if ((buf = malloc(len + 1)) == NULL)
+        return PyErr_NoMemory();
+    ret = _pg_range_from_text(column->element, &p, buf);
+    free(buf);
+    if (ret != NULL && *p) {
+        Py_DECREF(ret);
+        return _pg_bad_range();
+    }
+    return ret;
+}
+
+/* the length of the range literal at p, or 0 if there is none */
+static int _pg_range_length(const char *p)
+{
+    const char *s = p;
+    int inquotes = 0;
+
+    if (!strncasecmp(p, "empty", 5))
+        return 5;
+    if (*s != '[' && *s != '(')
+        return 0;
+    for (s++; *s; s++) {
+        if (*s == '\\' && s[1])
+            s++;
+        else if (*s == '"')
+            inquotes = !inquotes;
+        else if (!inquotes && (*s == ']' || *s == ')'))
+            return s - p + 1;
+    }
+    return 0;
+}
+
+/* a multirange literal is its ranges in braces, separated by commas;
+   each is decoded as a value of the range type, which may have a
+   typecast */
+static PyObject *_pg_decode_multirange(pgcolumn *column, char *cell, int len)
+{
+    const char *p = cell;
+    PyObject *ranges, *range, *tuple, *ret;
+    char *buf;
+    int n;
+
+    if (*p++ != '{')
+        return _pg_bad_range();
+    if ((ranges = PyList_New(0)) == NULL)
+        return NULL;
+    if ((buf = malloc(len + 1)) == NULL) {
+        Py_DECREF(ranges);
+        return PyErr_NoMemory();
+    }
+    while (*p && *p != '}') {
+        while (isspace((unsigned char)*p) || *p == ',')
+            p++;
+        if ((n = _pg_range_length(p)) == 0) {
+            Py_DECREF(ranges);
+            free(buf);
+            return _pg_bad_range();
+        }
+        memcpy(buf, p, n);
+        buf[n] = '\0';
+        p += n;
+        range = _pg_decode_value(column->element, buf, n);
+        if (range == NULL || PyList_Append(ranges, range) < 0) {
+            Py_XDECREF(range);
+            Py_DECREF(ranges);
+            free(buf);
+            return NULL;
+        }
+        Py_DECREF(range);
+        while (isspace((unsigned char)*p))
+            p++;
+    }
+    free(buf);
+    if (*p != '}' || p[1]) {
+        Py_DECREF(ranges);
+        return _pg_bad_range();
+    }
+    tuple = PyList_AsTuple(ranges);
+    Py_DECREF(ranges);
+    if (tuple == NULL)
+        return NULL;
+    ret = _pg_range_new(&MultirangeType, "Multirange", tuple);
+    Py_DECREF(tuple);
+    return ret;
+}
+
+/* binary range flags */
+#define PG_RANGE_EMPTY                0x01
+#define PG_RANGE_LB_INC                0x02
+#define PG_RANGE_UB_INC                0x04
+#define PG_RANGE_LB_INF                0x08
+#define PG_RANGE_UB_INF                0x10
+
+/* reads a length-prefixed binary range bound */
+static PyObject *_pg_range_bound_bin(pgcolumn *subtype, char **p, char *end)
+{
+    int32 len;
+    PyObject *ret;
+
+    if (end - *p < 4)
+        return _pg_bad_range();
+    len = _pg_get_int32(*p);
+    if (len < 0 || end - *p - 4 < len)
+        return _pg_bad_range();
+    ret = _pg_decode_value(subtype, *p + 4, len);
+    *p += 4 + len;
+    return ret;
+}
+
+/* a binary range is a flags byte, followed by those bounds which are
+   not infinite */
+static PyObject *_pg_decode_range_bin(pgcolumn *column, char *cell, int len)
+{
+    char *p = cell + 1, *end = cell + len;
+    PyObject *lower = NULL, *upper = NULL, *ret;
+    char bounds[3];
+    int flags;
+
+    if (len < 1)
+        return _pg_bad_range();
+    flags = *cell;
+    if (flags & PG_RANGE_EMPTY)
+        return _pg_range_build(NULL, NULL, "empty");
+    if (!(flags & PG_RANGE_LB_INF) &&
+        (lower = _pg_range_bound_bin(column->element, &p, end)) == NULL)
+        return NULL;
+    if (!(flags & PG_RANGE_UB_INF) &&
+        (upper = _pg_range_bound_bin(column->element, &p, end)) == NULL) {
+        Py_XDECREF(lower);
+        return NULL;
+    }
+    bounds[0] = flags & PG_RANGE_LB_INC ? '[' : '(';
+    bounds[1] = flags & PG_RANGE_UB_INC ? ']' : ')';
+    bounds[2] = '\0';
+    ret = _pg_range_build(lower, upper, bounds);
+    Py_XDECREF(lower);
+    Py_XDECREF(upper);
+    return ret;
+}
+
+/* a binary multirange is the number of its ranges, followed by each,
+   prefixed by its length */
+static PyObject *_pg_decode_multirange_bin(pgcolumn *column, char *cell,
+                                           int len)
+{
+    char *p = cell + 4, *end = cell + len;
+    PyObject *ranges, *range, *ret;
+    int32 n, i, rlen;
+
+    if (len < 4 || (n = _pg_get_int32(cell)) < 0)
+        return _pg_bad_range();
+    if ((ranges = PyTuple_New(n)) == NULL)
+        return NULL;
+    for (i = 0; i < n; i++) {
+        if (end - p < 4 || (rlen = _pg_get_int32(p)) < 0 ||
+            end - p - 4 < rlen) {
+            Py_DECREF(ranges);
+            return _pg_bad_range();
+        }
+        range = _pg_decode_value(column->element, p + 4, rlen);
+        if (range == NULL) {
+            Py_DECREF(ranges);
+            return NULL;
+        }
+        PyTuple_SET_ITEM(ranges, i, range);
+        p += 4 + rlen;
+    }
+    ret = _pg_range_new(&MultirangeType, "Multirange", ranges);
+    Py_DECREF(ranges);
+    return ret;
+}
+
+/* sets up the decoding of the values of ranges, or multiranges, of
+   which the element is the range or subtype */
+static int _pg_range_init(pgsourceobject *self, pgcolumn *column,
+                          Oid element, int format, pgdecoder decode)
+{
+    if ((column->element = calloc(1, sizeof(pgcolumn))) == NULL) {
+        PyErr_NoMemory();
+        return 0;
+    }
+    column->decode = decode;
+    return _pg_column_init(self, column->element, element, format, -1);
+}
+
+/* sets up the decoding of the values of a type; col is the index of a
+   result column, or -1 for array elements and record fields */
+static int _pg_column_init(pgsourceobject *self, pgcolumn *column,
+                           Oid type, int format, int col)
+{
+    pgbuiltincast *builtin;
+    PyObject *cast;
+    Oid element, alias;
+
+    column->type = type;
+    column->decode = _pg_type_decoder(type, format);
+    column->numeric = _pg_decode_decimal;
+    if (column->decode == _pg_decode_cash_bin) {
+        PyObject *info = _pg_type_details(self->pgcnx, CASHOID,
+                                          _pg_load_cash);
+        if (info == NULL)
+            return 0;
+        column->scale = PyInt_AS_LONG(info);
+    }
+    if ((column->typecode = _pgsource_typecode(type)) == NULL)
+        return 0;
+    if (col < 0)
+        cast = _pg_type_cast(self, type, column->typecode);
+    else
+        cast = _pg_column_cast(self, col, column->typecode);
+    if (cast == NULL)
+        return 0;
+
+    if (cast == Py_None) {
+        Py_DECREF(cast);
+
+        /* arrays without a typecast are decoded to lists */
+        element = _pg_array_element(self->pgcnx, type, column->decode,
+                                    &column->delim);
+        if (element == InvalidOid && PyErr_Occurred())
+            return 0;
+        if (element != InvalidOid) {
+            if ((column->element = calloc(1, sizeof(pgcolumn))) == NULL) {
+                PyErr_NoMemory();
+                return 0;
+            }
+            column->decode = format ? _pg_decode_array_bin : _pg_decode_array;
+            return _pg_column_init(self, column->element, element, format, -1);
+        }
+        if (column->decode != _pg_decode_unknown)
+            return 1;
+
+        /* ranges, and multiranges of them */
+        element = _pg_range_lookup(self->pgcnx, type, pg_range_types, 'r',
+                                   _pg_load_range);
+        if (element == InvalidOid && PyErr_Occurred())
+            return 0;
+        if (element != InvalidOid)
+            return _pg_range_init(self, column, element, format, format ?
+                                  _pg_decode_range_bin : _pg_decode_range);
+        element = _pg_range_lookup(self->pgcnx, type, pg_multirange_types,
+                                   'm', _pg_load_multirange);
+        if (element == InvalidOid && PyErr_Occurred())
+            return 0;
+        if (element != InvalidOid)
+            return _pg_range_init(self, column, element, format, format ?
+                                  _pg_decode_multirange_bin :
+                                  _pg_decode_multirange);
+
+        /* composite types and anonymous records are decoded to tuples */
+        if (type == RECORDOID || _pg_type_kind(self->pgcnx, type) == 'c')
+            return _pg_record_init(self, column, type, format);
+        if (PyErr_Occurred())
+            return 0;
+
+        /* domains and enums are decoded as their base type and text */
+        if ((alias = _pg_type_alias(self->pgcnx, type)) != InvalidOid) {
+            Py_CLEAR(column->typecode);
+            return _pg_column_init(self, column, alias, format, -1);
+        }
+        if (PyErr_Occurred())
+            return 0;
+        return _pg_unknown_type(type);
+    }
+    column->cast = cast;
+
+    /* typecasts of domains and enums are given their decoded value */
+    if (column->decode == _pg_decode_unknown &&
+        (alias = _pg_type_alias(self->pgcnx, type)) != InvalidOid)
+        column->decode = _pg_type_decoder(alias, format);
+    if (PyErr_Occurred())
+        return 0;
+
+    if (!PyCFunction_Check(cast))
+        return 1;
+    for (builtin = pg_builtin_casts; builtin->typecast; builtin++) {
+        if (PyCFunction_GET_FUNCTION(cast) == builtin->typecast)
+            break;
+    }
+    if (builtin->typecast == NULL)
+        return 1;
+    if (builtin->typecast == pg_typecast_numeric_scaled)
+        column->scale = PyInt_AS_LONG(PyCFunction_GET_SELF(cast));
+    if (builtin->typecast == (PyCFunction) pg_typecast_string) {
+        pgobject *pgcnx = (pgobject *) PyCFunction_GET_SELF(cast);
+        if (!pgcnx->utf8) {
+            Py_XINCREF(pgcnx->encoding);
+            column->encoding = pgcnx->encoding;
+        }
+    }
+
+    if (builtin->typecast == pg_typecast_json) {
+        Py_INCREF(PyCFunction_GET_SELF(cast));
+        column->loads = PyCFunction_GET_SELF(cast);
+        if (column->decode == _pg_decode_jsonb_bin)
+            column->decode = _pg_decode_jsonb_json;
+    }
+
+    if (column->decode == _pg_decode_string)
+        column->decode = builtin->decode;
+    else if (column->decode == _pg_decode_numeric_bin)
+        column->numeric = builtin->decode;
+    else if (!builtin->passthrough)
+        return 1;
+    column->cast = NULL;
+    Py_DECREF(cast);
+
+    /* zero-copy values keep the result; those of streamed results,
+       which are replaced row by row, are copied */
+    if (column->decode == _pg_decode_buffer && !self->streaming) {
+        if ((column->result = _pg_source_result(self)) == NULL)
+            return 0;
+        Py_INCREF(column->result);
+    }
+    return 1;
+}
+
+/* sets up the interning of the values of a column, if it is one of the
+   columns to intern of the source, and decoded to strings */
+static int _pg_column_intern(pgsourceobject *self, pgcolumn *column,
+                             int col)
+{
+    PyObject *key;
+    int found;
+
+    if (self->intern == NULL || column->cast != NULL ||
+        (column->decode != _pg_decode_unicode &&
+         column->decode != _pg_decode_string))
+        return 1;
+    if (self->intern != Py_True) {
+        if ((key = PyInt_FromLong(col)) == NULL)
+            return 0;
+        found = PySequence_Contains(self->intern, key);
+        Py_DECREF(key);
+        if (found == 0) {
+            key = PyString_FromString(PQfname(self->last_result, col));
+            if (key == NULL)
+                return 0;
+            found = PySequence_Contains(self->intern, key);
+            Py_DECREF(key);
+        }
+        if (found <= 0)
+            return found == 0;
+    }
+    if ((column->interns = calloc(1, sizeof(pginterns))) == NULL) {
+        PyErr_NoMemory();
+        return 0;
+    }
+    return 1;
+}
+
+/* compiles a decoding plan of the last result */
+static pgcolumn *_pg_source_plan(pgsourceobject *self)
+{
+    pgcolumn *columns;
+    int col;
+
+    if ((columns = calloc(self->num_fields + 1, sizeof(pgcolumn))) == NULL) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+    for (col = 0; col < self->num_fields; col++) {
+        /* a streamed result is planned from its description, which
+           has no formats */
+        if (!_pg_column_init(self, columns + col,
+                             PQftype(self->last_result, col),
+                             self->streaming ? self->binary :
+                             PQfformat(self->last_result, col), col) ||
+            !_pg_column_intern(self, columns + col, col)) {
+            _pg_columns_free(columns, self->num_fields);
+            return NULL;
+        }
+    }
+    return columns;
+}
+
+/* the decoding plan of the last result, set up on first use */
+static pgcolumn *_pg_source_columns(pgsourceobject *self)
+{
+    if (self->columns == NULL)
+        self->columns = _pg_source_plan(self);
+    return self->columns;
+}
+
+/* FETCHING DATA from a PGresult */
+static PyObject *_pg_result_cell(PGresult *result, pgcolumn *columns,
+                                 int row, int col)
+{
+    if (PQgetisnull(result, row, col)) {
+        Py_INCREF(Py_None);
+        return Py_None;
+    }
+    return _pg_decode_value(columns + col, PQgetvalue(result, row, col),
+                            PQgetlength(result, row, col));
+}
+
+static PyObject *
+_pg_fetch_cell(pgsourceobject *self, int row, int col)
+{
+    return _pg_result_cell(self->last_result, self->columns, row, col);
+}
+
+/* one row of a result as a tuple */
+static PyObject *_pg_result_tuple(PGresult *result, pgcolumn *columns,
+                                  int num_fields, int row)
+{
+    PyObject        *rowtuple;
+    int                col;
+
+    /* allocate list for result */
+    if ((rowtuple = PyTuple_New(num_fields)) == NULL)
+        return NULL;
+    for (col = 0; col < num_fields; col++) {
+        PyObject *cell;
+        cell = _pg_result_cell(result, columns, row, col);
+        if (cell == NULL) {
+            Py_DECREF(rowtuple);
+            return NULL;
+        }
+        PyTuple_SET_ITEM(rowtuple, col, cell);
+    }
+    return rowtuple;
+}
+
+/* ROW RECORDS */
+
+/* Records are rows which also have their fields as attributes, and by
+   name as keys; the field names of a result are shared by its records,
+   as a (names, indexes) tuple, so records cost about what tuples do. */
+
+typedef struct
+{
+    PyObject_VAR_HEAD
+    PyObject        *fields;        /* (names, indexes) of the result */
+    PyObject        *items[1];        /* values of the fields */
+}        pgrecordobject;
+
+/* the field names of the last result, made once per result */
+static PyObject *_pg_source_names(pgsourceobject *self)
+{
+    PyObject *names, *indexes, *name, *index;
+    int col;
+
+    if (self->names)
+        return self->names;
+    names = PyTuple_New(self->num_fields);
+    indexes = PyDict_New();
+    if (names == NULL || indexes == NULL)
+        goto error;
+    for (col = 0; col < self->num_fields; col++) {
+        name = PyString_InternFromString(PQfname(self->last_result, col));
+        if (name == NULL)
+            goto error;
+        PyTuple_SET_ITEM(names, col, name);
+        /* the first of the fields of a name is the one it looks up */
+        if (PyDict_GetItem(indexes, name) != NULL)
+            continue;
+        if ((index = PyInt_FromLong(col)) == NULL ||
+            PyDict_SetItem(indexes, name, index) < 0) {
+            Py_XDECREF(index);
+            goto error;
+        }
+        Py_DECREF(index);
+    }
+    self->names = PyTuple_Pack(2, names, indexes);
+
+error:
+    Py_XDECREF(names);
+    Py_XDECREF(indexes);
+    return self->names;
+}
+
+/* one row of a result as a record */
+static PyObject *_pg_result_record(PGresult *result, pgcolumn *columns,
+                                   int num_fields, PyObject *fields, int row)
+{
+    pgrecordobject        *record;
+    int                col;
+
+    if ((record = PyObject_NewVar(pgrecordobject, &PgRecordType,
+                                  num_fields)) == NULL)
+        return NULL;
+    Py_INCREF(fields);
+    record->fields = fields;
+    for (col = 0; col < num_fields; col++)
+        record->items[col] = NULL;
+    for (col = 0; col < num_fields; col++) {
+        if ((record->items[col] = _pg_result_cell(result, columns,
+                                                  row, col)) == NULL) {
+            Py_DECREF(record);
+            return NULL;
+        }
+    }
+    return (PyObject *) record;
+}
+
+static void
+pgrecord_dealloc(pgrecordobject * self)
+{
+    Py_ssize_t i;
+
+    for (i = 0; i < Py_SIZE(self); i++)
+        Py_XDECREF(self->items[i]);
+    Py_XDECREF(self->fields);
+    PyObject_Del(self);
+}
+
+/* the values of a record as a tuple */
+static PyObject *_pg_record_tuple(pgrecordobject *self, Py_ssize_t start,
+                                  Py_ssize_t stop)
+{
+    PyObject *tuple;
+    Py_ssize_t i;
+
+    if ((tuple = PyTuple_New(stop - start)) == NULL)
+        return NULL;
+    for (i = start; i < stop; i++) {
+        Py_INCREF(self->items[i]);
+        PyTuple_SET_ITEM(tuple, i - start, self->items[i]);
+    }
+    return tuple;
+}
+
+static Py_ssize_t
+pgrecord_length(pgrecordobject * self)
+{
+    return Py_SIZE(self);
+}
+
+static PyObject *
+pgrecord_item(pgrecordobject * self, Py_ssize_t i)
+{
+    if (i < 0 || i >= Py_SIZE(self)) {
+        PyErr_SetString(PyExc_IndexError, "record index out of range");
+        return NULL;
+    }
+    Py_INCREF(self->items[i]);
+    return self->items[i];
+}
+
+static PyObject *
+pgrecord_slice(pgrecordobject * self, Py_ssize_t start, Py_ssize_t stop)
+{
+    if (start < 0)
+        start = 0;
+    if (stop > Py_SIZE(self))
+        stop = Py_SIZE(self);
+    if (stop < start)
+        stop = start;
+    return _pg_record_tuple(self, start, stop);
+}
+
+/* gets a field by index or name, or a tuple of a slice of them */
+static PyObject *
+pgrecord_subscript(pgrecordobject * self, PyObject * key)
+{
+    Py_ssize_t i;
+
+    if (PyString_Check(key)) {
+        PyObject *index = PyDict_GetItem(PyTuple_GET_ITEM(self->fields, 1),
+                                         key);
+        if (index == NULL) {
+            PyErr_SetObject(PyExc_KeyError, key);
+            return NULL;
+        }
+        return pgrecord_item(self, PyInt_AS_LONG(index));
+    }
+    if (PySlice_Check(key)) {
+        Py_ssize_t start, stop, step, length, j;
+        PyObject *tuple;
+
+        if (PySlice_GetIndicesEx((PySliceObject *) key, Py_SIZE(self),
+                                 &start, &stop, &step, &length) < 0)
+            return NULL;
+        if (step == 1)
+            return _pg_record_tuple(self, start, stop);
+        if ((tuple = PyTuple_New(length)) == NULL)
+            return NULL;
+        for (j = 0; j < length; j++, start += step) {
+            Py_INCREF(self->items[start]);
+            PyTuple_SET_ITEM(tuple, j, self->items[start]);
+        }
+        return tuple;
+    }
+    i = PyNumber_AsSsize_t(key, PyExc_IndexError);
+    if (i == -1 && PyErr_Occurred())
+        return NULL;
+    if (i < 0)
+        i += Py_SIZE(self);
+    return pgrecord_item(self, i);
+}
+
+/* gets a field by name, before any other attribute */
+static PyObject *
+pgrecord_getattro(pgrecordobject * self, PyObject * name)
+{
+    PyObject *index;
+
+    if (PyString_Check(name) &&
+        (index = PyDict_GetItem(PyTuple_GET_ITEM(self->fields, 1),
+                                name)) != NULL)
+        return pgrecord_item(self, PyInt_AS_LONG(index));
+    return PyObject_GenericGetAttr((PyObject *) self, name);
+}
+
+/* records compare and hash as tuples of their values */
+static PyObject *
+pgrecord_richcompare(PyObject * self, PyObject * other, int op)
+{
+    PyObject *a, *b = NULL, *ret = NULL;
+
+    if ((a = _pg_record_tuple((pgrecordobject *) self, 0,
+                              Py_SIZE(self))) == NULL)
+        return NULL;
+    if (Py_TYPE(other) == &PgRecordType)
+        b = _pg_record_tuple((pgrecordobject *) other, 0, Py_SIZE(other));
+    else {
+        Py_INCREF(other);
+        b = other;
+    }
+    if (b != NULL)
+        ret = PyObject_RichCompare(a, b, op);
+    Py_DECREF(a);
+    Py_XDECREF(b);
+    return ret;
+}
+
+static long
+pgrecord_hash(pgrecordobject * self)
+{
+    PyObject *tuple;
+    long hash;
+
+    if ((tuple = _pg_record_tuple(self, 0, Py_SIZE(self))) == NULL)
+        return -1;
+    hash = PyObject_Hash(tuple);
+    Py_DECREF(tuple);
+    return hash;
+}
+
+/* Record(name=value, ...) */
+static PyObject *
+pgrecord_repr(pgrecordobject * self)
+{
+    PyObject *ret, *item;
+    Py_ssize_t i;
+
+    if ((ret = PyString_FromString("Record(")) == NULL)
+        return NULL;
+    for (i = 0; i < Py_SIZE(self) && ret; i++) {
+        if (i)
+            PyString_ConcatAndDel(&ret, PyString_FromString(", "));
+        PyString_Concat(&ret, PyTuple_GET_ITEM(
+                            PyTuple_GET_ITEM(self->fields, 0), i));
+        PyString_ConcatAndDel(&ret, PyString_FromString("="));
+        if ((item = PyObject_Repr(self->items[i])) == NULL) {
+            Py_XDECREF(ret);
+            return NULL;
+        }
+        PyString_ConcatAndDel(&ret, item);
+    }
+    PyString_ConcatAndDel(&ret, PyString_FromString(")"));
+    return ret;
+}
+
+static char pgrecord_asdict__doc__[] =
+"_asdict() -- return the fields of the record as a dict.";
+static PyObject *
+pgrecord_asdict(pgrecordobject * self, PyObject * args)
+{
+    PyObject *dict, *names = PyTuple_GET_ITEM(self->fields, 0);
+    Py_ssize_t i;
+
+    if ((dict = PyDict_New()) == NULL)
+        return NULL;
+    for (i = 0; i < Py_SIZE(self); i++) {
+        if (PyDict_SetItem(dict, PyTuple_GET_ITEM(names, i),
+                           self->items[i]) < 0) {
+            Py_DECREF(dict);
+            return NULL;
+        }
+    }
+    return dict;
+}
+
+static PyObject *
+pgrecord_get_fields(pgrecordobject * self, void *closure)
+{
+    PyObject *names = PyTuple_GET_ITEM(self->fields, 0);
+    Py_INCREF(names);
+    return names;
+}
+
+static PyMethodDef pgrecord_methods[] = {
+        {"_asdict", (PyCFunction) pgrecord_asdict, METH_NOARGS,
+                        pgrecord_asdict__doc__},
+        {NULL, NULL}
+};
+
+static PyGetSetDef pgrecord_getset[] = {
+        {"_fields", (getter) pgrecord_get_fields, NULL,
+                        "the names of the fields"},
+        {NULL}
+};
+
+static PySequenceMethods pgrecord_as_sequence = {
+        (lenfunc) pgrecord_length,        /* sq_length */
+        0,                                /* sq_concat */
+        0,                                /* sq_repeat */
+        (ssizeargfunc) pgrecord_item,        /* sq_item */
+        (ssizessizeargfunc) pgrecord_slice, /* sq_slice */
+};
+
+static PyMappingMethods pgrecord_as_mapping = {
+        (lenfunc) pgrecord_length,        /* mp_length */
+        (binaryfunc) pgrecord_subscript, /* mp_subscript */
+        0,                                /* mp_ass_subscript */
+};
+
+static char pgrecord__doc__[] =
+"A row of a result, which is a sequence of its values like a tuple, "
+"and has them as attributes, and by name as keys, too.";
+
+staticforward PyTypeObject PgRecordType = {
+        PyObject_HEAD_INIT(NULL)
+
+        0,                                /* ob_size */
+        "pgsql.Record",                        /* tp_name */
+        sizeof(pgrecordobject) - sizeof(PyObject *), /* tp_basicsize */
+        sizeof(PyObject *),                /* tp_itemsize */
+        /* methods */
+        (destructor) pgrecord_dealloc,        /* tp_dealloc */
+        0,                                /* tp_print */
+        0,                                /* tp_getattr */
+        0,                                /* tp_setattr */
+        0,                                /* tp_compare */
+        (reprfunc) pgrecord_repr,        /* tp_repr */
+        0,                                /* tp_as_number */
+        &pgrecord_as_sequence,                /* tp_as_sequence */
+        &pgrecord_as_mapping,                /* tp_as_mapping */
+        (hashfunc) pgrecord_hash,        /* tp_hash */
+        0,                                /* tp_call */
+        0,                                /* tp_str */
+        (getattrofunc) pgrecord_getattro, /* tp_getattro */
+        0,                                /* tp_setattro */
+        0,                                /* tp_as_buffer */
+        Py_TPFLAGS_DEFAULT,                /* tp_flags */
+        pgrecord__doc__,                /* tp_doc */
+        0,                                /* tp_traverse */
+        0,                                /* tp_clear */
+        pgrecord_richcompare,                /* tp_richcompare */
+        0,                                /* tp_weaklistoffset */
+        0,                                /* tp_iter */
+        0,                                /* tp_iternext */
+        pgrecord_methods,                /* tp_methods */
+        0,                                /* tp_members */
+        pgrecord_getset,                /* tp_getset */
+};
+
+/* one row of a result, made by a row factory: None for tuples, Record
+   for records with the given field names, or a callable of the tuple */
+static PyObject *_pg_make_row(PGresult *result, pgcolumn *columns,
+                              int num_fields, PyObject *rowfactory,
+                              PyObject *names, int row)
+{
+    PyObject *rowtuple, *ret;
+
+    if (rowfactory == (PyObject *) &PgRecordType)
+        return _pg_result_record(result, columns, num_fields, names, row);
+    rowtuple = _pg_result_tuple(result, columns, num_fields, row);
+    if (rowtuple == NULL || rowfactory == NULL)
+        return rowtuple;
+    ret = PyObject_CallFunctionObjArgs(rowfactory, rowtuple, NULL);
+    Py_DECREF(rowtuple);
+    return ret;
+}
+
+/* one row of the last result, made by the row factory of the source */
+static PyObject *_pg_result_row(pgsourceobject *self, int row)
+{
+    if (_pg_source_columns(self) == NULL)
+        return NULL;
+    if (self->rowfactory == (PyObject *) &PgRecordType &&
+        _pg_source_names(self) == NULL)
+        return NULL;
+    return _pg_make_row(self->last_result, self->columns, self->num_fields,
+                        self->rowfactory, self->names, row);
+}
+
+/* internal function for getting one result row as a python dict */
+static PyObject *_pg_result_rowdict(pgsourceobject *self, int row)
+{
+    PyObject        *rowdict;
+    int                col;
+
+    if (_pg_source_columns(self) == NULL || _pg_source_names(self) == NULL)
+        return NULL;
+    /* allocate list for result */
+    if ((rowdict = PyDict_New()) == NULL)
+        return NULL;
+    for (col = 0; col < self->num_fields; col++) {
+        PyObject *cell;
+        cell = _pg_fetch_cell(self, row, col);
+        if (cell == NULL ||
+            PyDict_SetItem(rowdict, PyTuple_GET_ITEM(
+                               PyTuple_GET_ITEM(self->names, 0), col),
+                           cell) < 0) {
+            Py_XDECREF(cell);
+            Py_DECREF(rowdict);
+            return NULL;
+        }
+        Py_DECREF(cell);
+    }
+    return rowdict;
+}
+
+/* fetches next row from last result as a tuple*/
+static char pgsource_fetchone__doc__[] =
+"fetchone() -- return the row from the last result as a tuple. ";
+static PyObject *
+pgsource_fetchone(pgsourceobject * self, PyObject * args)
+{
+    PyObject        *rowtuple;
+
+    if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL))
+        return NULL;
+    if (!check_no_args(args, "fetchone"))
+        return NULL;
+    if (!_pg_stream_next(self))
+        return NULL;
+
+    if (self->current_row >= self->max_row) {
+        Py_INCREF(Py_None);
+        return Py_None;
+    }
+    if ((rowtuple = _pg_result_row(self, self->current_row)) == NULL)
+        return NULL;
+    self->current_row++;
+    return rowtuple;
+}
+
+/* fetches next row from last result as a dict*/
+static char pgsource_fetchonedict__doc__[] =
+"fetchonedict() -- return the row from the last result as a dict.";
+static PyObject *
+pgsource_fetchonedict(pgsourceobject * self, PyObject * args)
+{
+    PyObject        *rowdict;
+
+    if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL))
+        return NULL;
+    if (!check_no_args(args, "fetchonedict"))
+        return NULL;
+    if (!_pg_stream_next(self))
+        return NULL;
+
+    if (self->current_row >= self->max_row) {
+        Py_INCREF(Py_None);
+        return Py_None;
+    }
+
+    if ((rowdict = _pg_result_rowdict(self, self->current_row)) == NULL)
+        return NULL;
+    self->current_row++;
+    return rowdict;
+}
+
+/* retrieves all remaining results as a list of tuples */
+static char pgsource_fetchall__doc__[] =
+"fetchall() -- Gets the result of a query.  The result is returned "
+"as a list of rows, each one a list of fields in the order returned "
+"by the server.";
+static PyObject *
+pgsource_fetchall(pgsourceobject * self, PyObject * args)
+{
+    int        row;
+    PyObject *reslist;
+
+    if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL))
+        return NULL;
+    if (!check_no_args(args, "fetchall"))
+        return NULL;
+    if (self->streaming)
+        return _pg_stream_rows(self, -1);
+
+    if (self->current_row >= self->max_row) {
+        return PyList_New(0);
+    }
+
+    /* stores result in presized list for efficiency */
+    reslist = PyList_New(self->max_row - self->current_row);
+
+    /* return the remaining rows that have not been "extracted" yet */
+    for (row = self->current_row; row < self->max_row; row++) {
+        PyObject *rowtuple;
+        if ((rowtuple = _pg_result_row(self, row)) == NULL) {
+            Py_DECREF(reslist);
             return NULL;
         }
+        PyList_SET_ITEM(reslist, row - self->current_row, rowtuple);
+    }
+    /* mark all rows returned */
+    self->current_row = self->max_row + 1;
+    /* returns list */
+    return reslist;
+}
 
-        binds = _pgsource_getparams(tuple);
-        /* now run the query */
-        if (self->prepared) {
-            if (self->name && PyString_Check(self->name))
-                query = PyString_AsString(self->name);
-            else
-                query = "";
-        } else {
-            query = "";
-        }
-        /* free previous result */
-        _pg_source_clear(self);
+/* retrieves the next rows of the last result as a list of tuples */
+static char pgsource_fetchmany__doc__[] =
+"fetchmany([size]) -- return the next size rows of the last result, "
+"arraysize rows by default, as a list.";
+static PyObject *
+pgsource_fetchmany(pgsourceobject * self, PyObject * args)
+{
+    long        size;
+    int                row, end;
+    PyObject *reslist;
 
-        Py_BEGIN_ALLOW_THREADS ;
-        self->last_result = PQexecPrepared(self->pgcnx->cnx,
-                                           query,
-                                           binds->nParams,
-                                           (const char **)binds->paramValues,
-                                           binds->paramLengths,
-                                           binds->paramFormats,
-                                           0);
-        Py_END_ALLOW_THREADS ;
+    if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL))
+        return NULL;
+    size = self->arraysize;
+    if (!PyArg_ParseTuple(args, "|l:fetchmany", &size))
+        return NULL;
+    if (self->streaming)
+        return _pg_stream_rows(self, size > 0 ? size : 0);
 
-        /* clean up */
-        _pgsource_freeparams(binds);
-        Py_DECREF(item);
-        Py_DECREF(tuple);
+    if (self->current_row >= self->max_row || size <= 0)
+        return PyList_New(0);
+    if (size < self->max_row - self->current_row)
+        end = self->current_row + size;
+    else
+        end = self->max_row;
 
-        if (!_pg_result_check(self->pgcnx->cnx, self->last_result)) {
-            self->last_result = NULL;
-            Py_DECREF(iterator);
-            if (prep)
-                PQclear(prep);
+    if ((reslist = PyList_New(end - self->current_row)) == NULL)
+        return NULL;
+    for (row = self->current_row; row < end; row++) {
+        PyObject *rowtuple;
+        if ((rowtuple = _pg_result_row(self, row)) == NULL) {
+            Py_DECREF(reslist);
             return NULL;
         }
+        PyList_SET_ITEM(reslist, row - self->current_row, rowtuple);
     }
-    Py_DECREF(iterator);
-    if (prep)
-        PQclear(prep);
-    result = _pgsource_postexec(self);
-    self->max_row = -1;
-    return result;
+    self->current_row = end;
+    return reslist;
 }
 
-/* FETCHING DATA from a PGresult */
+/* moves the position of the next row fetched in the last result */
+static char pgsource_scroll__doc__[] =
+"scroll(value[, mode]) -- move the position of the next row fetched by "
+"value rows, or to row value with mode 'absolute'.  Raises IndexError, "
+"leaving the position as it is, if there is no such row.";
 static PyObject *
-_pg_fetch_cell(PGresult *result, int row, int col)
+pgsource_scroll(pgsourceobject * self, PyObject * args)
 {
-    PyObject        *ret;
-    char        *cell;
-    Oid                oidtype;
-    unsigned int cellsize = 0;
+    long        value, row;
+    char        *mode = "relative";
 
-    if (PQgetisnull(result, row, col)) {
+    if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL | CHECK_ROWS))
+        return NULL;
+    if (!PyArg_ParseTuple(args, "l|s:scroll", &value, &mode))
+        return NULL;
+
+    if (!strcmp(mode, "relative"))
+        /* past the end after fetchall() */
+        row = (self->current_row < self->max_row ?
+               self->current_row : self->max_row) + value;
+    else if (!strcmp(mode, "absolute"))
+        row = value;
+    else {
+        PyErr_Format(ProgrammingError, "unknown scroll mode '%s'.", mode);
+        return NULL;
+    }
+    if (row < 0 || row >= self->max_row) {
+        PyErr_SetString(PyExc_IndexError, "scroll out of the result.");
+        return NULL;
+    }
+    self->current_row = row;
+
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+/* the iterator of the source fetches its rows one at a time */
+static PyObject *
+pgsource_iternext(pgsourceobject * self)
+{
+    PyObject        *rowtuple;
+
+    if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL) ||
+        !_pg_stream_next(self))
+        return NULL;
+    if (self->current_row >= self->max_row)
+        return NULL;
+    if ((rowtuple = _pg_result_row(self, self->current_row)) == NULL)
+        return NULL;
+    self->current_row++;
+    return rowtuple;
+}
+
+/* retrieves all remaining results as a list of dictionaries*/
+static char pgsource_fetchalldict__doc__[] =
+"fetchalldict() -- Gets the result of a query.  The result is returned "
+"as a list of dictionaries with the field names used as the keys.";
+static PyObject *
+pgsource_fetchalldict(pgsourceobject * self, PyObject * args)
+{
+    int        row;
+    PyObject *reslist;
+
+    if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL | CHECK_ROWS))
+        return NULL;
+    if (!check_no_args(args, "fetchall"))
+        return NULL;
+
+    /* need to return an empty list ? */
+    if (self->current_row > self->max_row) {
+        /* already returned the empty list, another fetchall call is invalid... */
         Py_INCREF(Py_None);
         return Py_None;
+    } else if (self->current_row == self->max_row) {
+        self->current_row++;
+        return PyList_New(0);
     }
 
-    cell = PQgetvalue(result, row, col);
-    cellsize = PQgetlength(result, row, col);
-    switch ((oidtype = PQftype(result, col))) {
-        case BOOLOID:
-            if (*cell == 't' || *cell == 'T') {
-                ret = Py_True;
-                Py_INCREF(Py_True);
-            } else {
-                ret = Py_False;
-                Py_INCREF(Py_False);
-            }
-            break;
-        case INT2OID:
-        case INT4OID:
-            ret = PyInt_FromString(cell, NULL, 10);
-            break;
-        case INT8OID:
-        case OIDOID:
-        case XIDOID:
+    /* stores result in presized list for efficiency */
+    reslist = PyList_New(self->max_row - self->current_row);
+
+    /* return the remaining rows that have not been "extracted" yet */
+    for (row = self->current_row; row < self->max_row; row++) {
+        PyObject *rowdict;
+        if ((rowdict = _pg_result_rowdict(self, row)) == NULL) {
+            Py_DECREF(reslist);
+            return NULL;
+        }
+        PyList_SET_ITEM(reslist, row - self->current_row, rowdict);
+    }
+    /* mark all rows returned */
+    self->current_row = self->max_row + 1;
+    /* returns list */
+    return reslist;
+}
+
+/* COLUMNAR FETCHING */
+
+/* Columns of bool, integer, float and timestamp values are fetched into
+   arrays of fixed-size items, as array.array typecodes: B, h, i, I, l, f
+   and d, timestamps as d in seconds since the Unix epoch.  For fetchinto
+   int8 is q, and timestamps are M, microseconds since the Unix epoch as
+   an int64 (numpy's datetime64[us]), where infinities are its NaT.  All
+   other columns are fetched into lists of their values. */
+
+#define PG_UNIX_EPOCH_JDATE        2440588
+#define PG_UNIX_EPOCH_USECS        (INT64CONST(946684800) * PG_USECS_PER_SECOND)
+
+static PyObject *ArrayType = NULL;
+
+/* returns the typecode of the items the values of a column are fetched
+   as, or 0 when they are fetched as objects; int64 selects the codes of
+   fetchinto */
+static char _pg_column_arraycode(pgcolumn *column, int int64)
+{
+    pgdecoder decode = column->decode;
+
+    if (column->cast != NULL)
+        return 0;
+    if (decode == _pg_decode_bool || decode == _pg_decode_bool_bin)
+        return 'B';
+    if (decode == _pg_decode_int2_bin ||
+        (decode == _pg_decode_int && column->type == INT2OID))
+        return 'h';
+    if (decode == _pg_decode_int || decode == _pg_decode_int4_bin)
+        return 'i';
+    if (decode == _pg_decode_oid_bin)
+        return 'I';
+    if (decode == _pg_decode_int8 || decode == _pg_decode_int8_bin)
 #if(SIZEOF_LONG > 4)
-            ret = PyInt_FromString(cell, NULL, 10);
+        return int64 ? 'q' : 'l';
 #else
-            ret = PyLong_FromString(cell, NULL, 10);
+        return int64 ? 'q' : 0;
 #endif
-            break;
-        case FLOAT8OID:
-        case FLOAT4OID:
-            {
-                PyObject *tmp;
-                tmp = PyString_FromString(cell);
-                ret = PyFloat_FromString(tmp, NULL);
-                Py_DECREF(tmp);
-            }
-            break;
-        case CASHOID: /* nasty $-x,yyy.zzz format */
-            {
-                int cashsign = 1;
-                char *cashbuf = malloc(PQgetlength(result, row, col) + 1);
-                char *s = cell;
-                int k = 0;
-
-                /* get rid of the '$' and commas */
-                for (k=0 ; *s ; s++) {
-                    if (*s == '$' || *s ==',' || *s == ' ' || *s == ')') continue;
-                    if (*s == '-' || *s == '(') {
-                        cashsign = -1;
-                        continue;
-                    }
-                    cashbuf[k++] = *s;
-                }
-                cashbuf[k] = 0;
-                ret = PyFloat_FromDouble(strtod(cashbuf, NULL) * cashsign);
-                free(cashbuf);
-            }
-            break;
-        /* Decoding these is handled by the Python code */
-        case DATEOID:
-        case ABSTIMEOID:
-        case RELTIMEOID:
-        case TIMESTAMPOID:
-        case TIMESTAMPTZOID:
-        case TINTERVALOID:
-        case INTERVALOID:
-        case TIMEOID:
-        case TIMETZOID:
-        case NUMERICOID:
-        /* .. and these are actual character string types */
-        case BPCHAROID:
-        case VARCHAROID:
-        case NAMEOID:
-        case CHAROID:
-        case TEXTOID:
-            ret = PyString_FromStringAndSize(cell, cellsize);
-            break;
-        case BYTEAOID:
-            if (PQfformat(result, col) == 0) {
-                /* bytea values returned in text mode need to be decoded */
-                char *newStr;
-                size_t newLen;
-                newStr = PQunescapeBytea(cell, &newLen);
-                ret = PyString_FromStringAndSize(newStr, (Py_ssize_t)newLen);
-                PQfreemem(newStr);
-                break;
-            }
-            /* fall-through on else is intentional */
+    if (decode == _pg_decode_float4_bin)
+        return 'f';
+    if (decode == _pg_decode_float || decode == _pg_decode_float8_bin)
+        return 'd';
+    if (decode == _pg_decode_timestamp_bin ||
+        decode == _pg_decode_timestamptz_bin ||
+        (decode == _pg_decode_datetime && (column->type == TIMESTAMPOID ||
+                                           column->type == TIMESTAMPTZOID)))
+        return int64 ? 'M' : 'd';
+    return 0;
+}
+
+static int _pg_arraycode_size(char code)
+{
+    switch (code) {
+        case 'B':
+            return 1;
+        case 'h':
+            return sizeof(short);
+        case 'i':
+            return sizeof(int);
+        case 'I':
+            return sizeof(unsigned int);
+        case 'l':
+            return sizeof(long);
+        case 'f':
+            return sizeof(float);
+        case 'd':
+            return sizeof(double);
         default:
-            {
-                void *tmpstr = NULL;
-                Py_ssize_t tmplen = 0;
-                int retcode = 0;
-                char *notice;
-
-                asprintf(&notice,
-                         "Unknown datatype %ld processed as string",
-                         (long)oidtype);
-                if(notice) {
-                    PyErr_Warn(NULL, notice);
-                    free(notice);
-                } else {
-                    PyErr_SetString(PyExc_MemoryError, "out of memory");
-                    return NULL;
-                }
+            return sizeof(int64);
+    }
+}
 
-                if (!(ret = PyBuffer_New(cellsize))
-                     || ret == PyExc_ValueError) {
-                    PyErr_SetString(PyExc_MemoryError,
-                                    "could not allocate buffer object");
-                    return NULL;
-                }
-                retcode = PyObject_AsWriteBuffer(ret, &tmpstr, &tmplen);
-                if (retcode < 0 || (tmplen != cellsize)) {
-                    PyErr_SetString(InternalError,
-                                    "could not convert to buffer ");
-                    Py_DECREF(ret);
-                    return NULL;
-                }
-                memcpy(tmpstr, cell, cellsize);
+/* microseconds since 2000-01-01 UTC from a timestamp in text format */
+static int _pg_usecs_from_text(const char *value, int64 *usecs)
+{
+    const char *s = value;
+    int year, month, day, offset = 0;
+    int64 time;
+
+    if (!strcmp(value, "infinity")) {
+        *usecs = PG_INT64_MAX;
+        return 1;
+    }
+    if (!strcmp(value, "-infinity")) {
+        *usecs = PG_INT64_MIN;
+        return 1;
+    }
+    if (!_pg_parse_date(&s, &year, &month, &day) || *s++ != ' ' ||
+        !_pg_parse_time(&s, &time) || (*s && !_pg_parse_tz(&s, &offset)) ||
+        *s) {
+        _pg_bad_value("timestamp", value);
+        return 0;
+    }
+    *usecs = (int64)(_pg_date2j(year, month, day) - PG_EPOCH_JDATE)
+             * PG_USECS_PER_DAY + time - offset * PG_USECS_PER_SECOND;
+    return 1;
+}
+
+/* stores a cell as an item of the given typecode at p, which need not
+   be aligned */
+static int _pg_store_cell(pgcolumn *column, char code, int format,
+                          char *cell, char *p)
+{
+    union {
+        unsigned char b; short h; int i; unsigned int I; long l;
+        int64 q; float f; double d; int32 i4;
+    } v;
+    char *end = NULL;
+    long l = 0;
+
+    if (format == 1) {
+        switch (code) {
+            case 'B':
+                v.b = *cell != 0;
                 break;
-            }
+            case 'h':
+                v.h = _pg_get_int16(cell);
+                break;
+            case 'i':
+                v.i = _pg_get_int32(cell);
+                break;
+            case 'I':
+                v.I = (uint32)_pg_get_int32(cell);
+                break;
+            case 'l':
+                v.l = (long)_pg_get_int64(cell);
+                break;
+            case 'f':
+                v.i4 = _pg_get_int32(cell);
+                break;
+            default:
+                v.q = _pg_get_int64(cell);
+        }
+    } else if (code == 'B') {
+        v.b = *cell == 't' || *cell == 'T';
+    } else if (code == 'd' && column->decode == _pg_decode_float) {
+        v.d = PyOS_string_to_double(cell, NULL, NULL);
+        if (v.d == -1.0 && PyErr_Occurred())
+            return 0;
+    } else if (code == 'd' || code == 'M') {
+        if (!_pg_usecs_from_text(cell, &v.q))
+            return 0;
+    } else {
+        errno = 0;
+        if (code == 'q')
+            v.q = strtoll(cell, &end, 10);
+        else
+            l = strtol(cell, &end, 10);
+        if (errno || end == cell || *end) {
+            _pg_bad_value("integer", cell);
+            return 0;
+        }
+        if (code == 'h')
+            v.h = (short)l;
+        else if (code == 'i')
+            v.i = (int)l;
+        else if (code == 'I')
+            v.I = (unsigned int)l;
+        else if (code == 'l')
+            v.l = l;
     }
-    return ret;
+
+    /* timestamps were read as microseconds since 2000-01-01 */
+    if (code == 'd' && column->decode != _pg_decode_float &&
+        column->decode != _pg_decode_float8_bin) {
+        if (v.q == PG_INT64_MAX || v.q == PG_INT64_MIN)
+            v.d = v.q > 0 ? Py_HUGE_VAL : -Py_HUGE_VAL;
+        else
+            v.d = (double)(v.q + PG_UNIX_EPOCH_USECS) / PG_USECS_PER_SECOND;
+    } else if (code == 'M') {
+        if (v.q == PG_INT64_MAX || v.q == PG_INT64_MIN)
+            v.q = PG_INT64_MIN;
+        else
+            v.q += PG_UNIX_EPOCH_USECS;
+    }
+    memcpy(p, &v, _pg_arraycode_size(code));
+    return 1;
 }
 
-/* internal function for getting one result row as a python tuple */
-static PyObject *_pg_result_rowtuple(PGresult *result, int row)
+/* makes an array.array of n zero items, and returns its buffer */
+static PyObject *_pg_array_new(char code, int n, char **items)
 {
-    PyObject        *rowtuple;
-    int                num_fields, col;
+    PyObject *zero, *ret;
+    Py_ssize_t size;
 
-    num_fields = PQnfields(result);
-    /* allocate list for result */
-    if ((rowtuple = PyTuple_New(num_fields)) == NULL)
+    if (_pg_import(&ArrayType, "array", "array") == NULL)
+        return NULL;
+    if ((zero = PyObject_CallFunction(ArrayType, "c[i]", code, 0)) == NULL)
+        return NULL;
+    ret = PySequence_Repeat(zero, n);
+    Py_DECREF(zero);
+    if (ret == NULL)
+        return NULL;
+    if (PyObject_AsWriteBuffer(ret, (void **)items, &size) < 0) {
+        Py_DECREF(ret);
         return NULL;
-    for (col = 0; col < num_fields; col++) {
-        PyObject *cell;
-        cell = _pg_fetch_cell(result, row, col);
-        if (cell == NULL) {
-            Py_DECREF(rowtuple);
-            return NULL;
-        }
-        PyTuple_SET_ITEM(rowtuple, col, cell);
     }
-    return rowtuple;
+    return ret;
 }
-/* internal function for getting one result row as a python dict */
-static PyObject *_pg_result_rowdict(PGresult *result, int row)
+
+/* fetches the rows from start to end of a column as (values, nulls); the
+   values are stored as items of code at items, stride bytes apart, and
+   are None, or as a list of objects if code is 0 */
+static PyObject *_pg_fetch_column(pgsourceobject *self, int col,
+                                  int start, int end, char code,
+                                  char *items, int stride, PyObject *values)
 {
-    PyObject        *rowdict;
-    int                num_fields, col;
+    pgcolumn *column = self->columns + col;
+    int format = PQfformat(self->last_result, col);
+    PyObject *nulls, *cell;
+    char *mask;
+    int row;
 
-    num_fields = PQnfields(result);
-    /* allocate list for result */
-    if ((rowdict = PyDict_New()) == NULL)
+    if ((nulls = _pg_array_new('B', end - start, &mask)) == NULL)
+        return NULL;
+    if (!code && (values = PyList_New(end - start)) == NULL) {
+        Py_DECREF(nulls);
         return NULL;
-    for (col = 0; col < num_fields; col++) {
-        PyObject *cell;
-        cell = _pg_fetch_cell(result, row, col);
-        if (cell == NULL) {
-            Py_DECREF(rowdict);
-            return NULL;
-        }
-        PyDict_SetItemString(rowdict, PQfname(result, col), cell);
-        Py_DECREF(cell);
     }
-    return rowdict;
+    Py_INCREF(values);
+
+    for (row = start; row < end; row++) {
+        if (PQgetisnull(self->last_result, row, col))
+            mask[row - start] = 1;
+        if (!code) {
+            if ((cell = _pg_fetch_cell(self, row, col)) == NULL)
+                goto error;
+            PyList_SET_ITEM(values, row - start, cell);
+        } else if (!mask[row - start] &&
+                   !_pg_store_cell(column, code, format,
+                                   PQgetvalue(self->last_result, row, col),
+                                   items + (row - start) * stride))
+            goto error;
+    }
+    if (!code)
+        Py_DECREF(values);
+    return Py_BuildValue("(NN)", values, nulls);
+
+error:
+    Py_DECREF(values);
+    if (!code)
+        Py_DECREF(values);
+    Py_DECREF(nulls);
+    return NULL;
+}
+
+/* returns the first row, and marks all rows returned */
+static int _pg_fetch_columns_start(pgsourceobject *self)
+{
+    int start;
+
+    start = self->current_row < self->max_row ? self->current_row
+                                              : self->max_row;
+    self->current_row = self->max_row + 1;
+    return start;
 }
 
-/* fetches next row from last result as a tuple*/
-static char pgsource_fetchone__doc__[] =
-"fetchone() -- return the row from the last result as a tuple. ";
+/* retrieves all remaining results as columns */
+static char pgsource_fetchcolumns__doc__[] =
+"fetchcolumns() -- Gets the remaining rows of the result as columns, a "
+"list of (values, nulls) pairs in the order returned by the server.  "
+"The values of bool, integer, float and timestamp columns are returned "
+"as an array.array, timestamps as seconds since the epoch, and others "
+"as a list; nulls is an array.array('B') flagging the NULL rows.";
 static PyObject *
-pgsource_fetchone(pgsourceobject * self, PyObject * args)
+pgsource_fetchcolumns(pgsourceobject * self, PyObject * args)
 {
-    PyObject        *rowtuple;
+    int        col, start;
+    PyObject *columns;
 
-    if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL))
+    if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL | CHECK_ROWS))
         return NULL;
-    if (!check_no_args(args, "fetchone"))
+    if (!check_no_args(args, "fetchcolumns"))
+        return NULL;
+    if (_pg_source_columns(self) == NULL)
+        return NULL;
+    if ((columns = PyList_New(self->num_fields)) == NULL)
         return NULL;
 
-    if (self->current_row >= self->max_row) {
-        Py_INCREF(Py_None);
-        return Py_None;
+    start = _pg_fetch_columns_start(self);
+    for (col = 0; col < self->num_fields; col++) {
+        PyObject *column, *values = NULL;
+        char code, *items = NULL;
+
+        code = _pg_column_arraycode(self->columns + col, 0);
+        if (code && (values = _pg_array_new(code, self->max_row - start,
+                                            &items)) == NULL) {
+            Py_DECREF(columns);
+            return NULL;
+        }
+        column = _pg_fetch_column(self, col, start, self->max_row, code,
+                                  items, _pg_arraycode_size(code), values);
+        Py_XDECREF(values);
+        if (column == NULL) {
+            Py_DECREF(columns);
+            return NULL;
+        }
+        PyList_SET_ITEM(columns, col, column);
     }
-    if ((rowtuple = _pg_result_rowtuple(self->last_result, self->current_row)) == NULL)
-        return NULL;
-    self->current_row++;
-    return rowtuple;
+    return columns;
 }
 
-/* fetches next row from last result as a dict*/
-static char pgsource_fetchonedict__doc__[] =
-"fetchonedict() -- return the row from the last result as a dict.";
+/* returns the typecodes of fetchinto */
+static char pgsource_arraycodes__doc__[] =
+"arraycodes() -- Gets the typecodes of the items fetchinto() stores the "
+"columns of the result as, or None for columns of objects.";
 static PyObject *
-pgsource_fetchonedict(pgsourceobject * self, PyObject * args)
+pgsource_arraycodes(pgsourceobject * self, PyObject * args)
 {
-    PyObject        *rowdict;
+    int        col;
+    PyObject *codes;
 
     if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL))
         return NULL;
-    if (!check_no_args(args, "fetchonedict"))
+    if (!check_no_args(args, "arraycodes"))
         return NULL;
+    if (_pg_source_columns(self) == NULL)
+        return NULL;
+    if ((codes = PyList_New(self->num_fields)) == NULL)
+        return NULL;
+    for (col = 0; col < self->num_fields; col++) {
+        char code = _pg_column_arraycode(self->columns + col, 1);
+        PyObject *item;
 
-    if (self->current_row >= self->max_row) {
-        Py_INCREF(Py_None);
-        return Py_None;
+        if (code)
+            item = PyString_FromStringAndSize(&code, 1);
+        else {
+            Py_INCREF(Py_None);
+            item = Py_None;
+        }
+        if (item == NULL) {
+            Py_DECREF(codes);
+            return NULL;
+        }
+        PyList_SET_ITEM(codes, col, item);
     }
-
-    if ((rowdict = _pg_result_rowdict(self->last_result, self->current_row)) == NULL)
-        return NULL;
-    self->current_row++;
-    return rowdict;
+    return codes;
 }
 
-/* retrieves all remaining results as a list of tuples */
-static char pgsource_fetchall__doc__[] =
-"fetchall() -- Gets the result of a query.  The result is returned "
-"as a list of rows, each one a list of fields in the order returned "
-"by the server.";
+/* retrieves all remaining results into buffers */
+static char pgsource_fetchinto__doc__[] =
+"fetchinto(targets) -- Gets the remaining rows of the result as columns, "
+"like fetchcolumns(), storing the values of a column with a target, a "
+"(buffer, offset, stride) tuple, in the writable buffer as items of the "
+"typecode given by arraycodes(), starting at offset and stride bytes "
+"apart; the values of the NULL rows are left as they were.  Returns a "
+"list of (values, nulls) pairs, where values is None for the columns "
+"stored in buffers.";
 static PyObject *
-pgsource_fetchall(pgsourceobject * self, PyObject * args)
+pgsource_fetchinto(pgsourceobject * self, PyObject * args)
 {
-    int        row;
-    PyObject *reslist;
+    int        col, start, n;
+    PyObject *targets, *columns;
 
-    if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL))
+    if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL | CHECK_ROWS))
         return NULL;
-    if (!check_no_args(args, "fetchall"))
+    if (!PyArg_ParseTuple(args, "O:fetchinto", &targets))
+        return NULL;
+    if (_pg_source_columns(self) == NULL)
+        return NULL;
+    if (PySequence_Size(targets) != self->num_fields) {
+        PyErr_SetString(PyExc_ValueError,
+                        "fetchinto() needs a target for each column");
         return NULL;
-
-    if (self->current_row >= self->max_row) {
-        return PyList_New(0);
     }
 
-    /* stores result in presized list for efficiency */
-    reslist = PyList_New(self->max_row - self->current_row);
+    /* check all of the targets, before any row is marked returned */
+    start = self->current_row < self->max_row ? self->current_row
+                                              : self->max_row;
+    n = self->max_row - start;
+    if ((columns = PyList_New(self->num_fields)) == NULL)
+        return NULL;
+    for (col = 0; col < self->num_fields; col++) {
+        PyObject *target, *buffer;
+        Py_ssize_t offset, stride, size;
+        char code, *items;
+
+        if ((target = PySequence_GetItem(targets, col)) == NULL)
+            goto error;
+        if (target == Py_None) {
+            PyList_SET_ITEM(columns, col, target);
+            continue;
+        }
+        if (!PyArg_ParseTuple(target, "Onn:fetchinto", &buffer,
+                              &offset, &stride) ||
+            PyObject_AsWriteBuffer(buffer, (void **)&items, &size) < 0) {
+            Py_DECREF(target);
+            goto error;
+        }
+        PyList_SET_ITEM(columns, col, target);
+        if (!(code = _pg_column_arraycode(self->columns + col, 1))) {
+            PyErr_Format(PyExc_TypeError,
+                         "column %d cannot be fetched into a buffer", col);
+            goto error;
+        }
+        if (offset < 0 || stride < 0 || (n > 0 && offset + (n - 1) * stride
+                                         + _pg_arraycode_size(code) > size)) {
+            PyErr_Format(PyExc_ValueError,
+                         "buffer of column %d is too small", col);
+            goto error;
+        }
+    }
 
-    /* return the remaining rows that have not been "extracted" yet */
-    for (row = self->current_row; row < self->max_row; row++) {
-        PyObject *rowtuple;
-        if ((rowtuple = _pg_result_rowtuple(self->last_result, row)) == NULL) {
-            Py_DECREF(reslist);
-            return NULL;
+    _pg_fetch_columns_start(self);
+    for (col = 0; col < self->num_fields; col++) {
+        PyObject *target = PyList_GET_ITEM(columns, col), *column;
+        Py_ssize_t offset = 0, stride = 0, size;
+        char code = 0, *items = NULL;
+
+        if (target != Py_None) {
+            code = _pg_column_arraycode(self->columns + col, 1);
+            PyObject_AsWriteBuffer(PyTuple_GET_ITEM(target, 0),
+                                   (void **)&items, &size);
+            offset = PyInt_AsSsize_t(PyTuple_GET_ITEM(target, 1));
+            stride = PyInt_AsSsize_t(PyTuple_GET_ITEM(target, 2));
         }
-        PyList_SET_ITEM(reslist, row - self->current_row, rowtuple);
+        column = _pg_fetch_column(self, col, start, self->max_row, code,
+                                  items + offset, (int)stride, Py_None);
+        if (column == NULL)
+            goto error;
+        PyList_SetItem(columns, col, column);
     }
-    /* mark all rows returned */
-    self->current_row = self->max_row + 1;
-    /* returns list */
-    return reslist;
+    return columns;
+
+error:
+    Py_DECREF(columns);
+    return NULL;
 }
 
-/* retrieves all remaining results as a list of dictionaries*/
-static char pgsource_fetchalldict__doc__[] =
-"fetchalldict() -- Gets the result of a query.  The result is returned "
-"as a list of dictionaries with the field names used as the keys.";
+/* RESULT VIEWS */
+
+/* makes a view of rows of the result of a view */
+static pgresultviewobject *_pg_view_new(pgresultviewobject *base,
+                                        Py_ssize_t start, Py_ssize_t step,
+                                        Py_ssize_t length)
+{
+    pgresultviewobject *view;
+
+    if ((view = PyObject_NEW(pgresultviewobject, &PgResultViewType)) == NULL)
+        return NULL;
+    Py_INCREF(base->source);
+    view->source = base->source;
+    Py_INCREF(base);
+    view->base = base;
+    view->result = base->result;
+    Py_INCREF(base->holder);
+    view->holder = base->holder;
+    view->columns = base->columns;
+    view->num_fields = base->num_fields;
+    view->start = start;
+    view->step = step;
+    view->length = length;
+    Py_XINCREF(base->rowfactory);
+    view->rowfactory = base->rowfactory;
+    Py_XINCREF(base->names);
+    view->names = base->names;
+    return view;
+}
+
+/* gets a view of the result */
+static char pgsource_result_view__doc__[] =
+"result_view() -- Gets a sequence of the rows of the result, which are "
+"decoded when they are looked up.  The view does not change which rows "
+"are fetched next, and keeps the result when the source moves on.";
 static PyObject *
-pgsource_fetchalldict(pgsourceobject * self, PyObject * args)
+pgsource_result_view(pgsourceobject * self, PyObject * args)
 {
-    int        row;
-    PyObject *reslist;
+    pgresultviewobject *view;
 
-    if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL))
+    if (!check_source_obj(self, CHECK_RESULT | CHECK_DQL | CHECK_ROWS))
         return NULL;
-    if (!check_no_args(args, "fetchall"))
+    if (!check_no_args(args, "result_view"))
         return NULL;
 
-    /* need to return an empty list ? */
-    if (self->current_row > self->max_row) {
-        /* already returned the empty list, another fetchall call is invalid... */
-        Py_INCREF(Py_None);
-        return Py_None;
-    } else if (self->current_row == self->max_row) {
-        self->current_row++;
-        return PyList_New(0);
+    /* all views of a result share it, and its decoding plan */
+    if (self->view) {
+        Py_INCREF(self->view);
+        return (PyObject *) self->view;
     }
-
-    /* stores result in presized list for efficiency */
-    reslist = PyList_New(self->max_row - self->current_row);
-
-    /* return the remaining rows that have not been "extracted" yet */
-    for (row = self->current_row; row < self->max_row; row++) {
-        PyObject *rowdict;
-        if ((rowdict = _pg_result_rowdict(self->last_result, row)) == NULL) {
-            Py_DECREF(reslist);
-            return NULL;
-        }
-        PyList_SET_ITEM(reslist, row - self->current_row, rowdict);
+    if ((view = PyObject_NEW(pgresultviewobject, &PgResultViewType)) == NULL)
+        return NULL;
+    Py_INCREF(self);
+    view->source = self;
+    view->base = NULL;
+    view->result = self->last_result;
+    view->holder = _pg_source_result(self);
+    Py_XINCREF(view->holder);
+    view->num_fields = self->num_fields;
+    view->start = 0;
+    view->step = 1;
+    view->length = self->max_row;
+    Py_XINCREF(self->rowfactory);
+    view->rowfactory = self->rowfactory;
+    view->names = NULL;
+    view->columns = NULL;
+    if (self->rowfactory == (PyObject *) &PgRecordType) {
+        view->names = _pg_source_names(self);
+        Py_XINCREF(view->names);
     }
-    /* mark all rows returned */
-    self->current_row = self->max_row + 1;
-    /* returns list */
-    return reslist;
+    if (view->holder != NULL && (view->names != NULL ||
+                                 self->rowfactory != (PyObject *) &PgRecordType))
+        view->columns = _pg_source_plan(self);
+    if (view->columns == NULL) {
+        view->num_fields = 0;
+        Py_DECREF(view);
+        return NULL;
+    }
+    self->view = view;
+    return (PyObject *) view;
 }
 
 /* finds field number from string/integer (internal use only) */
@@ -1335,6 +6785,10 @@ static PyObject *_pgsource_typecode(int typecode)
         case BOOLOID:
             tc = PyString_FromString("bool");
             break;
+        case JSONOID:
+        case JSONBOID:
+            tc = PyString_FromString("json");
+            break;
         default:
             tc = PyInt_FromLong(typecode);
             break;
@@ -1420,6 +6874,12 @@ static PyObject *_pg_source_description(pgsourceobject *self)
         return Py_None;
     }
 
+    /* the description is built once per result */
+    if (self->description) {
+        Py_INCREF(self->description);
+        return self->description;
+    }
+
     /* builds result */
     if ((result = PyTuple_New(self->num_fields)) == NULL)
         return NULL;
@@ -1436,6 +6896,8 @@ static PyObject *_pg_source_description(pgsourceobject *self)
     }
 
     /* returns result */
+    Py_INCREF(result);
+    self->description = result;
     return result;
 };
 
@@ -1472,6 +6934,12 @@ static PyMethodDef pgsource_methods[] = {
                         pgsource_execute__doc__},
         {"query", (PyCFunction) pgsource_query, METH_VARARGS,
                         pgsource_query__doc__},
+        {"queryall", (PyCFunction) pgsource_queryall, METH_VARARGS,
+                        pgsource_queryall__doc__},
+        {"nextset", (PyCFunction) pgsource_nextset, METH_VARARGS,
+                        pgsource_nextset__doc__},
+        {"stream", (PyCFunction) pgsource_stream, METH_VARARGS,
+                        pgsource_stream__doc__},
         {"executemany", (PyCFunction) pgsource_executemany, METH_VARARGS,
                         pgsource_executemany__doc__},
         {"fetchone", (PyCFunction) pgsource_fetchone, METH_VARARGS,
@@ -1482,8 +6950,20 @@ static PyMethodDef pgsource_methods[] = {
                         pgsource_fieldinfo__doc__},
         {"fetchall", (PyCFunction) pgsource_fetchall, METH_VARARGS,
                         pgsource_fetchall__doc__},
+        {"fetchmany", (PyCFunction) pgsource_fetchmany, METH_VARARGS,
+                        pgsource_fetchmany__doc__},
+        {"scroll", (PyCFunction) pgsource_scroll, METH_VARARGS,
+                        pgsource_scroll__doc__},
         {"fetchalldict", (PyCFunction) pgsource_fetchalldict, METH_VARARGS,
                         pgsource_fetchalldict__doc__},
+        {"fetchcolumns", (PyCFunction) pgsource_fetchcolumns, METH_VARARGS,
+                        pgsource_fetchcolumns__doc__},
+        {"arraycodes", (PyCFunction) pgsource_arraycodes, METH_VARARGS,
+                        pgsource_arraycodes__doc__},
+        {"fetchinto", (PyCFunction) pgsource_fetchinto, METH_VARARGS,
+                        pgsource_fetchinto__doc__},
+        {"result_view", (PyCFunction) pgsource_result_view, METH_VARARGS,
+                        pgsource_result_view__doc__},
         {NULL, NULL}
 };
 
@@ -1504,12 +6984,45 @@ pgsource_getattr(pgsourceobject * self, char *name)
     /* arraysize */
     if (!strcmp(name, "arraysize"))
         return PyInt_FromLong(self->arraysize);
+    /* binary */
+    if (!strcmp(name, "binary"))
+        return PyBool_FromLong(self->binary);
+    /* typecasts */
+    if (!strcmp(name, "typecasts")) {
+        PyObject *casts = self->typecasts ? self->typecasts : Py_None;
+        Py_INCREF(casts);
+        return casts;
+    }
+    /* columncasts */
+    if (!strcmp(name, "columncasts")) {
+        PyObject *casts = self->columncasts ? self->columncasts : Py_None;
+        Py_INCREF(casts);
+        return casts;
+    }
+    /* rowfactory */
+    if (!strcmp(name, "rowfactory")) {
+        PyObject *factory = self->rowfactory ? self->rowfactory : Py_None;
+        Py_INCREF(factory);
+        return factory;
+    }
+    /* intern */
+    if (!strcmp(name, "intern")) {
+        PyObject *intern = self->intern ? self->intern : Py_False;
+        Py_INCREF(intern);
+        return intern;
+    }
     /* resulttype */
     if (!strcmp(name, "resulttype"))
         return PyInt_FromLong(self->result_type);
     /* ntuples */
     if (!strcmp(name, "rowcount")) {
-        return PyInt_FromLong(self->max_row);
+        /* streamed results are counted when all their rows are read */
+        if (self->streaming == STREAM_ACTIVE)
+            return PyInt_FromLong(-1);
+        if (self->streaming == STREAM_SPILLED ||
+            self->streaming == STREAM_HELD)
+            return PyInt_FromLong(self->storerows);
+        return PyInt_FromLong(self->streamed + self->max_row);
     }
     /* nfields */
     if (!strcmp(name, "nfields")) {
@@ -1523,7 +7036,20 @@ pgsource_getattr(pgsourceobject * self, char *name)
         if (self->result_type != RESULT_DQL)
             return PyInt_FromLong(-1);
         else
-            return PyInt_FromLong(self->current_row);
+            return PyInt_FromLong(self->streamed + self->current_row);
+    }
+    /* memory used by the last result */
+    if (!strcmp(name, "resultsize")) {
+        size_t size = 0;
+        Py_ssize_t i;
+
+        if (self->last_result == NULL)
+            return PyInt_FromLong(-1);
+        if (self->streaming != STREAM_HELD)
+            return PyLong_FromSize_t(PQresultMemorySize(self->last_result));
+        for (i = 0; i < PyList_GET_SIZE(self->chunks); i++)
+            size += PQresultMemorySize(_pg_chunk(self->chunks, i));
+        return PyLong_FromSize_t(size);
     }
     /* fields */
     if (!strcmp(name, "fields")) {
@@ -1558,15 +7084,16 @@ pgsource_getattr(pgsourceobject * self, char *name)
             Py_INCREF(Py_True);
             return Py_True;
         }
+        PyErr_Clear();
         Py_INCREF(Py_False);
         return Py_False;
     }
     /* attributes list */
     if (!strcmp(name, "__members__")) {
         static char *members[] = {
-            "connection", "arraysize", "resulttype", "rowcount", "nfields",
-            "rownumber", "fields", "notices", "description", "oidstatus",
-            "valid", NULL};
+            "connection", "arraysize", "binary", "typecasts", "columncasts",
+            "rowfactory", "intern", "resulttype", "rowcount", "nfields", "rownumber", "resultsize", "fields",
+            "notices", "description", "oidstatus", "valid", NULL};
         int i = 0;
         PyObject *list;
 
@@ -1606,6 +7133,71 @@ pgsource_setattr(pgsourceobject * self, char *name, PyObject * v)
         return 0;
     }
 
+    /* binary */
+    if (!strcmp(name, "binary")) {
+        int binary = PyObject_IsTrue(v);
+        if (binary < 0)
+            return -1;
+        self->binary = binary;
+        return 0;
+    }
+
+    /* typecasts, columncasts */
+    if (!strcmp(name, "typecasts") || !strcmp(name, "columncasts")) {
+        PyObject **casts;
+        if (!strcmp(name, "typecasts"))
+            casts = &self->typecasts;
+        else
+            casts = &self->columncasts;
+        if (v != Py_None && !PyDict_Check(v)) {
+            PyErr_Format(PyExc_TypeError, "%s must be a dict or None.", name);
+            return -1;
+        }
+        Py_XDECREF(*casts);
+        *casts = NULL;
+        if (v != Py_None) {
+            Py_INCREF(v);
+            *casts = v;
+        }
+        /* the casts of the current result are looked up again */
+        _pg_source_clear_columns(self);
+        return 0;
+    }
+
+    /* intern */
+    if (!strcmp(name, "intern")) {
+        Py_XDECREF(self->intern);
+        self->intern = NULL;
+        if (v == Py_True || (!PyBool_Check(v) && v != Py_None)) {
+            if (v != Py_True && !PySequence_Check(v)) {
+                PyErr_SetString(PyExc_TypeError,
+                                "intern must be a bool or a sequence.");
+                return -1;
+            }
+            Py_INCREF(v);
+            self->intern = v;
+        }
+        /* the current result is decoded with a new plan */
+        _pg_source_clear_columns(self);
+        return 0;
+    }
+
+    /* rowfactory */
+    if (!strcmp(name, "rowfactory")) {
+        if (v != Py_None && !PyCallable_Check(v)) {
+            PyErr_SetString(PyExc_TypeError,
+                            "rowfactory must be callable or None.");
+            return -1;
+        }
+        Py_XDECREF(self->rowfactory);
+        self->rowfactory = NULL;
+        if (v != Py_None) {
+            Py_INCREF(v);
+            self->rowfactory = v;
+        }
+        return 0;
+    }
+
     /* unknown attribute */
     PyErr_SetString(PyExc_TypeError, "not a writable attribute.");
     return -1;
@@ -1663,6 +7255,114 @@ staticforward PyTypeObject PgSourceType = {
         0,                                /* tp_as_sequence */
         0,                                /* tp_as_mapping */
         0,                                /* tp_hash */
+        0,                                /* tp_call */
+        0,                                /* tp_str */
+        0,                                /* tp_getattro */
+        0,                                /* tp_setattro */
+        0,                                /* tp_as_buffer */
+        Py_TPFLAGS_DEFAULT,                /* tp_flags */
+        0,                                /* tp_doc */
+        0,                                /* tp_traverse */
+        0,                                /* tp_clear */
+        0,                                /* tp_richcompare */
+        0,                                /* tp_weaklistoffset */
+        PyObject_SelfIter,                /* tp_iter */
+        (iternextfunc) pgsource_iternext, /* tp_iternext */
+};
+
+/* --------------------------------------------------------------------- */
+/* PG RESULT VIEW OBJECT IMPLEMENTATION */
+
+/* destructor */
+static void
+pgresultview_dealloc(pgresultviewobject * self)
+{
+    if (self->base)
+        Py_DECREF(self->base);
+    else {
+        _pg_columns_free(self->columns, self->num_fields);
+        if (self->source->view == self)
+            self->source->view = NULL;
+    }
+    Py_XDECREF(self->holder);
+    Py_XDECREF(self->rowfactory);
+    Py_XDECREF(self->names);
+    Py_DECREF(self->source);
+    PyObject_Del(self);
+}
+
+static Py_ssize_t
+pgresultview_length(pgresultviewobject * self)
+{
+    return self->length;
+}
+
+/* gets the row of an item */
+static PyObject *
+pgresultview_item(pgresultviewobject * self, Py_ssize_t i)
+{
+    if (i < 0 || i >= self->length) {
+        PyErr_SetString(PyExc_IndexError, "result view index out of range");
+        return NULL;
+    }
+    return _pg_make_row(self->result, self->columns, self->num_fields,
+                        self->rowfactory, self->names,
+                        (int)(self->start + i * self->step));
+}
+
+/* gets the row of an index, or a view of the rows of a slice */
+static PyObject *
+pgresultview_subscript(pgresultviewobject * self, PyObject * key)
+{
+    Py_ssize_t start, stop, step, length;
+
+    if (PySlice_Check(key)) {
+        if (PySlice_GetIndicesEx((PySliceObject *) key, self->length,
+                                 &start, &stop, &step, &length) < 0)
+            return NULL;
+        return (PyObject *) _pg_view_new(self->base ? self->base : self,
+                                         self->start + start * self->step,
+                                         self->step * step, length);
+    }
+    start = PyNumber_AsSsize_t(key, PyExc_IndexError);
+    if (start == -1 && PyErr_Occurred())
+        return NULL;
+    if (start < 0)
+        start += self->length;
+    return pgresultview_item(self, start);
+}
+
+static PySequenceMethods pgresultview_as_sequence = {
+        (lenfunc) pgresultview_length,        /* sq_length */
+        0,                                /* sq_concat */
+        0,                                /* sq_repeat */
+        (ssizeargfunc) pgresultview_item, /* sq_item */
+};
+
+static PyMappingMethods pgresultview_as_mapping = {
+        (lenfunc) pgresultview_length,        /* mp_length */
+        (binaryfunc) pgresultview_subscript, /* mp_subscript */
+        0,                                /* mp_ass_subscript */
+};
+
+staticforward PyTypeObject PgResultViewType = {
+        PyObject_HEAD_INIT(NULL)
+
+        0,                                /* ob_size */
+        "pgresultview",                        /* tp_name */
+        sizeof(pgresultviewobject),        /* tp_basicsize */
+        0,                                /* tp_itemsize */
+        /* methods */
+        (destructor) pgresultview_dealloc, /* tp_dealloc */
+        0,                                /* tp_print */
+        0,                                /* tp_getattr */
+        0,                                /* tp_setattr */
+        0,                                /* tp_compare */
+        0,                                /* tp_repr */
+        0,                                /* tp_as_number */
+        &pgresultview_as_sequence,        /* tp_as_sequence */
+        &pgresultview_as_mapping,        /* tp_as_mapping */
+        0,                                /* tp_hash */
 };
 
 
@@ -1697,6 +7397,54 @@ static void _pg_notice_callback(pgobject *self, char *message)
 }
 
 /* connects to a database */
+/* sets the Python codec text values are decoded with; UTF-8, by any
+   spelling, is decoded without looking up the codec */
+static int _pg_set_encoding(pgobject *self, const char *encoding)
+{
+    PyObject *tmp;
+    char norm[8];
+    int i, n, utf8;
+
+    for (i = n = 0; encoding[i] && n < (int)sizeof(norm) - 1; i++)
+        if (encoding[i] != '-' && encoding[i] != '_')
+            norm[n++] = tolower((unsigned char)encoding[i]);
+    norm[n] = '\0';
+    utf8 = !strcmp(norm, "utf8") && !encoding[i];
+
+    if (!utf8) {
+        if ((tmp = _PyCodec_Lookup(encoding)) == NULL)
+            return -1;
+        Py_DECREF(tmp);
+    }
+    if ((tmp = PyString_FromString(encoding)) == NULL)
+        return -1;
+    Py_XDECREF(self->encoding);
+    self->encoding = tmp;
+    self->utf8 = utf8;
+    return 0;
+}
+
+/* sets the codec from the name of a PostgreSQL encoding; those Python
+   has no codec for are decoded as Latin-1, which never fails */
+static int _pg_set_server_encoding(pgobject *self, int encoding)
+{
+    const char *name = pg_encoding_to_char(encoding);
+    char buf[32];
+
+    if (!strcmp(name, "SQL_ASCII"))
+        name = "ascii";
+    else if (!strncmp(name, "WIN", 3)) {
+        snprintf(buf, sizeof(buf), "cp%s", name + 3);
+        name = buf;
+    }
+    if (_pg_set_encoding(self, name) == 0)
+        return 0;
+    if (!PyErr_ExceptionMatches(PyExc_LookupError))
+        return -1;
+    PyErr_Clear();
+    return _pg_set_encoding(self, "latin-1");
+}
+
 static char connect__doc__[] =
 "connect(dbname, host, port, opt, tty) -- connect to a PostgreSQL database "
 "using specified parameters (optionals, keywords aware).";
@@ -1742,6 +7490,11 @@ pgconnect(pgobject * self, PyObject * args, PyObject * dict)
         return NULL;
     }
     npgobj->connid++;
+    /* text is decoded with the client encoding of the connection */
+    if (_pg_set_server_encoding(npgobj, PQclientEncoding(npgobj->cnx)) < 0) {
+        Py_XDECREF(npgobj);
+        return NULL;
+    }
     /* set the notice processor */
     PQsetNoticeProcessor(npgobj->cnx, (PQnoticeProcessor)_pg_notice_callback, npgobj);
     return (PyObject *) npgobj;
@@ -1766,6 +7519,7 @@ pg_close(pgobject *self, PyObject * args)
     PQfinish(self->cnx);
     self->cnx = NULL;
     self->connid = 0;
+    self->streaming = 0;
     /* give up the server notices */
     Py_XDECREF(self->notices);
     self->notices = NULL;
@@ -1790,6 +7544,7 @@ pg_reset(pgobject * self, PyObject * args)
     /* resets the connection */
     PQreset(self->cnx);
     self->connid++;
+    self->streaming = 0;
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -1897,6 +7652,14 @@ pg_prepare(pgobject *self, PyObject *args)
                 Py_INCREF(Py_None);
                 src->name = Py_None;
             }
+            /* the parameters are encoded for the types of the statement */
+            if (!_pg_param_types(self->cnx, stmt, &src->paramtypes,
+                                 &src->nparamtypes)) {
+                if (stmt_len)
+                    free(stmt);
+                Py_DECREF(src);
+                return NULL;
+            }
             if (stmt_len)
                 free(stmt);
             return (PyObject *)src;
@@ -1953,7 +7716,7 @@ pg_execute(pgobject *self, PyObject *args)
     }
 
     /* if we got rows back, construct and return a queryobject */
-    if (ret == Py_None && PQresultStatus(src->last_result) == PGRES_TUPLES_OK) {
+    if (ret == Py_None && src->result_type == RESULT_DQL) {
         Py_DECREF(ret);
         return (PyObject *)src;
     }
@@ -2053,6 +7816,36 @@ pg_setnotices(pgobject *self, PyObject *args)
 }
 
 /* connection object methods */
+/* decodes a string value with the encoding of the connection */
+static char pg_typecast_string__doc__[] =
+"typecast_string(type, value) -- decode a string value to unicode with the "
+"encoding of the connection.";
+static PyObject *
+pg_typecast_string(pgobject *self, PyObject *args)
+{
+    PyObject *typ, *value;
+
+    if (!PyArg_ParseTuple(args, "OS:typecast_string", &typ, &value))
+        return NULL;
+    return _pg_unicode_from_text(self->utf8 ? NULL : self->encoding,
+                                 PyString_AS_STRING(value),
+                                 PyString_GET_SIZE(value));
+}
+
+static char pg_reset_types__doc__[] =
+"reset_types() -- forget the types read from pg_type, e.g. after an ALTER "
+"TYPE; they are read again when a result next needs them.";
+static PyObject *
+pg_reset_types(pgobject *self, PyObject *args)
+{
+    if (!check_no_args(args, "reset_types"))
+        return NULL;
+    Py_CLEAR(self->types);
+    Py_CLEAR(self->typedetails);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
 static struct PyMethodDef pgobj_methods[] = {
         {"source", (PyCFunction) pg_source, METH_VARARGS, pg_source__doc__},
         {"prepare", (PyCFunction) pg_prepare, METH_VARARGS, pg_prepare__doc__},
@@ -2064,6 +7857,8 @@ static struct PyMethodDef pgobj_methods[] = {
         {"setnotices", (PyCFunction) pg_setnotices, METH_VARARGS, pg_setnotices__doc__},
         {"put_copy_data", (PyCFunction) pg_put_copy_data, METH_VARARGS, pg_put_copy_data__doc__},
         {"put_copy_end", (PyCFunction) pg_put_copy_end, METH_VARARGS, pg_put_copy_end__doc__},
+        {"typecast_string", (PyCFunction) pg_typecast_string, METH_VARARGS, pg_typecast_string__doc__},
+        {"reset_types", (PyCFunction) pg_reset_types, METH_VARARGS, pg_reset_types__doc__},
 
         {NULL, NULL}                                /* sentinel */
 };
@@ -2134,11 +7929,39 @@ pg_getattr(pgobject * self, char *name)
     if (!strcmp(name, "transaction"))
         return _pg_transaction(self);
 
+    /* default result format of new sources */
+    if (!strcmp(name, "binary"))
+        return PyBool_FromLong(self->binary);
+
+    /* memory budget of results */
+    if (!strcmp(name, "memory_budget")) {
+        if (self->budget == 0) {
+            Py_INCREF(Py_None);
+            return Py_None;
+        }
+        return PyInt_FromLong(self->budget);
+    }
+
+    /* codec of text values */
+    if (!strcmp(name, "encoding")) {
+        Py_INCREF(self->encoding);
+        return self->encoding;
+    }
+
+    /* json encoder of parameters */
+    if (!strcmp(name, "json_dumps")) {
+        if (self->dumps == NULL && _pg_import(&JsonDumps, "json", "dumps") == NULL)
+            return NULL;
+        Py_INCREF(self->dumps ? self->dumps : JsonDumps);
+        return self->dumps ? self->dumps : JsonDumps;
+    }
+
     /* attributes list */
     if (!strcmp(name, "__members__")) {
         static char *members[] = {
             "host", "port", "dbname", "opt", "tty", "error", "status",
-            "notices", "transaction", NULL};
+            "notices", "transaction", "binary", "memory_budget", "encoding",
+            "json_dumps", NULL};
         int i = 0;
         PyObject *list;
 
@@ -2156,6 +7979,53 @@ pg_getattr(pgobject * self, char *name)
 static int
 pg_setattr(pgobject * self, char *name, PyObject *v)
 {
+    /* binary */
+    if (!strcmp(name, "binary")) {
+        int binary = PyObject_IsTrue(v);
+        if (binary < 0)
+            return -1;
+        self->binary = binary;
+        return 0;
+    }
+
+    /* memory budget of results, None for no limit */
+    if (!strcmp(name, "memory_budget")) {
+        long budget = 0;
+        if (v != Py_None) {
+            budget = PyInt_AsLong(v);
+            if (budget == -1 && PyErr_Occurred())
+                return -1;
+            if (budget <= 0) {
+                PyErr_SetString(PyExc_ValueError,
+                                "memory_budget must be positive or None.");
+                return -1;
+            }
+        }
+        self->budget = budget;
+        return 0;
+    }
+
+    /* encoding */
+    if (!strcmp(name, "encoding")) {
+        if (v == NULL || !PyString_Check(v)) {
+            PyErr_SetString(PyExc_TypeError, "encoding must be a string.");
+            return -1;
+        }
+        return _pg_set_encoding(self, PyString_AS_STRING(v));
+    }
+
+    /* json encoder of parameters */
+    if (!strcmp(name, "json_dumps")) {
+        if (v == NULL || !PyCallable_Check(v)) {
+            PyErr_SetString(PyExc_TypeError, "json_dumps must be callable.");
+            return -1;
+        }
+        Py_INCREF(v);
+        Py_XDECREF(self->dumps);
+        self->dumps = v;
+        return 0;
+    }
+
     /* unknown attribute */
     PyErr_SetString(PyExc_TypeError, "not a writable attribute.");
     return -1;
@@ -2191,6 +8061,26 @@ staticforward PyTypeObject PgType = {
 static struct PyMethodDef pg_methods[] = {
         {"connect", (PyCFunction) pgconnect, METH_VARARGS|METH_KEYWORDS,
                         connect__doc__},
+        {"typecast_date", (PyCFunction) pg_typecast_date, METH_VARARGS,
+                        pg_typecast_date__doc__},
+        {"typecast_datetime", (PyCFunction) pg_typecast_datetime, METH_VARARGS,
+                        pg_typecast_datetime__doc__},
+        {"typecast_time", (PyCFunction) pg_typecast_time, METH_VARARGS,
+                        pg_typecast_time__doc__},
+        {"typecast_interval", (PyCFunction) pg_typecast_interval, METH_VARARGS,
+                        pg_typecast_interval__doc__},
+        {"typecast_numeric", (PyCFunction) pg_typecast_numeric, METH_VARARGS,
+                        pg_typecast_numeric__doc__},
+        {"typecast_numeric_float", (PyCFunction) pg_typecast_numeric_float,
+                        METH_VARARGS, pg_typecast_numeric_float__doc__},
+        {"scaled_numeric", (PyCFunction) pg_scaled_numeric, METH_VARARGS,
+                        pg_scaled_numeric__doc__},
+        {"json_typecast", (PyCFunction) pg_json_typecast, METH_VARARGS,
+                        pg_json_typecast__doc__},
+        {"typecast_buffer", (PyCFunction) pg_typecast_buffer, METH_VARARGS,
+                        pg_typecast_buffer__doc__},
+        {"register_adapter", (PyCFunction) pg_register_adapter, METH_VARARGS,
+                        pg_register_adapter__doc__},
         {NULL, NULL}                                /* sentinel */
 };
 
@@ -2200,8 +8090,17 @@ init_pgsql(void)
 {
         PyObject   *mod, *dict, *v;
 
+        PyDateTime_IMPORT;
+        Adapters = PyDict_New();
+        AdapterCache = PyDict_New();
+        ObjectAdapterCapsule = PyCapsule_New(&ObjectAdapter, NULL, NULL);
+
         /* Initialize here because some WIN platforms get confused otherwise */
         PgType.ob_type = PgSourceType.ob_type = &PyType_Type;
+        PgResultViewType.ob_type = &PyType_Type;
+        PgResultType.ob_type = PgCellType.ob_type = &PyType_Type;
+        if (PyType_Ready(&PgRecordType) < 0)
+                return;
 
         /* Create the module and add the functions */
         mod = Py_InitModule4("_pgsql", pg_methods, pg__doc__, NULL, PYTHON_API_VERSION);
@@ -2242,6 +8141,10 @@ init_pgsql(void)
                 PyErr_NewException("pgsql.NotSupportedError", DatabaseError, NULL);
         PyDict_SetItemString(dict, "NotSupportedError", NotSupportedError);
 
+        /* Records made by the Record row factory */
+        Py_INCREF(&PgRecordType);
+        PyDict_SetItemString(dict, "Record", (PyObject *) &PgRecordType);
+
         /* Make the version available */
         v = PyString_FromString(PyPgVersion);
         PyDict_SetItemString(dict, "version", v);
@@ -26,10 +26,14 @@ See the README file for an overview of this module's contents.
 """
 
 import re
+import sys
+import json
+import threading
 import warnings
+from collections import deque
+from functools import partial
 from math import floor, modf
-from time import localtime, strptime
-from decimal import Decimal
+from time import localtime, time as timer
 
 import _pgsql
 from _pgsql import TRANS_ACTIVE, TRANS_IDLE, \
@@ -37,12 +41,11 @@ from _pgsql import TRANS_ACTIVE, TRANS_IDLE, \
 from _pgsql import InterfaceError, DatabaseError, InternalError, \
      OperationalError, ProgrammingError, IntegrityError, DataError, \
      NotSupportedError, Error, Warning
+from _pgsql import typecast_date, typecast_datetime, typecast_time, \
+     typecast_interval, typecast_numeric, typecast_numeric_float, \
+     scaled_numeric, typecast_buffer, Record, register_adapter
 
-from datetime import datetime, date, time, timedelta
-
-# Work-around time.strptime not being thread-safe (see
-# <http://bugs.python.org/issue7980>) by making sure _strptime is imported.
-import _strptime
+from datetime import datetime, date, time, timedelta, tzinfo
 
 # compliant with DB SIG 2.0
 apilevel = '2.0'
@@ -86,36 +89,6 @@ class pg_typed_value(object):
     def __cmp__(self, other):
         return cmp(self.value, other)
 
-# convert to Python types the values that were not automatically
-# converted by pgsql.c
-def typecast_date(typ, value):
-    t = strptime(value, '%Y-%m-%d')
-    return Date(*t[:3])
-
-def typecast_datetime(typ, value):
-    date, time = value.split(' ', 1)
-    time = typecast_time(typ, time)
-    date = strptime(date, '%Y-%m-%d')
-    return datetime(date[0], date[1], date[2],
-                    time.hour, time.minute, time.second, time.microsecond)
-
-def typecast_time(typ, value):
-    if '+' in value:
-        if value.endswith('+00'):
-            value = value[:-3]
-        else:
-            raise NotImplementedError('Can not represent timezones in Python')
-
-    if '.' in value:
-        value, micros = value.split('.')
-        micros = micros + ('0' * (6 - len(micros)))
-        micros = int(micros)
-    else:
-        micros = 0
-
-    t = strptime(value, '%H:%M:%S')
-    return time(t[3], t[4], t[5], micros)
-
 class interval(object):
     '''I am a PostgreSQL interval.'''
     __slots__ = ['years', 'months', 'days', 'hours', 'minutes', 'seconds',
@@ -170,83 +143,103 @@ class interval(object):
                 pieces.append('%s=%d' % (attr, value))
         return '%s(%s)' % (self.__class__.__name__, ', '.join(pieces))
 
-denominators = {
-    'day': 'days',
-    'year': 'years',
-    'mon': 'months', 'mons': 'months'
-}
-def typecast_interval(typ, value):
-    result = {}
+class tzoffset(tzinfo):
+    '''I am a fixed offset from UTC, the time zone of timestamp and time
+    values with time zone.'''
+
+    def __init__(self, offset):
+        '''Create a time zone ``offset`` seconds east of UTC.'''
+        self.offset = offset
 
-    pieces = value.split()
-    while len(pieces) > 1:
-        value, denominator, pieces = pieces[0], pieces[1], pieces[2:]
-        attribute = denominators.get(denominator, denominator)
-        result[attribute] = int(value)
+    def utcoffset(self, dt):
+        return timedelta(seconds=self.offset)
 
-    if pieces:
-        t = typecast_time(typ, pieces.pop())
-        result['hours'] = t.hour
-        result['minutes'] = t.minute
-        result['seconds'] = t.second
-        result['microseconds'] = t.microsecond
+    def dst(self, dt):
+        return timedelta(0)
+
+    def tzname(self, dt):
+        if self.offset < 0:
+            sign, offset = '-', -self.offset
+        else:
+            sign, offset = '+', self.offset
+        name = '%s%02d:%02d' % (sign, offset // 3600, offset // 60 % 60)
+        if offset % 60:
+            name += ':%02d' % (offset % 60)
+        return name
+
+    def __getinitargs__(self):
+        return (self.offset,)
+
+    def __repr__(self):
+        return '%s(%d)' % (self.__class__.__name__, self.offset)
 
-    return interval(**result)
+class lazyjson(object):
+    '''I am a json value, which is parsed when it is first used, either
+    through my value attribute or as the container it is.'''
+    __slots__ = ['text', 'loads', '_value']
+
+    __pgsql_typeoid__ = 0
+
+    def __init__(self, text, loads=json.loads):
+        self.text = text
+        self.loads = loads
+
+    def get_value(self):
+        try:
+            return self._value
+        except AttributeError:
+            self._value = self.loads(self.text)
+            return self._value
+    value = property(get_value)
+
+    def __getitem__(self, key):
+        return self.value[key]
+    def __iter__(self):
+        return iter(self.value)
+    def __len__(self):
+        return len(self.value)
+    def __contains__(self, item):
+        return item in self.value
+
+    def __eq__(self, other):
+        if isinstance(other, lazyjson):
+            other = other.value
+        return self.value == other
+    def __ne__(self, other):
+        return not self == other
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.text)
 
-def typecast_numeric(typ, value):
-    return Decimal(value)
+def json_typecast(loads=json.loads, lazy=False):
+    '''Return a typecast for json and jsonb values, which parses them
+    with ``loads``; if ``lazy``, they are returned as lazyjson values,
+    which are parsed when first used.'''
+    if lazy:
+        loads = partial(lazyjson, loads=loads)
+    return _pgsql.json_typecast(loads)
 
+typecast_json = json_typecast()
+
+# convert to Python types the values that were not automatically
+# converted by pgsql.c
 def typecast_binary(typ, value):
     return Binary(value)
 
-def typecast_bool_ary(typ, value):
-    value = str(value)[1:-1]
-    if not value:
-        return []
-    return [ e == 't' for e in value.split(',') ]
-
-def typecast_int_ary(typ, value):
-    value = str(value)[1:-1]
-    if not value:
-        return []
-    return [ int(e) for e in value.split(',') ]
-
-import csv
-def typecast_str_ary(typ, value):
-    value = str(value)[1:-1]
-    if not value:
-        return []
-    reader = csv.reader([value], doublequote=False, escapechar='\\')
-    return [ unicode(e, 'utf-8') for e in reader.next() ]
-
 default_typecasts = {
     'date': typecast_date,
     'datetime': typecast_datetime,
     'time': typecast_time,
     'interval': typecast_interval,
     'numeric': typecast_numeric,
-    1000: typecast_bool_ary,
-    1007: typecast_int_ary,
-    1009: typecast_str_ary,
+    'json': typecast_json,
     INET_TYPE_OID: pg_typed_value,
     CIDR_TYPE_OID: pg_typed_value,
 }
 
-def typecast(typ, casts, value):
-    if value is None:
-        return value
-    if typ in casts:
-        return casts[typ](typ, value)
-    return value
-
-# Silence warnings about array-conversions which we do here.
-for key in default_typecasts.keys():
-    if not isinstance(key, int):
-        continue
-    warnings.filterwarnings('ignore',
-                            'Unknown datatype %d processed as string' % key,
-                            RuntimeWarning)
-
 ### encode 'format'-encoded placeholders as PostgreSQL $n placeholders
 placeholder_re = re.compile(r'(%.)')
 def encode_sql(sql):
@@ -269,6 +262,10 @@ def encode_sql(sql):
     return ''.join(pieces)
 
 ### cursor object
+# numpy dtypes of the typecodes of fetchinto()
+numpy_dtypes = {'B': '?', 'h': 'i2', 'i': 'i4', 'I': 'u4', 'q': 'i8',
+                'f': 'f4', 'd': 'f8', 'M': 'M8[us]'}
+
 class Cursor(object):
     def __init__(self, src, connection):
         self._source = src
@@ -313,7 +310,6 @@ class Cursor(object):
     def execute(self, operation, params=[]):
         self._start(operation)
         operation = encode_sql(operation)
-        params = self.connection.encode_params(params)
         ret = self._source.execute(operation, params)
         if isinstance(ret, int):
             return ret
@@ -322,34 +318,112 @@ class Cursor(object):
     def executemany(self, operation, param_seq):
         self._start(operation)
         operation = encode_sql(operation)
-        params_seq = (self.connection.encode_params(params)
-                      for params in param_seq)
         ret = self._source.executemany(operation, param_seq)
         return self
 
+    def executeall(self, operation):
+        '''Execute a string of statements, without parameters, in a single
+        round trip. The string is sent as it is: '%' needs no doubling.
+        The result of the first statement is fetched first; nextset()
+        moves to the result of the next one.'''
+        self._start(operation)
+        ret = self._source.queryall(operation)
+        if isinstance(ret, int):
+            return ret
+        return self
+
+    def nextset(self):
+        return self._source.nextset()
+
     def fetchone(self):
-        return self._typecast(self._source.fetchone())
+        return self._source.fetchone()
 
     def fetchall(self):
-        return map(self._typecast, self._source.fetchall())
-
-    def __manyiter(self, size, fetchone):
-        for x in xrange(size):
-            val = fetchone()
-            if val is None:
-                raise StopIteration
-            yield self._typecast(val)
+        return self._source.fetchall()
+
+    def fetchcolumns(self):
+        '''Fetch the remaining rows as columns, a list of (values, nulls)
+        pairs. The values of bool, integer, float and timestamp columns
+        are an array.array, timestamps as seconds since the epoch, and
+        of other columns a list; nulls is an array.array('B') which is
+        1 for the NULL rows.'''
+        return self._source.fetchcolumns()
+
+    def fetch_numpy(self, out=None):
+        '''Fetch the remaining rows into NumPy arrays.
+
+        Without out, return a dict of 1-D arrays keyed by column name;
+        columns with NULLs are returned as masked arrays. With out, a
+        preallocated 1-D structured array, fill its fields named like
+        the columns, leave the fields of NULL values as they were, and
+        return the number of rows fetched.
+
+        Bool, integer, float and timestamp (as datetime64[us]) columns
+        are stored by the C module straight into the arrays; the values
+        of other columns are decoded to objects first.'''
+        import numpy
+        source = self._source
+        codes = source.arraycodes()
+        names = [d[0] for d in self.description]
+        count = max(source.rowcount - source.rownumber, 0)
+
+        if out is None:
+            arrays = [code and numpy.zeros(count, numpy_dtypes[code])
+                      for code in codes]
+            targets = [a is not None and (a, 0, a.itemsize) or None
+                       for a in arrays]
+        else:
+            if len(out) < count:
+                raise ValueError('out has room for %d of %d rows'
+                                 % (len(out), count))
+            if not out.flags.c_contiguous:
+                raise ValueError('out must be contiguous')
+            targets = []
+            for name, code in zip(names, codes):
+                field = out.dtype.fields.get(name)
+                if code and field and \
+                   field[0] == numpy.dtype(numpy_dtypes[code]):
+                    targets.append((out, field[1], out.strides[0]))
+                else:
+                    targets.append(None)
+
+        columns = source.fetchinto(targets)
+        if out is not None:
+            for name, (values, nulls) in zip(names, columns):
+                if values is not None and name in out.dtype.fields:
+                    field = out[name][:count]
+                    keep = numpy.frombuffer(nulls, '?')
+                    field[~keep] = numpy.array(values, object)[~keep]
+            return count
+
+        result = {}
+        for name, array, (values, nulls) in zip(names, arrays, columns):
+            if array is None:
+                array = numpy.empty(count, object)
+                array[:] = values
+            nulls = numpy.frombuffer(nulls, '?')
+            if nulls.any():
+                array = numpy.ma.masked_array(array, nulls)
+            result[name] = array
+        return result
+
+    def result_view(self):
+        '''Return a sequence of the rows of the result, which are decoded
+        when they are indexed; slices of it are views too. It does not
+        change which rows are fetched next, and stays valid when the
+        cursor executes another query.'''
+        return self._source.result_view()
+
     def fetchmany(self, size = None):
         if size is None:
-            size = self.arraysize
-        return list(self.__manyiter(size, self._source.fetchone))
+            return self._source.fetchmany()
+        return self._source.fetchmany(size)
 
-    def _typecast(self, row):
-        if row is None:
-            return
-        types = zip(*self.description)[1]
-        casts = self.typecasts
-        return tuple(typecast(t, casts, v) for t, v in zip(types, row))
+    def scroll(self, value, mode='relative'):
+        '''Move the position of the next row fetched by value rows, or to
+        row value with mode 'absolute'. Raises IndexError if there is
+        no such row.'''
+        self._source.scroll(value, mode)
 
     def setinputsizes(self, sizes):
         pass
@@ -357,9 +431,11 @@ class Cursor(object):
     def setoutputsize(self, size, col=0):
         pass
 
-    # iterator support
+    # iterator support; the rows are fetched by the iterator of the
+    # source, which shares the position of fetchone()
     def __iter__(self):
-        return self
+        self._not_closed()
+        return iter(self._source)
     def next(self):
         item = self.fetchone()
         if item is None:
@@ -372,11 +448,53 @@ class Cursor(object):
         return getattr(self._source, name)
 
     def get_arraysize(self):
-        return self._soure.arraysize
+        return self._source.arraysize
     def set_arraysize(self, value):
         self._source.arraysize = value
     arraysize = property(get_arraysize, set_arraysize)
 
+    def get_binary(self):
+        return self._source.binary
+    def set_binary(self, value):
+        self._source.binary = value
+    binary = property(get_binary, set_binary, doc=
+        '''Request results of the following executes in binary format.''')
+
+    def get_typecasts(self):
+        return self._source.typecasts
+    def set_typecasts(self, value):
+        self._source.typecasts = value
+    typecasts = property(get_typecasts, set_typecasts, doc=
+        '''Typecasts by type code or type OID, applied to the values of
+        the fetched rows. Defaults to the typecasts of the connection.''')
+
+    def get_columncasts(self):
+        return self._source.columncasts
+    def set_columncasts(self, value):
+        self._source.columncasts = value
+    columncasts = property(get_columncasts, set_columncasts, doc=
+        '''Typecasts by column index or column name, which take precedence
+        over the typecasts, or None.''')
+
+    def get_rowfactory(self):
+        return self._source.rowfactory
+    def set_rowfactory(self, value):
+        self._source.rowfactory = value
+    rowfactory = property(get_rowfactory, set_rowfactory, doc=
+        '''Maker of the fetched rows: None for tuples, pgsql.Record for
+        records which also have their fields as attributes, or any
+        callable, which is called with the tuple of each row.''')
+
+    def get_intern(self):
+        return self._source.intern
+    def set_intern(self, value):
+        self._source.intern = value
+    intern = property(get_intern, set_intern, doc=
+        '''Share one string object among the equal values of character
+        string columns, for up to 1024 values per column and result:
+        True for all such columns, or a sequence of column indexes and
+        names. Defaults to False.''')
+
 # A cursor class for prepared statements
 class PreparedCursor(Cursor):
     def __init__(self, *args):
@@ -387,7 +505,6 @@ class PreparedCursor(Cursor):
     def execute(self, params=[]):
         #self._start()
         self._not_closed()
-        params = self.connection.encode_params(params)
         ret = self._source.execute(params)
         if isinstance(ret, int):
             return ret
@@ -395,20 +512,42 @@ class PreparedCursor(Cursor):
     def executemany(self, param_seq):
         #self._start()
         self._not_closed()
-        param_seq = (
-            self.connection.encode_params(params)
-            for params in param_seq
-        )
         ret = self._source.executemany(param_seq)
         return self
 
 # A cursor for large SELECTs that uses server side cursors
 class IterCursor(Cursor):
+    '''A cursor which fetches the rows of SELECTs from a server-side
+    cursor, a batch at a time, into a local buffer of rows.
+
+    The first batch has prefetch_rows rows. The batches grow twice as
+    large while a FETCH takes less than prefetch_time seconds, when it
+    costs mostly its round trip, up to as many rows as fit, by the size
+    of the rows fetched so far, in prefetch_memory bytes.
+
+    With background set, the next batch is fetched in a thread while the
+    rows of the current one are used; the connection must not be used
+    otherwise until all the rows are fetched.
+
+    With scrollable set, the server-side cursors of the following
+    executes are declared SCROLL, so that scroll() can move backwards
+    too; otherwise they are NO SCROLL, and can only move forwards, so a
+    scroll past the end leaves them at the end.'''
+
+    prefetch_rows = 16
+    prefetch_time = 0.05
+    prefetch_memory = 4 << 20
+    background = False
+    scrollable = False
+
     def __init__(self, source, *args):
         Cursor.__init__(self, source, *args)
         self.active = 0
         # we need a fairly random name for our cursor executions
         self.name = "c%ss%s" % (hex(abs(id(self))), hex(abs(id(source))))
+        self.__rows = deque()
+        self.__pending = None
+        self.__fetcher = None
 
     def _start(self, operation=None):
         self._cleanup()
@@ -417,10 +556,21 @@ class IterCursor(Cursor):
         Cursor._start(self, operation='insert')
         
     def _cleanup(self):
+        # the errors of a FETCH in the background do not matter anymore
+        if self.__pending is not None:
+            self.__pending[0].join()
+            self.__pending = None
+        self.__rows.clear()
         if self.active and self._source.valid:
             self._source.execute("CLOSE %s" % self.name)
             self.active = 0
 
+    def close(self):
+        Cursor.close(self)
+        if self.__fetcher is not None:
+            self.__fetcher.close()
+            self.__fetcher = None
+
     def execute(self, query, params=[]):
         query = query.strip()
         if not query.lower().startswith("select"):
@@ -428,47 +578,235 @@ class IterCursor(Cursor):
 
         self._start()
         query = encode_sql(query)
-        query = "DECLARE %s NO SCROLL CURSOR WITHOUT HOLD FOR\n%s" \
-                % (self.name, query)
-        params = self.connection.encode_params(params)
+        query = "DECLARE %s %s CURSOR WITHOUT HOLD FOR\n%s" \
+                % (self.name, self.scrollable and "SCROLL" or "NO SCROLL",
+                   query)
 
         ret = self._source.execute(query, params)
         self.active = 1
+        self.__size = self.prefetch_rows
+        self.__done = False
+        # rows fetched from the server-side cursor, the buffered ones too
+        self.__fetched = 0
         return ret
 
-    def __fetchone(self):
-        # if this is not an active cursor, passthrough
-        if self.active:
-            self._source.query("FETCH NEXT FROM %s" % self.name)
+    # the local buffer of rows
+
+    def __fetch(self, source, size):
+        start = timer()
+        source.execute("FETCH %d FROM %s" % (size, self.name))
+        rows = source.fetchall()
+        return rows, size, timer() - start, source.resultsize
+
+    def __background(self, source, size, result):
+        # (True, batch), or (False, exc_info) for the error of the FETCH
+        try:
+            result.append((True, self.__fetch(source, size)))
+        except Exception:
+            result.append((False, sys.exc_info()))
+
+    def __prefetch(self):
+        if self.__fetcher is None:
+            self.__fetcher = self._source.connection.source()
+        # the rows come out of the other source as out of this one
+        for name in ('binary', 'typecasts', 'columncasts', 'rowfactory',
+                     'intern'):
+            setattr(self.__fetcher, name, getattr(self._source, name))
+        result = []
+        thread = threading.Thread(target=self.__background,
+                                  args=(self.__fetcher, self.__size, result))
+        thread.daemon = True
+        self.connection._run_background(thread)
+        self.__pending = thread, result
+
+    def __wait(self):
+        # the result of the FETCH in the background, if any
+        if self.__pending is None:
+            return None
+        thread, result = self.__pending
+        self.__pending = None
+        thread.join()
+        if not result:
+            raise InternalError('background FETCH did not finish')
+        ok, payload = result[0]
+        if not ok:
+            raise payload[0], payload[1], payload[2]
+        return payload
+
+    def __adapt(self, count, elapsed, memory):
+        if count == 0:
+            return
+        size = self.__size
+        if elapsed < self.prefetch_time:
+            size *= 2
+        limit = self.prefetch_memory * count // max(memory, 1)
+        self.__size = max(1, min(size, limit))
+
+    def __refill(self):
+        # adds the next batch to the buffer, if there is one
+        batch = self.__wait()
+        if batch is None:
+            if self.__done:
+                return False
+            batch = self.__fetch(self._source, self.__size)
+        rows, size, elapsed, memory = batch
+        self.__fetched += len(rows)
+        self.__done = len(rows) < size
+        self.__adapt(len(rows), elapsed, memory)
+        if self.background and not self.__done:
+            self.__prefetch()
+        self.__rows.extend(rows)
+        return bool(rows)
+
+    def __rest(self):
+        # the buffered rows, and the rows of the batch being fetched
+        self.__refill_pending()
+        rows = list(self.__rows)
+        self.__rows.clear()
+        return rows
+
+    def __refill_pending(self):
+        batch = self.__wait()
+        if batch is not None:
+            self.__fetched += len(batch[0])
+            self.__done = len(batch[0]) < batch[1]
+            self.__rows.extend(batch[0])
+
+    def __columnar(self):
+        self.__refill_pending()
+        if self.__rows:
+            raise NotSupportedError('columnar fetches need all the rest of '
+                                    'the rows, of which some are buffered')
+        self.__fetchall()
+
     def fetchone(self):
-        self.__fetchone()
-        return Cursor.fetchone(self)
+        if not self.active:
+            return Cursor.fetchone(self)
+        if not self.__rows and not self.__refill():
+            return None
+        return self.__rows.popleft()
 
     def __fetchall(self):
         if self.active:
             self._source.execute("FETCH ALL FROM %s" % self.name)
+            self.__fetched += self._source.rowcount
+            self.__done = True
     def fetchall(self):
-        self.__fetchall()
-        return Cursor.fetchall(self)
+        if not self.active:
+            return Cursor.fetchall(self)
+        rows = self.__rest()
+        if not self.__done:
+            self.__fetchall()
+            rows += Cursor.fetchall(self)
+        return rows
+
+    def fetchcolumns(self):
+        self.__columnar()
+        return Cursor.fetchcolumns(self)
+
+    def fetch_numpy(self, out=None):
+        self.__columnar()
+        return Cursor.fetch_numpy(self, out)
 
-    def __fetchmany(self, size):
+    def result_view(self):
+        self.__columnar()
+        return Cursor.result_view(self)
+
+    def fetchmany(self, size = None):
         if size is None:
             size = self.arraysize
-        if self.active:
-            self._source.execute("FETCH %d FROM %s" % (size, self.name))
-    def fetchmany(self, size = None):
-        self.__fetchmany(size)
-        # if we're a server side cursor, retrieve all the results from the fetch()
-        if self.active:
-            return Cursor.fetchall(self)
-        return Cursor.fetchmany(self, size)
+        if not self.active:
+            return Cursor.fetchmany(self, size)
+        rows = self.__rows
+        while len(rows) < size and self.__refill():
+            pass
+        return [rows.popleft() for i in xrange(min(size, len(rows)))]
+
+    def scroll(self, value, mode='relative'):
+        if not self.active:
+            return Cursor.scroll(self, value, mode)
+        self.__refill_pending()
+        rows = self.__rows
+        position = self.__fetched - len(rows)
+        if mode == 'relative':
+            target = position + value
+        elif mode == 'absolute':
+            target = value
+        else:
+            raise ProgrammingError("unknown scroll mode '%s'." % mode)
+        if target < 0:
+            raise IndexError('scroll out of the result.')
+        if target < position and not self.scrollable:
+            raise NotSupportedError('NO SCROLL cursors cannot move backwards')
+
+        # buffered rows are skipped, and other rows fetched from the row
+        # scrolled to, which tells whether there is one
+        if position <= target < self.__fetched:
+            for i in xrange(target - position):
+                rows.popleft()
+            return
+        rows.clear()
+        self._source.execute("FETCH ABSOLUTE %d FROM %s"
+                             % (target + 1, self.name))
+        found = Cursor.fetchall(self)
+        if not found:
+            # the server-side cursor is past its end now
+            self.__fetched = target + 1
+            self.__done = True
+            if self.scrollable:
+                self._source.execute("MOVE ABSOLUTE %d FROM %s"
+                                     % (position, self.name))
+                self.__fetched = position
+                self.__done = False
+            raise IndexError('scroll out of the result.')
+        rows.extend(found)
+        self.__fetched = target + 1
+        self.__done = False
+
+    def get_rownumber(self):
+        if not self.active:
+            return self._source.rownumber
+        self.__refill_pending()
+        return self.__fetched - len(self.__rows)
+    rownumber = property(get_rownumber, doc=
+        '''The position of the next row fetched in the result.''')
+
+    # iterate over the buffered rows; the rows left when the loop stops
+    # are fetched next by the fetch*()
+    def __iter__(self):
+        if not self.active:
+            return Cursor.__iter__(self)
+        return self.__iterrows()
+    def __iterrows(self):
+        rows = self.__rows
+        while rows or self.__refill():
+            while rows:
+                yield rows.popleft()
+
+# A cursor which reads the rows of a result as the server sends them
+class StreamCursor(Cursor):
+    '''A cursor which streams results: rows are fetched as they arrive
+    from the server, in a single round trip and without keeping the
+    whole result in memory. Until the last row is fetched, or the cursor
+    executes another statement or is closed, the connection cannot run
+    other statements. rowcount is -1 until the last row is fetched.'''
+
+    def execute(self, operation, params=[]):
+        self._start(operation)
+        operation = encode_sql(operation)
+        ret = self._source.stream(operation, params)
+        if isinstance(ret, int):
+            return ret
+        return self
 
 ### connection object
 class Database(object):
     def __init__(self, cnx):
         self.__cnx = cnx
+        # thread running a FETCH of an itercursor in the background
+        self.__background = None
         self.typecasts = default_typecasts.copy()
-        self.typecasts['string'] = self.typecast_string
+        self.typecasts['string'] = cnx.typecast_string
         self.encoding = 'utf-8'
         self.__cnx.execute('BEGIN')
         # for prepared statement cache
@@ -477,6 +815,19 @@ class Database(object):
     def _not_closed(self):
         if self.__cnx is None:
             raise Error('Connection already closed')
+        # the connection runs one statement at a time, so anything else
+        # waits for the FETCH in the background
+        thread = self.__background
+        if thread is not None:
+            self.__background = None
+            thread.join()
+
+    def _run_background(self, thread):
+        '''Start thread, which runs a statement on the connection that
+        other statements wait for.'''
+        self._not_closed()
+        self.__background = thread
+        thread.start()
 
     def __del__(self):
         if self.__cnx is not None:
@@ -484,16 +835,24 @@ class Database(object):
         del self.__cache
         del self.__cnx
 
-    def encode_params(self, params):
-        encoded = []
-        for value in params:
-            if isinstance(value, unicode):
-                value = value.encode(self._encoding)
-            encoded.append(value)
-        return encoded
-
     def typecast_string(self, typ, s):
-        return s.decode(self._encoding)
+        return self.__cnx.typecast_string(typ, s)
+
+    def register_type(self, name, typecast):
+        '''Register ``typecast`` for the values of the type called
+        ``name``, e.g. an enum, domain or extension type.
+
+        The name is resolved like a type name in SQL, so it may be
+        schema-qualified. Returns the OID of the type.'''
+        oid, = self.execute('SELECT %s::regtype::oid', [name]).fetchone()
+        self.typecasts[oid] = typecast
+        return oid
+
+    def reset_types(self):
+        '''Forget the types read from pg_type, so that changes to them,
+        e.g. the attributes of a composite type after ALTER TYPE, are
+        read again when next needed.'''
+        self.__cnx.reset_types()
 
     def close(self):
         # deallocate statements
@@ -528,7 +887,6 @@ class Database(object):
     def execute(self, query, params=[]):
         self._not_closed()
         query = encode_sql(query)
-        params = self.encode_params(params)
         ret = self.__cnx.execute(query, params)
         if isinstance(ret, int):
             return ret
@@ -547,6 +905,13 @@ class Database(object):
         src = self.__cnx.source()
         return IterCursor(src, self)
 
+    def streamcursor(self):
+        '''Create a streaming cursor, which reads the rows of a result as
+        they are fetched, for results too large to keep in memory.'''
+        self._not_closed()
+        src = self.__cnx.source()
+        return StreamCursor(src, self)
+
     def prepare(self, sql):
         '''Create a prepared statement.
 
@@ -567,9 +932,39 @@ class Database(object):
         return self._encoding
     def set_encoding(self, e):
         self.execute('SET SESSION client_encoding = "%s"' % e)
+        self.__cnx.encoding = e
         self._encoding = e
     encoding = property(get_encoding, set_encoding)
 
+    # the encoder of dict and list parameters
+    def get_json_dumps(self):
+        return self.__cnx.json_dumps
+    def set_json_dumps(self, dumps):
+        self.__cnx.json_dumps = dumps
+    json_dumps = property(get_json_dumps, set_json_dumps)
+
+    def get_binary(self):
+        return self.__cnx.binary
+    def set_binary(self, value):
+        self.__cnx.binary = value
+    binary = property(get_binary, set_binary, doc=
+        '''Request results in binary format from cursors created after
+        this is set.
+
+        Binary results are decoded straight from their wire format,
+        instead of being printed as text by the server and parsed again
+        by the client. The typecasts of types decoded this way are given
+        the decoded value.''')
+
+    def get_memory_budget(self):
+        return self.__cnx.memory_budget
+    def set_memory_budget(self, value):
+        self.__cnx.memory_budget = value
+    memory_budget = property(get_memory_budget, set_memory_budget, doc=
+        '''The memory, in bytes, the rows of a result may take before they
+        are spilled to a memory-mapped temporary file, or None (the
+        default) for no limit.''')
+
     def copy_in(self, sql_stmt, iterable):
         '''Execute a postgresql COPY IN statement.
 
@@ -635,12 +1030,86 @@ class Binary:
     __binary__ = True
     __pgsql_typeoid__ = BYTEA_TYPE_OID
     def __init__(self, s):
-        self.value = str(s)
+        # buffers are sent as they are, without a copy
+        if not isinstance(s, buffer):
+            s = str(s)
+        self.value = s
     def __str__(self):
-        return self.value
+        return str(self.value)
     def __repr__(self):
         return 'Binary(%r)' % self.value
 
+# the value of a Binary is sent as it is, without the copy str() makes
+register_adapter(Binary, lambda binary: binary.value, BYTEA_TYPE_OID, True)
+
+class Json:
+    '''Wrapper for values sent as json, which dicts and lists are sent as.
+    Their type is left to the server to infer, so that they can be used
+    as json and jsonb values alike.'''
+    __pgsql_typeoid__ = 0
+    def __init__(self, value, dumps=json.dumps):
+        self.value = value
+        self.dumps = dumps
+    def __str__(self):
+        return self.dumps(self.value)
+    def __repr__(self):
+        return 'Json(%r)' % (self.value,)
+
+def _range_bound(value):
+    if value is None:
+        return ''
+    s = str(value)
+    if not s or re.search(r'[\s"\\,()\[\]]', s):
+        s = '"%s"' % s.replace('\\', '\\\\').replace('"', '\\"')
+    return s
+
+class Range(tuple):
+    '''I am a PostgreSQL range, with a lower and upper bound, either of
+    which is None when unbounded, and the bounds' inclusiveness as in
+    '[)'. Empty ranges have the bounds 'empty'.'''
+    __slots__ = ()
+    __pgsql_typeoid__ = 0
+
+    def __new__(cls, lower=None, upper=None, bounds='[)'):
+        if bounds not in ('[)', '(]', '[]', '()', 'empty'):
+            raise ValueError('invalid range bounds: %r' % (bounds,))
+        if bounds == 'empty':
+            lower = upper = None
+        return tuple.__new__(cls, (lower, upper, bounds))
+
+    lower = property(lambda self: self[0])
+    upper = property(lambda self: self[1])
+    bounds = property(lambda self: self[2])
+    isempty = property(lambda self: self[2] == 'empty')
+    lower_inc = property(lambda self: self[2][0] == '[' and
+                                      self[0] is not None)
+    upper_inc = property(lambda self: self[2][-1] == ']' and
+                                      self[1] is not None)
+    lower_inf = property(lambda self: self[0] is None and not self.isempty)
+    upper_inf = property(lambda self: self[1] is None and not self.isempty)
+
+    def __str__(self):
+        if self.isempty:
+            return 'empty'
+        return '%s%s,%s%s' % (self[2][0], _range_bound(self[0]),
+                              _range_bound(self[1]), self[2][1])
+
+    def __repr__(self):
+        if self.isempty:
+            return 'Range(bounds=%r)' % (self[2],)
+        return 'Range(%r, %r, %r)' % self
+
+class Multirange(tuple):
+    '''I am a PostgreSQL multirange, a tuple of Range instances.'''
+    __slots__ = ()
+    __pgsql_typeoid__ = 0
+
+    def __str__(self):
+        return '{%s}' % ','.join([str(r) for r in self])
+
+    def __repr__(self):
+        return 'Multirange(%s)' % tuple.__repr__(self)
+
 def DateFromTicks(ticks):
     return apply(Date, localtime(ticks)[:3])
 def TimeFromTicks(ticks):
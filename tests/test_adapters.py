@@ -0,0 +1,108 @@
+from prelude import assert_eq
+from decimal import Decimal
+import gc
+import struct
+import weakref
+from pgsql import register_adapter, pg_typed_value, ProgrammingError
+
+INT4OID = 23
+NUMERICOID = 1700
+
+class Point(object):
+    def __init__(self, x, y):
+        self.x, self.y = x, y
+
+class Point3(Point):
+    pass
+
+class Quoted:
+    __pgsql_typeoid__ = 25
+    def __pgquote__(self):
+        return 'quoted'
+
+def select(value):
+    cu.execute('SELECT %s, pg_typeof(%s)::text', [value, value])
+    return cu.fetchone()
+
+def test_text_adapter():
+    register_adapter(Point, lambda p: '(%s,%s)' % (p.x, p.y), 600)
+    try:
+        assert_eq(select(Point(1, 2)), (u'(1,2)', u'point'))
+        # subclasses have the adapter of their base class
+        assert_eq(select(Point3(3, 4)), (u'(3,4)', u'point'))
+    finally:
+        register_adapter(Point, None)
+    cu.execute('SELECT %s::text', [Point(1, 2)])
+    assert cu.fetchone()[0].startswith('<')
+
+def test_binary_adapter():
+    register_adapter(Point, lambda p: struct.pack('!i', p.x), INT4OID, True)
+    try:
+        assert_eq(select(Point(42, 0)), (42, u'integer'))
+        # a binary value is not sent for a parameter of another type
+        select_text = cnx.prepare('SELECT length(%s)')
+        select_text.execute([Point(1, 2)])
+        assert select_text.fetchone()[0] > 4
+    finally:
+        register_adapter(Point, None)
+
+def test_binary_needs_oid():
+    try:
+        register_adapter(Point, str, 0, True)
+    except ProgrammingError:
+        pass
+    else:
+        assert False, 'no error'
+
+def test_builtin_override():
+    register_adapter(float, repr, NUMERICOID)
+    try:
+        assert_eq(select(0.1), (Decimal('0.1'), u'numeric'))
+    finally:
+        register_adapter(float, None)
+    assert_eq(select(0.1), (0.1, u'double precision'))
+
+def test_objects():
+    assert_eq(select(Quoted()), (u'quoted', u'text'))
+    assert_eq(select(pg_typed_value(869, '10.0.0.1'))[1], u'inet')
+
+class Typed(object):
+    def __init__(self, value, oid):
+        self.value = value
+        self.__pgsql_typeoid__ = oid
+    def __str__(self):
+        return self.value
+
+def test_instance_attributes():
+    assert_eq(select(Typed('10.0.0.1', 869)), (u'10.0.0.1', u'inet'))
+    assert_eq(select(Typed('7', INT4OID)), (7, u'integer'))
+
+def test_attributes_added():
+    class Late(object):
+        pass
+    cu.execute('SELECT %s::text', [Late()])
+    assert cu.fetchone()[0].startswith('<')
+    Late.__pgquote__ = lambda self: 'late'
+    cu.execute('SELECT %s::text', [Late()])
+    assert_eq(cu.fetchone(), (u'late',))
+
+def test_classes_freed():
+    cls = type('Dynamic', (object,), {'__pgquote__': lambda self: 'd'})
+    ref = weakref.ref(cls)
+    cu.execute('SELECT %s::text', [cls()])
+    assert_eq(cu.fetchone(), (u'd',))
+    del cls
+    gc.collect()
+    assert ref() is None
+
+def test_executemany():
+    cu.execute('CREATE TEMPORARY TABLE t (v text)')
+    rows = [[1], [Point(1, 2)], [Point3(3, 4)], [None], [1.5], [Quoted()]]
+    register_adapter(Point, lambda p: 'p%s' % p.x)
+    try:
+        cu.executemany('INSERT INTO t VALUES (%s)', rows)
+    finally:
+        register_adapter(Point, None)
+    cu.execute('SELECT v FROM t')
+    assert_eq(cu.fetchall(), [(u'1',), (u'p1',), (u'p3',), (None,),
+                              (u'1.5',), (u'quoted',)])
@@ -1,3 +1,5 @@
+import warnings
+
 def check(sql, expected, etype=None):
     value, = cnx.execute('SELECT ARRAY[%s]' % sql).fetchone()
     assert isinstance(value, list), `type(value)`
@@ -31,3 +33,74 @@ def test_str_comma():
 
 def test_str_newline():
     check("'\n'", ['\n'], unicode)
+
+def test_str_embedded_quote():
+    check("'a\"b,c', '{x}', ' y '", [u'a"b,c', u'{x}', u' y '], unicode)
+
+def test_str_null():
+    check("'NULL', NULL", [u'NULL', None], unicode)
+
+def test_bigint():
+    check('42::bigint, (2^40)::bigint', [42, 2**40], (int, long))
+
+def test_float():
+    check('1.5::float8, -2.25::float8', [1.5, -2.25], float)
+
+def test_numeric():
+    from decimal import Decimal
+    check('1.50, NULL, -3', [Decimal('1.50'), None, Decimal('-3')], Decimal)
+
+def test_timestamp():
+    from datetime import datetime
+    check("'2009-01-02 03:04:05'::timestamp",
+          [datetime(2009, 1, 2, 3, 4, 5)], datetime)
+
+def test_uuid():
+    from uuid import UUID
+    u = UUID('12345678-1234-5678-1234-567812345678')
+    check("'%s'::uuid" % u, [u], UUID)
+
+def test_multidimensional():
+    check('ARRAY[1, 2], ARRAY[3, NULL]', [[1, 2], [3, None]], list)
+    value, = cnx.execute("SELECT '{{{a}},{{\"b c\"}}}'::text[]").fetchone()
+    assert value == [[[u'a']], [[u'b c']]], `value`
+
+def test_lower_bound():
+    value, = cnx.execute("SELECT '[0:1]={7,8}'::int[]").fetchone()
+    assert value == [7, 8], `value`
+
+def test_binary():
+    cnx.binary = True
+    cu = cnx.cursor()
+    value, = cu.execute("SELECT ARRAY[ARRAY[1, NULL], ARRAY[3, 4]]").fetchone()
+    assert value == [[1, None], [3, 4]], `value`
+    value, = cu.execute("SELECT ARRAY['a\"b', 'c']").fetchone()
+    assert value == [u'a"b', u'c'], `value`
+    value, = cu.execute("SELECT '{}'::float8[]").fetchone()
+    assert value == [], `value`
+
+def test_array_typecast():
+    cnx.typecasts[1007] = lambda typ, value: str(value)
+    value, = cnx.execute('SELECT ARRAY[1, 2]').fetchone()
+    assert value == '{1,2}', `value`
+
+def test_delimiter():
+    # box elements are separated by ';', as they contain commas
+    warnings.simplefilter('ignore')
+    try:
+        value, = cnx.execute("SELECT '{\"(1,1),(0,0)\";\"(2,2),(1,1)\"}'"
+                             "::box[]").fetchone()
+    finally:
+        warnings.resetwarnings()
+    assert map(str, value) == ['(1,1),(0,0)', '(2,2),(1,1)'], `value`
+
+def test_vectors():
+    # int2vector and oidvector have an element type, but are no arrays
+    cnx.binary = False
+    warnings.simplefilter('ignore')
+    try:
+        value = cnx.execute("SELECT '1 2'::int2vector, '23 25'::oidvector"
+                            ).fetchone()
+    finally:
+        warnings.resetwarnings()
+    assert map(str, value) == ['1 2', '23 25'], `value`
@@ -0,0 +1,128 @@
+from prelude import assert_eq
+from datetime import date, time, datetime, timedelta
+from decimal import Decimal
+from uuid import UUID
+from pgsql import interval, tzoffset, pg_typed_value
+
+def check(sql, expected, etype=None):
+    cnx.binary = True
+    value, = cnx.execute('SELECT %s' % sql).fetchone()
+    if etype:
+        assert isinstance(value, etype), \
+               '%s is not %s' % (type(value), etype)
+    assert_eq(value, expected)
+
+def test_attribute():
+    assert not cnx.binary
+    assert not cu.binary
+    cnx.binary = True
+    assert cnx.binary
+    assert cnx.cursor().binary
+    assert not cu.binary
+    cu.binary = True
+    assert cu.binary
+
+def test_cursor():
+    cu.binary = True
+    cu.execute('SELECT %s, %s', [42, 'abc'])
+    assert_eq(cu.fetchone(), (42, u'abc'))
+
+def test_bool():
+    check('true', True, bool)
+    check('false', False, bool)
+
+def test_int():
+    check('42::smallint', 42, int)
+    check('-42', -42, int)
+    check('42::bigint', 42, (int, long))
+    check('(2^62)::bigint', 2**62, (int, long))
+    check('-(2^62)::bigint', -2**62, (int, long))
+    check('42::oid', 42, (int, long))
+
+def test_float():
+    check('1.5::real', 1.5, float)
+    check('1e300::double precision', 1e300, float)
+    check('-1e-9::double precision', -1e-9, float)
+
+def test_numeric():
+    check('0::numeric', Decimal('0'), Decimal)
+    check('1.50::numeric', Decimal('1.50'), Decimal)
+    check('-0.0001::numeric', Decimal('-0.0001'), Decimal)
+    check('12345678.000000001::numeric',
+          Decimal('12345678.000000001'), Decimal)
+    check('100000000::numeric', Decimal('100000000'), Decimal)
+    value, = cnx.execute("SELECT 'NaN'::numeric").fetchone()
+    assert value.is_nan()
+
+def test_text():
+    check("'abc'::text", u'abc', unicode)
+    check("'abc'::varchar", u'abc', unicode)
+
+def test_bytea():
+    check("'\\x00f8'::bytea", '\x00\xf8', str)
+
+def test_uuid():
+    u = UUID('12345678-1234-5678-1234-567812345678')
+    check("'%s'::uuid" % u, u, UUID)
+
+def test_date():
+    check("'1979-07-07'::date", date(1979, 7, 7), date)
+    check("'1900-02-28'::date", date(1900, 2, 28), date)
+
+def test_timestamp():
+    check("'1979-07-07 22:00:12.33'::timestamp",
+          datetime(1979, 7, 7, 22, 0, 12, 330000), datetime)
+    check("'1969-12-31 23:59:59'::timestamp",
+          datetime(1969, 12, 31, 23, 59, 59), datetime)
+
+def test_out_of_range():
+    # Python has no dates before year 1 or after year 9999
+    check("'9999-12-31 23:59:59.999999'::timestamp",
+          datetime(9999, 12, 31, 23, 59, 59, 999999), datetime)
+    check("'0001-01-01'::date", date(1, 1, 1), date)
+    for sql in ["'10000-01-01'::timestamp", "'12000-01-01'::date",
+                "'294276-12-31'::timestamp", "'0001-12-31 BC'::date",
+                "'4713-01-01 BC'::timestamptz"]:
+        try:
+            check(sql, None)
+        except ValueError:
+            pass
+        else:
+            assert False, '%s decoded' % sql
+
+def test_time():
+    check("'22:00:12.33'::time", time(22, 0, 12, 330000), time)
+    # Python has no time 24:00:00
+    for sql in ["'24:00:00'::time", "'24:00:00+02'::timetz"]:
+        try:
+            check(sql, None)
+        except ValueError:
+            pass
+        else:
+            assert False, '%s decoded' % sql
+
+def test_inet():
+    # as their text, as in text mode
+    for sql, text in [("'1.2.3.4'::inet", '1.2.3.4'),
+                      ("'10.0.0.0/8'::inet", '10.0.0.0/8'),
+                      ("'1.2.3.4/32'::cidr", '1.2.3.4/32'),
+                      ("'2001:db8::/32'::cidr", '2001:db8::/32'),
+                      ("'fe80::1'::inet", 'fe80::1')]:
+        check(sql, text, pg_typed_value)
+
+def test_money():
+    check("'1.5'::money", 1.5, float)
+    check("'-1234.56'::money", -1234.56, float)
+
+def test_interval():
+    check("'1 year 2 mons 3 days'::interval",
+          interval(years=1, months=2, days=3), interval)
+    check("'12:34:56.789'::interval",
+          interval(hours=12, minutes=34, seconds=56, microseconds=789000))
+    check("'-1 days -01:00:00'::interval", interval(days=-1, hours=-1))
+
+def test_timestamp_with_time_zone():
+    check("'1979-07-07 22:00:00+02'::timestamptz",
+          datetime(1979, 7, 7, 20, tzinfo=tzoffset(0)), datetime)
+    value, = cnx.execute("SELECT '22:00:00+02'::timetz").fetchone()
+    assert_eq(value.utcoffset(), timedelta(hours=2))
@@ -0,0 +1,105 @@
+import os
+from prelude import assert_eq
+from pgsql import NotSupportedError, OperationalError, ProgrammingError
+
+SQL = 'SELECT i, repeat(%s, i % 7), NULLIF(i % 3, 0) FROM generate_series(1, 3000) AS i'
+ROWS = [(i, u'x' * (i % 7), i % 3 or None) for i in range(1, 3001)]
+
+def test_attribute():
+    assert cnx.memory_budget is None
+    cnx.memory_budget = 1 << 20
+    assert_eq(cnx.memory_budget, 1 << 20)
+    cnx.memory_budget = None
+    assert cnx.memory_budget is None
+    try:
+        cnx.memory_budget = 0
+    except ValueError:
+        pass
+    else:
+        assert False, 'no error'
+
+def test_within_budget():
+    cnx.memory_budget = 1 << 24
+    cu.execute(SQL, ['x'])
+    assert_eq(cu.rowcount, 3000)
+    assert_eq(cu.fetchall(), ROWS)
+    cu.execute(SQL, ['x'])
+    values, nulls = cu.fetchcolumns()[0]
+    assert_eq(list(values), range(1, 3001))
+    assert_eq(cu.execute('CREATE TEMPORARY TABLE b(i integer)'), -1)
+    assert_eq(cu.execute('INSERT INTO b VALUES (1), (2)'), 2)
+
+def test_scroll_within_budget():
+    cnx.memory_budget = 1 << 24
+    cu.execute(SQL, ['x'])
+    assert_eq(cu.fetchmany(300), ROWS[:300])
+    cu.scroll(-100)
+    assert_eq(cu.rownumber, 200)
+    assert_eq(cu.fetchone(), ROWS[200])
+    cu.scroll(2900, 'absolute')
+    assert_eq(cu.fetchall(), ROWS[2900:])
+    assert_eq(cu.rowcount, 3000)
+
+def test_no_rows():
+    cnx.memory_budget = 4096
+    cu.execute('SELECT 1 WHERE false')
+    assert_eq(cu.rowcount, 0)
+    assert_eq(cu.fetchall(), [])
+    assert_eq(cu.execute('CREATE TEMPORARY TABLE b(i integer)'), -1)
+    try:
+        cu.execute('')
+    except ValueError:
+        pass
+    else:
+        assert False, 'no error'
+
+def test_spilled():
+    cnx.memory_budget = 4096
+    cu.execute(SQL, ['x'])
+    assert_eq(cu.rowcount, 3000)
+    assert_eq([d[0] for d in cu.description], ['i', 'repeat', 'nullif'])
+    assert_eq(cu.fetchone(), ROWS[0])
+    assert_eq(cu.fetchmany(500), ROWS[1:501])
+    assert_eq(list(cu), ROWS[501:])
+    assert_eq(cu.fetchone(), None)
+    cu.execute(SQL, ['x'])
+    assert_eq(cu.fetchall(), ROWS)
+    try:
+        cu.result_view()
+    except NotSupportedError:
+        pass
+    else:
+        assert False, 'no error'
+
+def test_spilled_binary():
+    cnx.memory_budget = 4096
+    cu.binary = True
+    cu.execute("SELECT i, '\\x00ff'::bytea, NULL::text FROM generate_series(1, 1000) AS i")
+    assert_eq(cu.fetchall(), [(i, '\x00\xff', None) for i in range(1, 1001)])
+
+def test_error():
+    cnx.memory_budget = 4096
+    try:
+        cu.execute('SELECT 1 / (2000 - i) FROM generate_series(1, 3000) AS i')
+    except ProgrammingError:
+        pass
+    else:
+        assert False, 'no error'
+
+def test_spill_error():
+    cnx.memory_budget = 4096
+    tmpdir = os.environ.get('TMPDIR')
+    os.environ['TMPDIR'] = '/nonexistent/pgsql'
+    try:
+        cu.execute(SQL, ['x'])
+    except OperationalError, e:
+        assert 'No such file' in str(e), str(e)
+    else:
+        assert False, 'no error'
+    finally:
+        if tmpdir is None:
+            del os.environ['TMPDIR']
+        else:
+            os.environ['TMPDIR'] = tmpdir
+    cu.execute('SELECT 1')
+    assert_eq(cu.fetchall(), [(1,)])
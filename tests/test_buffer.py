@@ -0,0 +1,51 @@
+from prelude import assert_eq
+from pgsql import Binary, typecast_buffer
+
+def test_bytea():
+    cu.binary = True
+    cu.typecasts = {'binary': typecast_buffer}
+    cu.execute("SELECT '\\x00f8'::bytea, NULL::bytea")
+    value, null = cu.fetchone()
+    assert isinstance(value, buffer)
+    assert_eq(str(value), '\x00\xf8')
+    assert null is None
+
+def test_text():
+    cu.typecasts = {'string': typecast_buffer}
+    cu.execute("SELECT 'abc'::text, 'de'::varchar")
+    a, b = cu.fetchone()
+    assert isinstance(a, buffer)
+    assert_eq(str(a), 'abc')
+    assert_eq(str(b), 'de')
+
+def test_text_bytea():
+    # escaped in text format, so it is decoded into a copy
+    cu.typecasts = {'binary': typecast_buffer}
+    cu.execute("SELECT '\\x00f8'::bytea")
+    value, = cu.fetchone()
+    assert isinstance(value, buffer)
+    assert_eq(str(value), '\x00\xf8')
+
+def test_outlives_result():
+    cu.binary = True
+    cu.typecasts = {'binary': typecast_buffer}
+    cu.execute("SELECT decode(repeat('ab', 1000), 'hex')")
+    value, = cu.fetchone()
+    cu.execute("SELECT 1")
+    cu.fetchall()
+    cu.close()
+    assert_eq(str(value), '\xab' * 1000)
+
+def test_record_field():
+    cu.binary = True
+    cu.typecasts = {'string': typecast_buffer}
+    cu.execute("SELECT ROW('abc'::text, 1)")
+    (value, n), = cu.fetchone()
+    assert_eq(str(value), 'abc')
+
+def test_params():
+    data = ''.join(map(chr, range(256)))
+    for param in [buffer(data), Binary(data), Binary(buffer(data))]:
+        cu.execute('SELECT %s::bytea', [param])
+        value, = cu.fetchone()
+        assert_eq(str(value), data)
@@ -0,0 +1,52 @@
+from prelude import assert_eq
+from decimal import Decimal
+
+def test_default():
+    assert cu.typecasts is cnx.typecasts
+    assert cu.columncasts is None
+
+def test_by_index():
+    cu.columncasts = {1: lambda typ, value: (typ, value)}
+    row = cu.execute("SELECT 1, 2, 'x'").fetchone()
+    assert_eq(row, (1, ('integer', 2), u'x'))
+
+def test_by_name():
+    cu.columncasts = {'b': dbapi.typecast_numeric_float}
+    row = cu.execute('SELECT 1.5 AS a, 2.5 AS b').fetchone()
+    assert_eq(row, (Decimal('1.5'), 2.5))
+    assert isinstance(row[1], float)
+
+def test_disable():
+    cu.columncasts = {0: None}
+    row = cu.execute("SELECT '2001-02-03'::date").fetchone()
+    assert_eq(row, ('2001-02-03',))
+
+def test_by_oid():
+    casts = cnx.typecasts.copy()
+    casts[23] = lambda typ, value: -value
+    cu.typecasts = casts
+    row = cu.execute('SELECT 1, 2::smallint').fetchone()
+    assert_eq(row, (-1, 2))
+
+def test_change_while_fetching():
+    cu.execute('SELECT generate_series(1, 3)')
+    assert_eq(cu.fetchone(), (1,))
+    cu.columncasts = {0: lambda typ, value: str(value)}
+    assert_eq(cu.fetchall(), [('2',), ('3',)])
+
+def test_null():
+    cu.columncasts = {0: lambda typ, value: 42}
+    assert_eq(cu.execute('SELECT NULL::integer').fetchone(), (None,))
+
+def test_description_cached():
+    cu.execute('SELECT 1 AS a')
+    assert cu.description is cu.description
+    cu.execute('SELECT 1 AS b')
+    assert_eq(cu.description[0][0], 'b')
+
+def test_bad_columncasts():
+    try:
+        cu.columncasts = [None]
+        raise AssertionError('columncasts must be a dict')
+    except TypeError:
+        pass
@@ -0,0 +1,63 @@
+from prelude import assert_eq
+from array import array
+from datetime import datetime
+from decimal import Decimal
+
+SQL = '''SELECT i, i::smallint, i::bigint, i::real, i::float8, i % 2 = 0,
+                '1970-01-02 00:00:01'::timestamp + i * interval '1 second',
+                i::numeric, i::text
+         FROM (VALUES (1), (NULL), (3)) AS t (i)'''
+
+def check_columns(columns):
+    ints, smallints, bigints, reals, floats, bools, stamps, nums, texts \
+        = columns
+    assert_eq(ints[0], array('i', [1, 0, 3]))
+    assert_eq(smallints[0], array('h', [1, 0, 3]))
+    assert_eq(bigints[0].tolist(), [1, 0, 3])
+    assert_eq(reals[0], array('f', [1, 0, 3]))
+    assert_eq(floats[0], array('d', [1, 0, 3]))
+    assert_eq(bools[0], array('B', [0, 0, 0]))
+    assert_eq(stamps[0], array('d', [86402, 0, 86404]))
+    assert_eq(nums[0], [Decimal(1), None, Decimal(3)])
+    assert_eq(texts[0], [u'1', None, u'3'])
+    for values, nulls in columns:
+        assert_eq(nulls, array('B', [0, 1, 0]))
+
+def test_text():
+    cu.execute(SQL)
+    check_columns(cu.fetchcolumns())
+
+def test_binary():
+    cu.binary = True
+    cu.execute(SQL)
+    check_columns(cu.fetchcolumns())
+
+def test_remaining():
+    cu.execute('SELECT generate_series(1, 5)')
+    cu.fetchone()
+    (values, nulls), = cu.fetchcolumns()
+    assert_eq(values, array('i', [2, 3, 4, 5]))
+    (values, nulls), = cu.fetchcolumns()
+    assert_eq(values, array('i'))
+
+def test_timestamptz():
+    for binary in False, True:
+        cu.binary = binary
+        cu.execute("SELECT '1970-01-01 02:00:00+02'::timestamptz, "
+                   "'infinity'::timestamp")
+        (stamp, nulls), (inf, nulls) = cu.fetchcolumns()
+        assert_eq(stamp, array('d', [0]))
+        assert_eq(inf, array('d', [float('inf')]))
+
+def test_typecast():
+    cu.execute('SELECT 1, 2')
+    cu.columncasts = {1: lambda typ, value: value * 10}
+    (a, nulls), (b, nulls) = cu.fetchcolumns()
+    assert_eq(a, array('i', [1]))
+    assert_eq(b, [20])
+
+def test_itercursor():
+    cu = cnx.itercursor()
+    cu.execute('SELECT generate_series(1, 3)')
+    (values, nulls), = cu.fetchcolumns()
+    assert_eq(values, array('i', [1, 2, 3]))
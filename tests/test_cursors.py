@@ -11,8 +11,6 @@ def try_cursor_fetch(cursor, sql):
     assert cursor.fetchone() == (42,)
     assert cursor.fetchone() == None
 
-    # FIXME - test that fetchmany obeys arraysize
-    # FIXME - test that fetchmany obeys size-argument
     cursor.execute(sql)
     assert cursor.fetchmany() == [(42,)]
     assert cursor.fetchmany() == []
@@ -31,12 +29,37 @@ def try_cursor_executemany(cursor):
     cursor.executemany('INSERT INTO x(i) VALUES(%s)', executemany_rows)
     assert_executemany()
 
+def try_cursor_fetchmany(cursor):
+    sql = 'SELECT i FROM generate_series(1, 5) AS i'
+    cursor.execute(sql)
+    assert_eq(cursor.fetchmany(2), [(1,), (2,)])
+    cursor.arraysize = 2
+    assert_eq(cursor.arraysize, 2)
+    assert_eq(cursor.fetchmany(), [(3,), (4,)])
+    assert_eq(cursor.fetchmany(), [(5,)])
+    assert_eq(cursor.fetchmany(), [])
+
+    cursor.execute(sql)
+    assert_eq(cursor.fetchone(), (1,))
+    assert_eq(list(cursor), [(2,), (3,), (4,), (5,)])
+    assert_eq(list(cursor), [])
+
+    cursor.arraysize = 3
+    cursor.execute(sql)
+    for row in cursor:
+        if row == (2,):
+            break
+    assert_eq(cursor.fetchone(), (3,))
+    cursor.close()
+
 def test_cursor():
     try_cursor_fetch(cnx.cursor(), 'SELECT 42')
+    try_cursor_fetchmany(cnx.cursor())
     try_cursor_executemany(cnx.cursor())
 
 def test_itercursor():
     try_cursor_fetch(cnx.itercursor(), 'SELECT 42')
+    try_cursor_fetchmany(cnx.itercursor())
     try_cursor_executemany(cnx.itercursor())
 
 def test_prepared():
@@ -13,3 +13,24 @@ def test_latin1():
     cnx.encoding = 'latin-1'
     roundtrip_value(cu, 'x', 'abc')
     roundtrip_value(cu, 'x', u'\xef')
+
+def test_latin1_decoded():
+    cnx.encoding = 'latin-1'
+    cu.execute("INSERT INTO x VALUES(%s)", [u'\xef'])
+    value, = cu.execute('SELECT a FROM x').fetchone()
+    assert value == u'\xef', `value`
+    assert cnx.typecast_string('string', '\xef') == u'\xef'
+
+def test_raw_strings():
+    cnx.typecasts['string'] = None
+    cu.execute("INSERT INTO x VALUES(%s)", [u'\xef'])
+    value, = cu.execute('SELECT a FROM x').fetchone()
+    assert value == '\xc3\xaf', `value`
+
+def test_typecast_string():
+    assert cnx.typecast_string('string', '\xc3\xaf') == u'\xef'
+    try:
+        cnx.typecast_string('string', '\xff')
+        raise AssertionError('invalid UTF-8 decoded')
+    except UnicodeDecodeError:
+        pass
@@ -0,0 +1,72 @@
+from prelude import assert_eq
+
+SQL = '''SELECT 'status ' || (i % 3), i::text, ('x' || (i % 2))::varchar
+         FROM generate_series(1, 9) AS i'''
+
+def test_default():
+    assert not cu.intern
+    cu.execute(SQL)
+    rows = cu.fetchall()
+    assert rows[0][0] is not rows[3][0]
+
+def test_all():
+    cu.intern = True
+    cu.execute(SQL)
+    rows = cu.fetchall()
+    assert_eq(rows[0][0], u'status 1')
+    assert rows[0][0] is rows[3][0]
+    assert rows[0][2] is rows[2][2]
+    assert rows[0][1] is not rows[3][1]
+
+def test_columns():
+    cu.intern = [2]
+    cu.execute(SQL)
+    rows = cu.fetchall()
+    assert rows[0][0] is not rows[3][0]
+    assert rows[0][2] is rows[2][2]
+
+def test_column_names():
+    cu.intern = ['status']
+    cu.execute("SELECT 'a'::text AS status, 'b'::text AS other "
+               "FROM generate_series(1, 2)")
+    rows = cu.fetchall()
+    assert rows[0][0] is rows[1][0]
+    assert rows[0][1] is not rows[1][1]
+
+def test_binary():
+    cu.binary = True
+    cu.intern = True
+    cu.execute(SQL)
+    rows = cu.fetchall()
+    assert_eq(rows[0][0], u'status 1')
+    assert rows[0][0] is rows[3][0]
+
+def test_bytes():
+    cu.intern = True
+    cu.typecasts = dict(cu.typecasts, string=None)
+    cu.execute(SQL)
+    rows = cu.fetchall()
+    assert_eq(rows[0][0], 'status 1')
+    assert rows[0][0] is rows[3][0]
+
+def test_typecast():
+    cu.intern = True
+    cu.columncasts = {0: lambda typ, value: value}
+    cu.execute(SQL)
+    rows = cu.fetchall()
+    assert rows[0][0] is not rows[3][0]
+
+def test_null():
+    cu.intern = True
+    cu.execute("SELECT NULL::text, ''::text FROM generate_series(1, 2)")
+    rows = cu.fetchall()
+    assert_eq(rows[0], (None, u''))
+    assert rows[0][1] is rows[1][1]
+
+def test_bounded():
+    cu.intern = True
+    cu.execute('SELECT (i % 2000)::text FROM generate_series(0, 3999) AS i')
+    rows = cu.fetchall()
+    assert rows[1][0] is rows[2001][0]
+    assert rows[1999][0] is not rows[3999][0]
+    assert_eq(rows[1999][0], rows[3999][0])
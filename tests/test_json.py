@@ -0,0 +1,59 @@
+from prelude import assert_eq
+import json
+
+create_statements = [
+    'CREATE TEMPORARY TABLE j(a json, b jsonb)',
+]
+
+doc = {u'a': [1, 2.5, None, True], u'b': {u'c': u'd'}}
+
+def test_json():
+    value, = cnx.execute('''SELECT '{"a": [1, null]}'::json''').fetchone()
+    assert_eq(value, {u'a': [1, None]})
+
+def test_jsonb():
+    value, = cnx.execute('''SELECT '[1, "x"]'::jsonb''').fetchone()
+    assert_eq(value, [1, u'x'])
+
+def test_roundtrip():
+    cu.execute('INSERT INTO j VALUES(%s, %s)', [doc, [doc]])
+    row = cu.execute('SELECT a, b FROM j').fetchone()
+    assert_eq(row, (doc, [doc]))
+
+def test_array():
+    value, = cnx.execute('''SELECT ARRAY['1', '{"a": 2}']::jsonb[]''').fetchone()
+    assert_eq(value, [1, {u'a': 2}])
+
+def test_binary():
+    cnx.binary = True
+    cu = cnx.cursor()
+    cu.execute('INSERT INTO j VALUES(%s, %s)', [doc, doc])
+    assert_eq(cu.execute('SELECT a, b FROM j').fetchone(), (doc, doc))
+
+def test_loads():
+    loads = lambda text: ('parsed', text)
+    cnx.typecasts['json'] = dbapi.json_typecast(loads)
+    value, = cnx.execute('''SELECT '{}'::jsonb''').fetchone()
+    assert_eq(value, ('parsed', '{}'))
+
+def test_lazy():
+    calls = []
+    def loads(text):
+        calls.append(text)
+        return json.loads(text)
+    cnx.typecasts['json'] = dbapi.json_typecast(loads, lazy=True)
+    rows = cnx.execute('''SELECT ('{"n": ' || i || '}')::jsonb
+                          FROM generate_series(1, 3) AS i''').fetchall()
+    assert_eq(calls, [])
+    assert isinstance(rows[1][0], dbapi.lazyjson)
+    assert_eq(rows[1][0]['n'], 2)
+    assert_eq(rows[1][0], {u'n': 2})
+    assert_eq(len(calls), 1)
+
+def test_lazy_parameter():
+    cnx.typecasts['json'] = dbapi.json_typecast(lazy=True)
+    cu.execute('INSERT INTO j(b) VALUES(%s)', [doc])
+    value, = cu.execute('SELECT b FROM j').fetchone()
+    cu.execute('INSERT INTO j(b) VALUES(%s)', [value])
+    rows = cu.execute('SELECT b FROM j').fetchall()
+    assert_eq(rows[1][0], doc)
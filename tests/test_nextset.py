@@ -0,0 +1,65 @@
+import warnings
+from prelude import assert_eq
+from pgsql import ProgrammingError
+
+def test_sets():
+    cu.executeall('SELECT 1 AS a; SELECT 2 AS b, 3 AS c UNION SELECT 4, 5;'
+                  'SELECT 6 AS d')
+    assert_eq(cu.description[0][0], 'a')
+    assert_eq(cu.fetchall(), [(1,)])
+    assert cu.nextset()
+    assert_eq(cu.description[0][0], 'b')
+    assert_eq(cu.rowcount, 2)
+    assert_eq(cu.fetchall(), [(2, 3), (4, 5)])
+    assert cu.nextset()
+    assert_eq(cu.fetchone(), (6,))
+    assert cu.nextset() is None
+    assert_eq(cu.description[0][0], 'd')
+
+def test_commands():
+    cu.execute('CREATE TEMPORARY TABLE t (i int)')
+    assert_eq(cu.executeall('INSERT INTO t VALUES (1), (2); '
+                            'SELECT count(*) FROM t'), 2)
+    assert cu.nextset()
+    assert_eq(cu.fetchone(), (2,))
+
+def test_percent():
+    warnings.simplefilter('error')
+    try:
+        cu.executeall("SELECT 'a%sb', '100%'; SELECT '%%'")
+    finally:
+        warnings.resetwarnings()
+    assert_eq(cu.fetchone(), ('a%sb', '100%'))
+    assert cu.nextset()
+    assert_eq(cu.fetchone(), ('%%',))
+
+def test_single():
+    cu.executeall('SELECT 1')
+    assert_eq(cu.fetchone(), (1,))
+    assert cu.nextset() is None
+    cu.execute('SELECT 2')
+    assert cu.nextset() is None
+
+def test_execute_drops_sets():
+    cu.executeall('SELECT 1; SELECT 2')
+    cu.execute('SELECT 3')
+    assert cu.nextset() is None
+    assert_eq(cu.fetchone(), (3,))
+
+def test_error():
+    try:
+        cu.executeall('SELECT 1; SELECT 1/0; SELECT 2')
+    except ProgrammingError, e:
+        assert 'division by zero' in str(e)
+    else:
+        assert False, 'no error'
+    cnx.rollback()
+    cu.execute('SELECT 3')
+    assert_eq(cu.fetchone(), (3,))
+
+def test_binary():
+    cu.binary = True
+    cu.executeall("SELECT 1, 'a'; SELECT 2.5::float8")
+    assert_eq(cu.fetchone(), (1, u'a'))
+    cu.nextset()
+    assert_eq(cu.fetchone(), (2.5,))
@@ -32,3 +32,34 @@ def test_float_into_decimal():
     value, = cu.execute('SELECT a FROM y').fetchone()
     assert isinstance(value, Decimal)
     assert value == Decimal('1.5')
+
+def test_numeric_float():
+    cnx.typecasts['numeric'] = dbapi.typecast_numeric_float
+    value, = cu.execute('SELECT 1.5::numeric').fetchone()
+    assert isinstance(value, float)
+    assert value == 1.5
+
+def test_numeric_scaled():
+    cnx.typecasts['numeric'] = dbapi.scaled_numeric(2)
+    row = cu.execute('SELECT 1.5::numeric(4,1), -123.45, 7::numeric, '
+                     '0.100::numeric').fetchone()
+    assert row == (150, -12345, 700, 10), row
+
+    try:
+        cu.execute('SELECT 1.234::numeric').fetchone()
+        raise AssertionError('1.234 does not fit a scale of 2')
+    except dbapi.DataError:
+        pass
+
+def test_numeric_binary():
+    cnx.binary = True
+    cu = cnx.cursor()
+    cnx.typecasts['numeric'] = dbapi.typecast_numeric_float
+    value, = cu.execute('SELECT 1.5::numeric').fetchone()
+    assert isinstance(value, float)
+
+    cnx.typecasts['numeric'] = dbapi.scaled_numeric(3)
+    value, = cu.execute('SELECT 0.0000::numeric').fetchone()
+    assert value == 0, value
+    value, = cu.execute('SELECT -1.5::numeric').fetchone()
+    assert value == -1500, value
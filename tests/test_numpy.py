@@ -0,0 +1,73 @@
+from prelude import assert_eq, SkipTest
+from datetime import datetime
+from decimal import Decimal
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SQL = '''SELECT i, i::bigint AS big, i::float8 AS f, i % 2 = 0 AS even,
+                '2000-01-01'::timestamp + i * interval '1 second' AS ts,
+                i::numeric AS num, i::text AS txt
+         FROM (VALUES (1), (NULL), (3)) AS t (i)'''
+
+def setup():
+    if numpy is None:
+        raise SkipTest
+
+def check(binary):
+    cu.binary = binary
+    cu.execute(SQL)
+    arrays = cu.fetch_numpy()
+    assert_eq(sorted(arrays), ['big', 'even', 'f', 'i', 'num', 'ts', 'txt'])
+    assert_eq(arrays['i'].dtype, numpy.dtype('i4'))
+    assert_eq(arrays['i'].tolist(), [1, None, 3])
+    assert_eq(arrays['big'].dtype, numpy.dtype('i8'))
+    assert_eq(arrays['f'].dtype, numpy.dtype('f8'))
+    assert_eq(arrays['even'].dtype, numpy.dtype('?'))
+    assert_eq(arrays['ts'].dtype, numpy.dtype('M8[us]'))
+    assert_eq(arrays['ts'][0], numpy.datetime64('2000-01-01T00:00:01'))
+    assert_eq(arrays['num'].dtype, numpy.dtype(object))
+    assert_eq(arrays['num'].tolist(), [Decimal(1), None, Decimal(3)])
+    assert_eq(arrays['txt'][2], u'3')
+
+def test_dict():
+    check(False)
+
+def test_dict_binary():
+    check(True)
+
+def test_no_nulls():
+    cu.execute('SELECT generate_series(1, 4) AS n')
+    arrays = cu.fetch_numpy()
+    assert not isinstance(arrays['n'], numpy.ma.MaskedArray)
+    assert_eq(arrays['n'].sum(), 10)
+
+def test_out():
+    out = numpy.zeros(5, [('i', 'i4'), ('f', 'f8'), ('num', 'f8'),
+                          ('ts', 'M8[us]')])
+    out['i'] = -1
+    cu.execute(SQL)
+    assert_eq(cu.fetch_numpy(out), 3)
+    assert_eq(out['i'].tolist(), [1, -1, 3, -1, -1])
+    assert_eq(out['f'].tolist(), [1.0, 0.0, 3.0, 0.0, 0.0])
+    assert_eq(out['num'].tolist(), [1.0, 0.0, 3.0, 0.0, 0.0])
+    assert_eq(out['ts'][2], numpy.datetime64('2000-01-01T00:00:03'))
+
+def test_out_too_small():
+    cu.execute('SELECT generate_series(1, 4) AS n')
+    try:
+        cu.fetch_numpy(numpy.zeros(3, [('n', 'i4')]))
+    except ValueError:
+        pass
+    else:
+        assert False, 'ValueError not raised'
+
+def test_empty():
+    cu.execute('SELECT 1 AS n WHERE false')
+    assert_eq(len(cu.fetch_numpy()['n']), 0)
+
+def test_infinity():
+    cu.execute("SELECT 'infinity'::timestamp AS ts")
+    assert numpy.isnat(cu.fetch_numpy()['ts'][0])
@@ -0,0 +1,122 @@
+from prelude import assert_eq
+from datetime import date, time, datetime, timedelta
+from decimal import Decimal
+from uuid import UUID
+import json
+from pgsql import tzoffset, interval, Binary
+
+def check(value, typename, expected=None):
+    if expected is None:
+        expected = value
+    cu.execute('SELECT %s, pg_typeof(%s)::text', [value, value])
+    result, typ = cu.fetchone()
+    assert_eq(typ, typename)
+    assert_eq(result, expected)
+
+def test_bool():
+    check(True, 'boolean')
+    check(False, 'boolean')
+
+def test_int():
+    check(42, 'bigint')
+    check(-2**63, 'bigint')
+    check(2**63, 'numeric', Decimal(2**63))
+    check(-10**30, 'numeric', Decimal(-10**30))
+
+def test_float():
+    check(1.5, 'double precision')
+    check(1e-9, 'double precision')
+    check(1e300, 'double precision')
+    check(0.1 + 0.2, 'double precision')
+    check(float('-inf'), 'double precision')
+
+def test_float_text():
+    cu.execute('SELECT %s::text', [1e-9])
+    assert_eq(cu.fetchone(), (u'1e-09',))
+
+def test_numeric():
+    for value in ['0', '1.50', '-0.0001', '12345678.000000001', '1E-20',
+                  '123456789012345678901234567890.123', 'Infinity']:
+        check(Decimal(value), 'numeric')
+    check(Decimal('1E+20'), 'numeric')
+    cu.execute('SELECT %s', [Decimal('NaN')])
+    assert cu.fetchone()[0].is_nan()
+
+def test_uuid():
+    check(UUID('12345678-1234-5678-1234-567812345678'), 'uuid')
+
+def test_dates():
+    check(date(1979, 7, 7), 'date')
+    check(date(1, 1, 1), 'date')
+    check(datetime(1979, 7, 7, 22, 0, 12, 330000),
+          'timestamp without time zone')
+    check(datetime(1969, 12, 31, 23, 59, 59), 'timestamp without time zone')
+    check(time(22, 0, 12, 330000), 'time without time zone')
+
+def test_time_zones():
+    value = datetime(1979, 7, 7, 22, tzinfo=tzoffset(7200))
+    check(value, 'timestamp with time zone',
+          datetime(1979, 7, 7, 20, tzinfo=tzoffset(0)))
+    cu.execute('SELECT %s', [time(22, tzinfo=tzoffset(-5400))])
+    value, = cu.fetchone()
+    assert_eq(value.utcoffset(), timedelta(minutes=-90))
+
+def test_prepared_types():
+    cu.execute('CREATE TEMPORARY TABLE t (a smallint, b integer, c real, '
+               'd numeric, e timestamp with time zone, f date, g text)')
+    insert = cnx.prepare('INSERT INTO t VALUES (%s, %s, %s, %s, %s, %s, %s)')
+    insert.execute([1, 2, 3, 4.5, datetime(2000, 1, 1, tzinfo=tzoffset(0)),
+                    date(2000, 1, 2), 'x'])
+    # values which do not fit the type of their parameter go as text
+    insert.execute(['5', 6, 7.5, Decimal('8.25'), '2000-01-03 00:00+00',
+                    datetime(2000, 1, 4), 9])
+    cu.executemany('INSERT INTO t VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                   [[10, 11, 12, Decimal(13), None, None, None]])
+    cu.execute('SELECT a, b, c, d, e, f, g FROM t ORDER BY a')
+    assert_eq(cu.fetchall(), [
+        (1, 2, 3.0, Decimal('4.5'),
+         datetime(2000, 1, 1, tzinfo=tzoffset(0)), date(2000, 1, 2), u'x'),
+        (5, 6, 7.5, Decimal('8.25'),
+         datetime(2000, 1, 3, tzinfo=tzoffset(0)), date(2000, 1, 4), u'9'),
+        (10, 11, 12.0, Decimal(13), None, None, None)])
+
+def test_unicode():
+    check(u'caf\xe9 \u20ac', 'text')
+    cu.execute('CREATE TEMPORARY TABLE t (v text)')
+    cu.executemany('INSERT INTO t VALUES (%s)', [[u'\xe9'], ['x'], [u'\u20ac']])
+    cu.execute('SELECT v FROM t')
+    assert_eq(cu.fetchall(), [(u'\xe9',), (u'x',), (u'\u20ac',)])
+
+def test_unicode_encoding():
+    cnx.encoding = 'latin-1'
+    try:
+        check(u'caf\xe9', 'text')
+        try:
+            cu.execute('SELECT %s', [u'\u20ac'])
+        except UnicodeError:
+            pass
+        else:
+            assert False, 'no error'
+    finally:
+        cnx.encoding = 'utf-8'
+
+def test_json():
+    cu.execute('SELECT %s::jsonb, %s::json::text', [{'a': [1, u'x']}, [1]])
+    assert_eq(cu.fetchone(), ({u'a': [1, u'x']}, u'[1]'))
+    cnx.json_dumps = lambda value: '[2]'
+    try:
+        cu.execute('SELECT %s::json::text', [[1]])
+        assert_eq(cu.fetchone(), (u'[2]',))
+    finally:
+        cnx.json_dumps = json.dumps
+
+def test_intervals():
+    check(timedelta(days=-1, seconds=5, microseconds=7), 'interval',
+          interval(days=-1, seconds=5, microseconds=7))
+    check(interval(years=1, months=-2, days=3, hours=4, minutes=5,
+                   seconds=6, microseconds=7), 'interval',
+          interval(months=10, days=3, hours=4, minutes=5, seconds=6,
+                   microseconds=7))
+
+def test_binary():
+    check(Binary('a\0b'), 'bytea', 'a\0b')
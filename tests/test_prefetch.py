@@ -0,0 +1,95 @@
+from prelude import assert_eq
+from pgsql import NotSupportedError, ProgrammingError
+
+SQL = 'SELECT i, repeat(%s, i % 10) FROM generate_series(1, 1000) AS i'
+ROWS = [(i, u'x' * (i % 10)) for i in range(1, 1001)]
+
+def test_batches():
+    cu = cnx.itercursor()
+    cu.prefetch_rows = 2
+    cu.prefetch_time = 60
+    cu.execute(SQL, ['x'])
+    assert_eq(cu.fetchone(), ROWS[0])
+    assert_eq(cu.description[0][0], 'i')
+    assert_eq(cu.fetchmany(3), ROWS[1:4])
+    assert_eq(list(cu), ROWS[4:])
+    assert cu._IterCursor__size > 2
+
+def test_memory():
+    cu = cnx.itercursor()
+    cu.prefetch_rows = 2
+    cu.prefetch_time = 60
+    cu.prefetch_memory = 1
+    cu.execute(SQL, ['x'])
+    assert_eq(list(cu), ROWS)
+    assert_eq(cu._IterCursor__size, 1)
+
+def test_fetchall():
+    cu = cnx.itercursor()
+    cu.execute(SQL, ['x'])
+    assert_eq(cu.fetchmany(5), ROWS[:5])
+    assert_eq(cu.fetchall(), ROWS[5:])
+    assert_eq(cu.fetchone(), None)
+
+def test_background():
+    cu = cnx.itercursor()
+    cu.background = True
+    cu.prefetch_rows = 10
+    cu.execute(SQL, ['x'])
+    assert_eq(cu.fetchmany(15), ROWS[:15])
+    assert_eq(cu.fetchone(), ROWS[15])
+    assert_eq(list(cu), ROWS[16:])
+    cu.execute(SQL, ['x'])
+    assert_eq(cu.fetchone(), ROWS[0])
+    assert_eq(cu.fetchall(), ROWS[1:])
+    cu.execute(SQL, ['x'])
+    cu.fetchone()
+    cu.close()
+    assert_eq(cnx.execute('SELECT 42').fetchone(), (42,))
+
+def test_background_other_statements():
+    # other statements on the connection wait for the FETCH in the
+    # background, instead of running on the connection meanwhile
+    cu = cnx.itercursor()
+    cu.background = True
+    cu.prefetch_rows = 10
+    cu.prefetch_time = 60
+    other = cnx.cursor()
+    cu.execute(SQL, ['x'])
+    rows = []
+    for i, row in enumerate(cu):
+        rows.append(row)
+        if i % 100 == 0:
+            other.execute('SELECT %s', [i])
+            assert_eq(other.fetchone(), (i,))
+            cnx.execute('SELECT 1')
+    assert_eq(rows, ROWS)
+
+def test_background_error():
+    cu = cnx.itercursor()
+    cu.background = True
+    cu.prefetch_rows = 10
+    cu.prefetch_time = 60
+    # the FETCH of the second batch fails, in the background
+    cu.execute('SELECT 1 / (20 - i) FROM generate_series(1, 30) AS i')
+    assert_eq(len(cu.fetchmany(10)), 10)
+    try:
+        list(cu)
+    except ProgrammingError, e:
+        assert 'division by zero' in str(e), str(e)
+    else:
+        assert False, 'no error'
+
+def test_columns():
+    cu = cnx.itercursor()
+    cu.execute(SQL, ['x'])
+    cu.fetchone()
+    try:
+        cu.fetchcolumns()
+    except NotSupportedError:
+        pass
+    else:
+        assert False, 'no error'
+    cu.execute(SQL, ['x'])
+    values, nulls = cu.fetchcolumns()[0]
+    assert_eq(list(values), range(1, 1001))
@@ -0,0 +1,96 @@
+from prelude import assert_eq
+from datetime import date
+from decimal import Decimal
+from pgsql import Range, Multirange
+
+def check(sql, expected):
+    for binary in False, True:
+        cnx.binary = binary
+        value, = cnx.execute('SELECT %s' % sql).fetchone()
+        assert isinstance(value, type(expected)), type(value)
+        assert_eq(value, expected)
+
+def test_int():
+    check("'[1,5)'::int4range", Range(1, 5))
+    check("'(1,5]'::int4range", Range(2, 6))
+    check("'[1,2]'::int8range", Range(1, 3))
+
+def test_bounds():
+    value, = cnx.execute("SELECT '(1.5,2.5]'::numrange").fetchone()
+    assert_eq(value, Range(Decimal('1.5'), Decimal('2.5'), '(]'))
+    assert not value.lower_inc
+    assert value.upper_inc
+    assert not value.lower_inf
+
+def test_empty():
+    check("'empty'::int4range", Range(bounds='empty'))
+    value, = cnx.execute("SELECT 'empty'::int4range").fetchone()
+    assert value.isempty
+    assert not value.lower_inf
+
+def test_unbounded():
+    check("'[2000-01-01,)'::daterange", Range(date(2000, 1, 1), None))
+    value, = cnx.execute("SELECT '(,5)'::int4range").fetchone()
+    assert_eq(value, Range(None, 5, '()'))
+    assert value.lower_inf
+    assert not value.upper_inf
+
+def test_quoted():
+    check("""'["2000-01-01 10:00","2000-01-01 11:00")'::tsrange""",
+          Range(*cnx.execute("SELECT '2000-01-01 10:00'::timestamp, "
+                             "'2000-01-01 11:00'::timestamp").fetchone()))
+
+def test_multirange():
+    check("'{[1,3), [5,7)}'::int4multirange",
+          Multirange([Range(1, 3), Range(5, 7)]))
+    check("'{}'::int4multirange", Multirange())
+
+def test_multirange_quoted():
+    check("""'{["2000-01-01 10:00","2000-01-01 11:00"), empty}'::tsmultirange""",
+          Multirange([Range(*cnx.execute(
+              "SELECT '2000-01-01 10:00'::timestamp, "
+              "'2000-01-01 11:00'::timestamp").fetchone())]))
+
+def test_multirange_range_typecast():
+    # the ranges of a multirange are given the typecast of their type
+    cnx.typecasts[3904] = lambda typ, value: str(value)
+    try:
+        for binary in False, True:
+            cnx.binary = binary
+            value, = cnx.execute(
+                "SELECT '{[1,3), [5,7)}'::int4multirange").fetchone()
+            assert isinstance(value, Multirange), type(value)
+            assert_eq(len(value), 2)
+            if not binary:
+                assert_eq(list(value), ['[1,3)', '[5,7)'])
+    finally:
+        del cnx.typecasts[3904]
+        cnx.binary = False
+
+def test_array():
+    check("ARRAY['[1,3)'::int4range, 'empty']",
+          [Range(1, 3), Range(bounds='empty')])
+
+def test_param():
+    for r, expected in ((Range(1, 5), Range(1, 5)),
+                        (Range(None, 5, '(]'), Range(None, 6, '()')),
+                        (Range(bounds='empty'), Range(bounds='empty'))):
+        value, = cnx.execute('SELECT %s::int4range', [r]).fetchone()
+        assert_eq(value, expected)
+
+def test_param_quoted():
+    r = Range('a b', 'c"d', '[]')
+    assert_eq(str(r), '["a b","c\\"d"]')
+
+def test_param_multirange():
+    m = Multirange([Range(1, 3), Range(5, 7)])
+    value, = cnx.execute('SELECT %s::int4multirange', [m]).fetchone()
+    assert_eq(value, m)
+
+def test_bad_bounds():
+    try:
+        Range(1, 2, '[[')
+    except ValueError:
+        pass
+    else:
+        assert False, 'ValueError not raised'
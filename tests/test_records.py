@@ -0,0 +1,48 @@
+from prelude import assert_eq
+from decimal import Decimal
+from datetime import date
+
+create_statements = [
+    'CREATE TEMPORARY TABLE t(id integer, name text, born date)',
+    "INSERT INTO t VALUES(1, 'a \"b\", c', '2001-02-03'), (2, NULL, NULL)",
+    'CREATE TYPE pair AS (x numeric, y text[])',
+]
+
+def test_table_row():
+    rows = cnx.execute('SELECT t FROM t ORDER BY id').fetchall()
+    assert_eq(rows[0][0], (1, u'a "b", c', date(2001, 2, 3)))
+    assert_eq(rows[0][0].name, u'a "b", c')
+    assert_eq(rows[1][0], (2, None, None))
+    assert_eq(type(rows[0][0]).__name__, 't')
+
+def test_composite():
+    value, = cnx.execute("SELECT (1.5, ARRAY['p', 'q'])::pair").fetchone()
+    assert_eq(value, (Decimal('1.5'), [u'p', u'q']))
+    assert_eq(value._fields, ('x', 'y'))
+
+def test_composite_array():
+    value, = cnx.execute("SELECT ARRAY[(1, NULL)::pair, NULL]").fetchone()
+    assert_eq(value, [(Decimal('1'), None), None])
+
+def test_nested():
+    cnx.binary = True
+    value, = cnx.execute("SELECT ROW(t, 'x') FROM t WHERE id = 1").fetchone()
+    assert_eq(value, ((1, u'a "b", c', date(2001, 2, 3)), u'x'))
+    assert_eq(value[0].born, date(2001, 2, 3))
+
+def test_anonymous():
+    value, = cnx.execute("SELECT ROW(1, 'a,b', NULL, '')").fetchone()
+    assert_eq(value, (u'1', u'a,b', None, u''))
+    assert type(value) is tuple
+    value, = cnx.execute('SELECT ROW()').fetchone()
+    assert_eq(value, ())
+
+def test_binary():
+    cnx.binary = True
+    cu = cnx.cursor()
+    row = cu.execute("SELECT t, ROW(1, 'a', 2.5::float8) "
+                     "FROM t WHERE id = 1").fetchone()
+    assert_eq(row, ((1, u'a "b", c', date(2001, 2, 3)), (1, u'a', 2.5)))
+    assert_eq(row[0].id, 1)
+    value, = cu.execute("SELECT ARRAY[(1, NULL)::pair]").fetchone()
+    assert_eq(value, [(Decimal('1'), None)])
@@ -0,0 +1,73 @@
+import warnings
+from prelude import SkipTest
+from pgsql import OperationalError
+
+create_statements = [
+    "CREATE TYPE mood AS ENUM ('sad', 'happy')",
+    'CREATE DOMAIN posint AS integer CHECK (VALUE > 0)',
+]
+
+def test_enum():
+    value, = cnx.execute("SELECT 'happy'::mood").fetchone()
+    assert value == u'happy', `value`
+    assert isinstance(value, unicode)
+
+def test_enum_array():
+    value, = cnx.execute("SELECT ARRAY['sad', 'happy']::mood[]").fetchone()
+    assert value == [u'sad', u'happy'], `value`
+
+def test_domain():
+    value, = cnx.execute('SELECT 42::posint').fetchone()
+    assert value == 42, `value`
+    assert isinstance(value, int)
+
+def test_register_type():
+    oid = cnx.register_type('mood', lambda typ, value: value.upper())
+    assert isinstance(oid, (int, long))
+    value, = cnx.execute("SELECT 'sad'::mood").fetchone()
+    assert value == 'SAD', `value`
+    value, = cnx.execute("SELECT ARRAY['sad']::mood[]").fetchone()
+    assert value == ['SAD'], `value`
+
+def test_binary():
+    cnx.binary = True
+    cu = cnx.cursor()
+    row = cu.execute("SELECT 'happy'::mood, 7::posint").fetchone()
+    assert row == (u'happy', 7), `row`
+
+def test_unknown_warns_once():
+    warnings.simplefilter('always')
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            rows = cnx.execute('SELECT point(i, i) '
+                               'FROM generate_series(1, 3) AS i').fetchall()
+    finally:
+        warnings.resetwarnings()
+    assert len(rows) == 3
+    assert str(rows[0][0]) == '(1,1)', `rows`
+    assert len(caught) == 1, [str(w.message) for w in caught]
+
+def test_reset_types():
+    cnx.execute('CREATE TYPE duo AS (a integer)')
+    value, = cnx.execute('SELECT ROW(1)::duo').fetchone()
+    assert value == (1,), `value`
+    cnx.execute('ALTER TYPE duo ADD ATTRIBUTE b text')
+    cnx.reset_types()
+    value, = cnx.execute("SELECT ROW(1, 'x')::duo").fetchone()
+    assert value.b == u'x', `value`
+
+def test_load_error():
+    superuser, = cnx.execute('SELECT rolsuper FROM pg_roles '
+                             'WHERE rolname = current_user').fetchone()
+    if not superuser:
+        raise SkipTest('needs a superuser')
+    # rolled back with the test's transaction
+    cnx.execute('CREATE ROLE pgsql_test_reader')
+    cnx.execute('REVOKE SELECT ON pg_type FROM PUBLIC')
+    cnx.execute('SET LOCAL ROLE pgsql_test_reader')
+    try:
+        cnx.execute("SELECT '(1,1)'::point").fetchone()
+    except OperationalError, e:
+        assert 'permission denied' in str(e), str(e)
+    else:
+        assert False, 'no error'
@@ -0,0 +1,65 @@
+from prelude import assert_eq
+
+def test_len():
+    cu.execute('SELECT generate_series(1, 10)')
+    view = cu.result_view()
+    assert_eq(len(view), 10)
+
+def test_index():
+    cu.execute("SELECT i, 'row ' || i FROM generate_series(1, 10) AS i")
+    view = cu.result_view()
+    assert_eq(view[0], (1, u'row 1'))
+    assert_eq(view[9], (10, u'row 10'))
+    assert_eq(view[-1], (10, u'row 10'))
+    for i in 10, -11:
+        try:
+            view[i]
+        except IndexError:
+            pass
+        else:
+            assert False, 'IndexError not raised'
+
+def test_slice():
+    cu.execute('SELECT generate_series(0, 9)')
+    view = cu.result_view()
+    assert_eq(list(view[2:5]), [(2,), (3,), (4,)])
+    assert_eq(list(view[::3]), [(0,), (3,), (6,), (9,)])
+    assert_eq(list(view[::-4]), [(9,), (5,), (1,)])
+    assert_eq(list(view[1::2][1:3]), [(3,), (5,)])
+    assert_eq(len(view[8:20]), 2)
+
+def test_iter():
+    cu.execute('SELECT generate_series(1, 3)')
+    assert_eq(list(cu.result_view()), [(1,), (2,), (3,)])
+
+def test_fetch_position():
+    cu.execute('SELECT generate_series(1, 3)')
+    view = cu.result_view()
+    assert_eq(cu.fetchone(), (1,))
+    assert_eq(view[0], (1,))
+    assert_eq(cu.fetchall(), [(2,), (3,)])
+    assert_eq(len(view), 3)
+
+def test_outlives_result():
+    cu.execute('SELECT generate_series(1, 3)')
+    view = cu.result_view()
+    part = view[1:]
+    cu.execute('SELECT 42')
+    assert_eq(cu.fetchone(), (42,))
+    assert_eq(list(view), [(1,), (2,), (3,)])
+    del view
+    assert_eq(list(part), [(2,), (3,)])
+    cu.close()
+    assert_eq(part[0], (2,))
+
+def test_typecasts():
+    cu.execute('SELECT 1, 2')
+    cu.columncasts = {1: lambda typ, value: value * 10}
+    view = cu.result_view()
+    cu.columncasts = None
+    assert_eq(view[0], (1, 20))
+    assert_eq(cu.fetchone(), (1, 2))
+
+def test_shared():
+    cu.execute('SELECT 1')
+    assert cu.result_view() is cu.result_view()
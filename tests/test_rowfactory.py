@@ -0,0 +1,78 @@
+from prelude import assert_eq
+from pgsql import Record
+import sys
+
+def test_default():
+    assert cu.rowfactory is None
+    cu.execute('SELECT 1 AS a')
+    assert_eq(type(cu.fetchone()), tuple)
+
+def test_record():
+    cu.rowfactory = Record
+    cu.execute("SELECT 1 AS id, 'x'::text AS name")
+    row = cu.fetchone()
+    assert isinstance(row, Record)
+    assert_eq(row.id, 1)
+    assert_eq(row.name, u'x')
+    assert_eq(row[0], 1)
+    assert_eq(row[-1], u'x')
+    assert_eq(row['name'], u'x')
+    assert_eq(row[:1], (1,))
+    assert_eq(row[::-1], (u'x', 1))
+    assert_eq(len(row), 2)
+    assert_eq(tuple(row), (1, u'x'))
+    assert_eq(row, (1, u'x'))
+    assert_eq(hash(row), hash((1, u'x')))
+    id, name = row
+    assert_eq(name, u'x')
+    assert_eq(row._fields, ('id', 'name'))
+    assert_eq(row._asdict(), {'id': 1, 'name': u'x'})
+    assert_eq(repr(row), "Record(id=1, name=u'x')")
+
+def test_missing():
+    cu.rowfactory = Record
+    cu.execute('SELECT 1 AS a')
+    row = cu.fetchone()
+    for get, error in ((lambda: row.b, AttributeError),
+                       (lambda: row['b'], KeyError),
+                       (lambda: row[1], IndexError)):
+        try:
+            get()
+        except error:
+            pass
+        else:
+            assert False, '%s not raised' % error.__name__
+
+def test_shared_names():
+    cu.rowfactory = Record
+    cu.execute('SELECT generate_series(1, 2) AS n')
+    a, b = cu.fetchall()
+    assert a._fields is b._fields
+    assert sys.getsizeof(a) <= sys.getsizeof(tuple(a)) + tuple.__itemsize__
+
+def test_duplicate_names():
+    cu.rowfactory = Record
+    cu.execute('SELECT 1 AS a, 2 AS a')
+    row = cu.fetchone()
+    assert_eq(row.a, 1)
+    assert_eq(row[1], 2)
+
+def test_callable():
+    cu.rowfactory = list
+    cu.execute('SELECT 1, 2')
+    assert_eq(cu.fetchone(), [1, 2])
+
+def test_result_view():
+    cu.rowfactory = Record
+    cu.execute('SELECT generate_series(1, 3) AS n')
+    view = cu.result_view()
+    assert_eq(view[1].n, 2)
+    assert_eq(view[::2][1].n, 3)
+
+def test_not_callable():
+    try:
+        cu.rowfactory = 42
+    except TypeError:
+        pass
+    else:
+        assert False, 'TypeError not raised'
@@ -0,0 +1,72 @@
+from prelude import assert_eq
+from pgsql import NotSupportedError, ProgrammingError
+
+SQL = 'SELECT i FROM generate_series(0, 99) AS i'
+
+def assert_index_error(cursor, *args):
+    try:
+        cursor.scroll(*args)
+    except IndexError:
+        pass
+    else:
+        assert False, 'no error'
+
+def try_scroll(cursor):
+    cursor.execute(SQL)
+    cursor.scroll(10)
+    assert_eq(cursor.fetchone(), (10,))
+    assert_eq(cursor.rownumber, 11)
+    cursor.scroll(50, 'absolute')
+    assert_eq(cursor.fetchmany(2), [(50,), (51,)])
+    cursor.scroll(0)
+    assert_eq(cursor.fetchone(), (52,))
+    cursor.scroll(46)
+    assert_eq(cursor.fetchall(), [(99,)])
+
+def test_cursor():
+    try_scroll(cu)
+    cu.execute(SQL)
+    cu.scroll(90, 'absolute')
+    cu.scroll(-80)
+    assert_eq(cu.fetchone(), (10,))
+    assert_index_error(cu, 100, 'absolute')
+    assert_index_error(cu, -12)
+    assert_eq(cu.fetchone(), (11,))
+    cu.fetchall()
+    cu.scroll(-1)
+    assert_eq(cu.fetchone(), (99,))
+    try:
+        cu.scroll(1, 'sideways')
+    except ProgrammingError:
+        pass
+    else:
+        assert False, 'no error'
+
+def test_itercursor():
+    try_scroll(cnx.itercursor())
+
+def test_itercursor_backwards():
+    cursor = cnx.itercursor()
+    cursor.execute(SQL)
+    cursor.fetchmany(20)
+    try:
+        cursor.scroll(-5)
+    except NotSupportedError:
+        pass
+    else:
+        assert False, 'no error'
+
+def test_scrollable():
+    cursor = cnx.itercursor()
+    cursor.scrollable = True
+    cursor.prefetch_rows = 4
+    cursor.execute(SQL)
+    assert_eq(cursor.fetchmany(30), [(i,) for i in range(30)])
+    cursor.scroll(-25)
+    assert_eq(cursor.fetchone(), (5,))
+    cursor.scroll(1)
+    assert_eq(cursor.fetchone(), (7,))
+    assert_index_error(cursor, 100, 'absolute')
+    assert_eq(cursor.fetchone(), (8,))
+    cursor.scroll(0, 'absolute')
+    assert_eq(len(list(cursor)), 100)
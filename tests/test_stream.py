@@ -0,0 +1,78 @@
+from prelude import assert_eq
+from pgsql import NotSupportedError, ProgrammingError
+
+def test_fetch():
+    cu = cnx.streamcursor()
+    cu.execute('SELECT i, i::text FROM generate_series(1, 5) AS i')
+    assert_eq(cu.rowcount, -1)
+    assert_eq([d[0] for d in cu.description], ['i', 'i'])
+    assert_eq(cu.fetchone(), (1, u'1'))
+    assert_eq(cu.fetchmany(2), [(2, u'2'), (3, u'3')])
+    assert_eq(cu.fetchall(), [(4, u'4'), (5, u'5')])
+    assert_eq(cu.fetchone(), None)
+    assert_eq(cu.rowcount, 5)
+    cu.close()
+
+def test_iter():
+    cu = cnx.streamcursor()
+    cu.execute('SELECT i FROM generate_series(1, 1000) AS i')
+    assert_eq(sum(i for i, in cu), 500500)
+    assert_eq(cu.rowcount, 1000)
+
+def test_statements():
+    cu = cnx.streamcursor()
+    cu.execute('WITH t(a) AS (VALUES (1), (2)) SELECT a * %s FROM t', [10])
+    assert_eq(cu.fetchall(), [(10,), (20,)])
+    cu.execute('VALUES (%s)', ['a'])
+    assert_eq(cu.fetchall(), [(u'a',)])
+    cu.execute('CREATE TEMPORARY TABLE s(i integer)')
+    assert_eq(cu.execute('INSERT INTO s VALUES (1), (2)'), 2)
+    cu.execute('UPDATE s SET i = i + 1 RETURNING i')
+    assert_eq(sorted(cu), [(2,), (3,)])
+
+def test_binary():
+    cu = cnx.streamcursor()
+    cu.binary = True
+    cu.execute("SELECT 42, 'abc'::text, '\\x00f8'::bytea, ARRAY[1, 2]")
+    assert_eq(cu.fetchall(), [(42, u'abc', '\x00\xf8', [1, 2])])
+
+def test_composite():
+    cnx.execute('CREATE TYPE stream_pair AS (a integer, b text)')
+    cu = cnx.streamcursor()
+    cu.execute("SELECT (1, 'x')::stream_pair FROM generate_series(1, 2)")
+    rows = cu.fetchall()
+    assert_eq(rows, [((1, u'x'),), ((1, u'x'),)])
+    assert_eq(rows[0][0].b, u'x')
+
+def test_early_close():
+    cu = cnx.streamcursor()
+    cu.execute('SELECT i FROM generate_series(1, 10000) AS i')
+    assert_eq(cu.fetchone(), (1,))
+    cu.execute('SELECT 42')
+    assert_eq(cu.fetchall(), [(42,)])
+    cu.execute('SELECT i FROM generate_series(1, 10000) AS i')
+    cu.fetchone()
+    cu.close()
+    assert_eq(cnx.execute('SELECT 1').fetchone(), (1,))
+
+def test_error():
+    cu = cnx.streamcursor()
+    cu.execute('SELECT 1 / (3 - i) FROM generate_series(1, 5) AS i')
+    assert_eq(cu.fetchone(), (0,))
+    try:
+        cu.fetchall()
+    except ProgrammingError:
+        pass
+    else:
+        assert False, 'no error'
+
+def test_not_supported():
+    cu = cnx.streamcursor()
+    cu.execute('SELECT 1')
+    for method in [cu.fetchcolumns, cu.result_view]:
+        try:
+            method()
+        except NotSupportedError:
+            pass
+        else:
+            assert False, method
@@ -5,8 +5,9 @@ create_statements = [
     'CREATE TEMPORARY TABLE w(a time without time zone)',
 ]
 
-from pgsql import interval
-from prelude import roundtrip_value
+from datetime import datetime, timedelta
+from pgsql import interval, tzoffset
+from prelude import roundtrip_value, assert_eq
 
 def test_null():
     roundtrip_value(cu, 'x', None)
@@ -42,6 +43,17 @@ def test_timestamp():
     value, = cu.execute('SELECT now()::timestamp with time zone').fetchone()
     assert value.hour < 24
 
+def test_timestamp_with_time_zone():
+    cu.execute("SET TIME ZONE INTERVAL '+05:30' HOUR TO MINUTE")
+    value, = cu.execute("SELECT '1979-07-07 22:00:00+00'::timestamptz") \
+               .fetchone()
+    assert_eq(value.utcoffset(), timedelta(hours=5, minutes=30))
+    assert_eq(value, datetime(1979, 7, 7, 22, tzinfo=tzoffset(0)))
+
+def test_roundtrip_timestamp_with_time_zone():
+    cu.execute('CREATE TEMPORARY TABLE tz(a timestamp with time zone)')
+    roundtrip_value(cu, 'tz', datetime(1979, 7, 7, 22, tzinfo=tzoffset(3600)))
+
 def test_roundtrip_interval():
     roundtrip_value(cu, 'z', interval())
     roundtrip_value(cu, 'z', interval(seconds=1))
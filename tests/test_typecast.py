@@ -30,3 +30,50 @@ def test_interval():
 
     assert_eq(typecast_interval(None, '1 year -3 days'),
               interval(years=1, days=-3))
+
+def test_datetime_tz():
+    value = typecast_datetime(None, '1979-07-07 22:00:12+02')
+    assert_eq(value.utcoffset(), timedelta(hours=2))
+    assert_eq(value.replace(tzinfo=None), datetime(1979, 7, 7, 22, 00, 12))
+
+    value = typecast_datetime(None, '1979-07-07 22:00:12.5-03:30')
+    assert_eq(value.utcoffset(), -timedelta(hours=3, minutes=30))
+    assert_eq(value.microsecond, 500000)
+
+def test_time_tz():
+    value = typecast_time(None, '12:34:45+05:30')
+    assert_eq(value.utcoffset(), timedelta(hours=5, minutes=30))
+    assert_eq(value.replace(tzinfo=None), time(12, 34, 45))
+
+def test_interval_sign():
+    assert_eq(typecast_interval(None, '-01:02:03'),
+              interval(hours=-1, minutes=-2, seconds=-3))
+    assert_eq(typecast_interval(None, '-1 years -2 mons +3 days'),
+              interval(years=-1, months=-2, days=3))
+    assert_eq(typecast_interval(None, '100:00:00'),
+              interval(hours=100))
+
+def test_infinity():
+    assert_eq(typecast_date(None, 'infinity'), date.max)
+    assert_eq(typecast_datetime(None, '-infinity'), datetime.min)
+
+def test_leap_day():
+    assert_eq(typecast_date(None, '2000-02-29'), date(2000, 2, 29))
+
+def test_invalid():
+    for cast, value in [(typecast_date, '1979-07'),
+                        (typecast_datetime, '1979-07-07 22:00:12 BC'),
+                        (typecast_time, '12:34'),
+                        (typecast_time, '24:00:00'),
+                        (typecast_interval, '1 fortnight'),
+                        (typecast_date, '12000-01-01'),
+                        (typecast_date, '0000-01-01'),
+                        (typecast_date, '1979-13-01'),
+                        (typecast_date, '1979-02-29'),
+                        (typecast_datetime, '10000-01-01 00:00:00'),
+                        (typecast_datetime, '1979-04-31 00:00:00')]:
+        try:
+            cast(None, value)
+            raise AssertionError('%r should not parse' % value)
+        except ValueError:
+            pass